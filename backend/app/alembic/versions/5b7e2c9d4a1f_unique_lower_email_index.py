@@ -0,0 +1,35 @@
+"""unique lower(email) index
+
+Replaces the plain index on user.email with a unique index on lower(email), so that emails
+are unique regardless of case and case-insensitive lookups can use an index.
+
+The upgrade fails if emails that differ only in case are already registered; merge or
+rename those users first, e.g. find them with
+SELECT lower(email) FROM "user" GROUP BY lower(email) HAVING count(*) > 1.
+
+Revision ID: 5b7e2c9d4a1f
+Revises: 28efa55c2847
+Create Date: 2026-10-18 10:12:41.503218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e2c9d4a1f'
+down_revision = '28efa55c2847'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(
+        'ix_user_email_lower', 'user', [sa.text('lower(email)')], unique=True
+    )
+    op.drop_index(op.f('ix_user_email'), table_name='user')
+
+
+def downgrade():
+    op.create_index(op.f('ix_user_email'), 'user', ['email'], unique=False)
+    op.drop_index('ix_user_email_lower', table_name='user')
@@ -0,0 +1,31 @@
+"""user row version
+
+Adds a version counter to user, bumped by every update, from which conditional GETs derive
+their ETags without serializing or hashing the user. Existing rows start at version 1.
+
+Revision ID: 7c3d1f8e2b6a
+Revises: 5b7e2c9d4a1f
+Create Date: 2026-10-18 13:05:27.184630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c3d1f8e2b6a'
+down_revision = '5b7e2c9d4a1f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        'user',
+        sa.Column('version', sa.Integer(), server_default='1', nullable=False),
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('user') as batch_op:
+        batch_op.drop_column('version')
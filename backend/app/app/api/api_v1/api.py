@@ -1,11 +1,13 @@
 """
-This module creates an API router for the FastAPI application and includes routes from the auth module.
+This module creates an API router for the FastAPI application and includes routes from the auth,
+users and metrics modules.
 """
 
-from app.api.api_v1.endpoints import auth
+from app.api.api_v1.endpoints import auth, metrics, users
+from app.api.responses import JSON_RESPONSE_CLASS
 from fastapi import APIRouter
 
-api_router = APIRouter()
+api_router = APIRouter(default_response_class=JSON_RESPONSE_CLASS)
 """
 An instance of APIRouter to which we will include the routes from the auth module.
 """
@@ -15,3 +17,13 @@ api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 Includes the routes defined in the auth module under the prefix "/auth". 
 The routes from the auth module will be categorized under the tag "auth" in the API documentation.
 """
+
+api_router.include_router(users.router, prefix="/users", tags=["users"])
+"""
+Includes the superuser-only user management routes under the prefix "/users".
+"""
+
+api_router.include_router(metrics.router, prefix="/internal/metrics", tags=["internal"])
+"""
+Includes the superuser-only runtime metrics of the serving worker under "/internal/metrics".
+"""
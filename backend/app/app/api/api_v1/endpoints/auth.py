@@ -10,34 +10,46 @@ from typing import Any
 import app.api.deps as deps
 import app.crud as crud
 import app.schemas as schemas
-from app.core.auth import authenticate, create_access_token
-from app.models.user import User
-from fastapi import APIRouter, Depends, HTTPException
+from app.api.conditional import cache_control
+from app.api.unit_of_work import UnitOfWorkRoute
+from app.core.auth import aauthenticate, create_access_token
+from app.crud.crud_user import is_duplicate_email
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm.session import Session
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 
-router = APIRouter()
+router = APIRouter(route_class=UnitOfWorkRoute)
 
 
 @router.post("/login")
-def login(
-    db: Session = Depends(deps.get_db), form_data: OAuth2PasswordRequestForm = Depends()
+async def login(
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(deps.get_async_db),
+    form_data: OAuth2PasswordRequestForm = Depends(),
 ) -> Any:
     """
     Authenticate a user and return a JWT.
 
-    The function takes a SQLAlchemy Session and OAuth2PasswordRequestForm data as dependencies.
-    If the user's credentials are valid, a JWT is returned.
+    The function takes a SQLAlchemy AsyncSession and OAuth2PasswordRequestForm data as dependencies.
+    If the user's credentials are valid, a JWT is returned. An outdated password hash is
+    upgraded in the background once the response has been sent.
 
     Args:
-        db (Session): SQLAlchemy Session.
+        background_tasks (BackgroundTasks): Tasks to run after the response is sent.
+        db (AsyncSession): SQLAlchemy AsyncSession.
         form_data (OAuth2PasswordRequestForm): Form data containing user's credentials.
 
     Returns:
         dict: A dictionary containing the access token and token type.
     """
 
-    user = authenticate(email=form_data.username, password=form_data.password, db=db)
+    user = await aauthenticate(
+        email=form_data.username,
+        password=form_data.password,
+        db=db,
+        background_tasks=background_tasks,
+    )
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
 
@@ -48,46 +60,54 @@ def login(
 
 
 @router.get("/me", response_model=schemas.User)
-def read_users_me(current_user: User = Depends(deps.get_current_user)):
+@cache_control("private, no-cache")
+async def read_users_me(current_user: schemas.UserIdentity = Depends(deps.get_current_user)):
     """
     Get the current logged in user.
 
+    The response's ETag comes from the user's row version, so clients that poll with
+    If-None-Match get a 304 without the user being serialized until it changes.
+
     Args:
-        current_user (User): Current logged in user.
+        current_user (schemas.UserIdentity): Snapshot of the current logged in user.
 
     Returns:
-        User: The current logged in user.
+        schemas.UserIdentity: The current logged in user.
     """
 
     return current_user
 
 
 @router.post("/signup", response_model=schemas.User, status_code=201)
-def create_user_signup(
+async def create_user_signup(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_async_db),
     user_in: schemas.user.UserCreate,
 ) -> Any:
     """
     Create a new user.
 
-    This function creates a new user with the provided user information.
-    If a user with the same email already exists, an error is raised.
+    This function creates a new user with the provided user information in a single INSERT.
+    If a user with the same email, in any case, already exists, the unique index on the email
+    rejects the INSERT and an error is raised.
 
     Args:
-        db (Session): SQLAlchemy Session.
+        db (AsyncSession): SQLAlchemy AsyncSession.
         user_in (schemas.user.UserCreate): User input data.
 
     Returns:
         User: The created user.
     """
 
-    user = db.query(User).filter(User.email == user_in.email).first()
-    if user:
+    try:
+        user = await crud.user.acreate(db=db, obj_in=user_in)
+    except IntegrityError as exc:
+        if not is_duplicate_email(exc):
+            raise
+        await db.rollback()
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system",
         )
-    user = crud.user.create(db=db, obj_in=user_in)
 
     return user
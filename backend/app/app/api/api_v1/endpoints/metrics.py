@@ -0,0 +1,49 @@
+"""
+This module defines an internal endpoint exposing runtime figures of the current worker process,
+such as database pool telemetry and cache counters, for sizing pools and caches.
+
+The figures are per worker: under gunicorn every UvicornWorker reports its own.
+"""
+
+import os
+from typing import Any
+
+import app.api.deps as deps
+import app.crud as crud
+import app.schemas as schemas
+from app.api.conditional import ConditionalRoute
+from app.core.auth import token_cache
+from app.core.security import password_hasher
+from app.crud.crud_user import user_cache
+from app.db.session import pool_metrics, replica_set
+from fastapi import APIRouter, Depends
+
+router = APIRouter(route_class=ConditionalRoute)
+
+
+@router.get("")
+def read_metrics(
+    current_user: schemas.UserIdentity = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Get the runtime figures of the worker that serves the request.
+
+    Args:
+        current_user (schemas.UserIdentity): The authenticated superuser.
+
+    Returns:
+        dict: Pool telemetry per engine, replica health, cache statistics and the password hashing queue depth.
+    """
+    caches = {"token": token_cache.stats(), "user": user_cache.stats()}
+    if crud.user.query_cache is not None:
+        caches["user_queries"] = crud.user.query_cache.stats()
+    return {
+        "pid": os.getpid(),
+        "db_pools": {name: metrics.snapshot() for name, metrics in pool_metrics.items()},
+        "db_replicas": replica_set.status(),
+        "caches": caches,
+        "password_hashing": {
+            "pending": password_hasher.pending,
+            "max_pending": password_hasher.max_pending,
+        },
+    }
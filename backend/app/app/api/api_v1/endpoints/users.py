@@ -0,0 +1,293 @@
+"""
+This module defines API endpoints for managing users, such as listing, exporting and importing
+them, in a FastAPI application. These endpoints are restricted to superusers.
+"""
+
+import codecs
+import csv
+import io
+import json
+from enum import Enum
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import app.api.deps as deps
+import app.crud as crud
+import app.schemas as schemas
+from app.api.unit_of_work import UnitOfWorkRoute, unit_of_work
+from app.crud.base import decode_cursor
+from app.crud.crud_user import is_duplicate_email
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.datastructures import UploadFile
+
+router = APIRouter(route_class=UnitOfWorkRoute)
+
+# Columns included in exports; the password hash is never exported
+EXPORT_COLUMNS = ("id", "email", "first_name", "surname", "is_superuser")
+
+# Rows fetched from the server-side cursor and serialized per chunk
+EXPORT_CHUNK_SIZE = 1000
+
+# Valid rows that are checked, hashed and inserted together during an import
+IMPORT_BATCH_SIZE = 500
+
+# Failed rows listed in an import report; further failures are only counted
+IMPORT_MAX_ERRORS = 1000
+
+# Bytes read at a time from a multipart upload, and the longest line accepted
+IMPORT_READ_SIZE = 64 * 1024
+IMPORT_MAX_LINE_LENGTH = 64 * 1024
+
+
+class UserFileFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+@router.get("", response_model=schemas.UserPage)
+async def list_users(
+    *,
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    current_user: schemas.UserIdentity = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    List users ordered by id, one page at a time.
+
+    Args:
+        db (AsyncSession): SQLAlchemy AsyncSession reading from the replicas.
+        cursor (Optional[str]): The `next_cursor` of the previous page; omit for the first page.
+        limit (int): Maximum number of users in the page.
+        current_user (schemas.UserIdentity): The authenticated superuser.
+
+    Returns:
+        schemas.UserPage: The users and the cursor of the next page.
+    """
+    try:
+        after_id = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    items, next_cursor = await crud.user.aget_page(db, after_id=after_id, limit=limit)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get("/export")
+@unit_of_work(False)
+async def export_users(
+    *,
+    db: AsyncSession = Depends(deps.get_async_read_db),
+    format: UserFileFormat = UserFileFormat.ndjson,
+    current_user: schemas.UserIdentity = Depends(deps.get_current_active_superuser),
+) -> StreamingResponse:
+    """
+    Export every user as NDJSON or CSV.
+
+    Rows are streamed from a server-side cursor and serialized chunk by chunk as they are sent,
+    so memory use does not depend on the size of the table. The stream outlives the endpoint,
+    so the route runs no unit of work, which would end the session's transaction first.
+
+    Args:
+        db (AsyncSession): SQLAlchemy AsyncSession reading from the replicas.
+        format (UserFileFormat): "ndjson" (one JSON object per line) or "csv".
+        current_user (schemas.UserIdentity): The authenticated superuser.
+
+    Returns:
+        StreamingResponse: The exported users.
+    """
+    chunks = crud.user.astream(db, columns=EXPORT_COLUMNS, chunk_size=EXPORT_CHUNK_SIZE)
+    if format == UserFileFormat.csv:
+        body, media_type = _csv_lines(chunks), "text/csv"
+    else:
+        body, media_type = _ndjson_lines(chunks), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="users.{format.value}"'},
+    )
+
+
+@router.post("/import", response_model=schemas.UserImportReport)
+@unit_of_work(False)
+async def import_users(
+    *,
+    request: Request,
+    db: AsyncSession = Depends(deps.get_async_db),
+    format: UserFileFormat = UserFileFormat.ndjson,
+    current_user: schemas.UserIdentity = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    Create users from an NDJSON or CSV file.
+
+    The file is either the raw request body, which may use chunked transfer encoding, or the
+    `file` field of a multipart form. It is parsed line by line as it arrives and each row is
+    validated against `UserCreate`; a CSV file starts with a header row naming the fields,
+    and its fields may not contain line breaks. Valid rows are created in batches, with their
+    passwords hashed in parallel, so only one batch is held in memory at a time.
+
+    Rows that are invalid or whose email is already registered are skipped and reported by
+    line number. Each batch is committed on its own, outside any unit of work, so that a large
+    import does not hold one transaction open; if the import is aborted, e.g. because the
+    password hashing queue is full, the batches committed before stay.
+
+    Args:
+        request (Request): The request carrying the file.
+        db (AsyncSession): SQLAlchemy AsyncSession.
+        format (UserFileFormat): "ndjson" (one JSON object per line) or "csv".
+        current_user (schemas.UserIdentity): The authenticated superuser.
+
+    Returns:
+        schemas.UserImportReport: The number of users created and the rows that failed.
+    """
+    report = schemas.UserImportReport()
+    batch: List[Tuple[int, schemas.UserCreate]] = []
+    async for line, fields, error in _import_rows(_upload_chunks(request), format):
+        if error is not None:
+            _report_failure(report, line, [error])
+            continue
+        try:
+            batch.append((line, schemas.UserCreate(**fields)))
+        except ValidationError as exc:
+            errors = [f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in exc.errors()]
+            _report_failure(report, line, errors)
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            await _import_batch(db, batch, report)
+            batch = []
+    if batch:
+        await _import_batch(db, batch, report)
+    return report
+
+
+async def _ndjson_lines(chunks: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    async for rows in chunks:
+        yield "".join(json.dumps(dict(row)) + "\n" for row in rows).encode()
+
+
+async def _csv_lines(chunks: AsyncIterator[list]) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in chunks:
+        writer.writerows([row[column] for column in EXPORT_COLUMNS] for row in rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+async def _upload_chunks(request: Request) -> AsyncIterator[bytes]:
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        # The form parser spools the upload to a temporary file, which is read back in chunks
+        form = await request.form()
+        upload = form.get("file")
+        if not isinstance(upload, UploadFile):
+            raise HTTPException(status_code=400, detail="Missing file field")
+        try:
+            while True:
+                chunk = await upload.read(IMPORT_READ_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            await form.close()
+    else:
+        async for chunk in request.stream():
+            yield chunk
+
+
+async def _import_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, str]]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    number = 0
+    async for chunk in chunks:
+        lines = (pending + decoder.decode(chunk)).split("\n")
+        pending = lines.pop()
+        if len(pending) > IMPORT_MAX_LINE_LENGTH:
+            raise HTTPException(status_code=400, detail=f"Line {number + 1} is too long")
+        for line in lines:
+            number += 1
+            yield number, line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield number + 1, pending.rstrip("\r")
+
+
+async def _import_rows(
+    chunks: AsyncIterator[bytes], format: UserFileFormat
+) -> AsyncIterator[Tuple[int, Dict[str, Any], Optional[str]]]:
+    header: Optional[List[str]] = None
+    async for number, line in _import_lines(chunks):
+        if not line.strip():
+            continue
+        if format == UserFileFormat.csv:
+            values = next(csv.reader([line]))
+            if header is None:
+                header = [name.strip() for name in values]
+            elif len(values) != len(header):
+                yield number, {}, f"Expected {len(header)} fields, got {len(values)}"
+            else:
+                # Empty fields are treated as missing, so optional fields default to None
+                yield number, {k: v for k, v in zip(header, values) if v != ""}, None
+        else:
+            try:
+                fields = json.loads(line)
+            except ValueError:
+                yield number, {}, "Invalid JSON"
+                continue
+            if isinstance(fields, dict):
+                yield number, fields, None
+            else:
+                yield number, {}, "Expected a JSON object"
+
+
+async def _import_batch(
+    db: AsyncSession,
+    batch: List[Tuple[int, schemas.UserCreate]],
+    report: schemas.UserImportReport,
+) -> None:
+    emails = [user_in.email for _, user_in in batch]
+    taken = await crud.user.aget_existing_emails(db, emails=emails)
+    while True:
+        pending: List[Tuple[int, schemas.UserCreate]] = []
+        seen: Set[str] = set()
+        for line, user_in in batch:
+            email = user_in.email.lower()
+            if email in taken or email in seen:
+                _report_failure(report, line, ["email: already registered"])
+            else:
+                seen.add(email)
+                pending.append((line, user_in))
+        if not pending:
+            return
+        try:
+            report.created += await crud.user.acreate_many(
+                db, objs_in=[user_in for _, user_in in pending], batch_size=IMPORT_BATCH_SIZE
+            )
+            return
+        except IntegrityError as exc:
+            if not is_duplicate_email(exc):
+                raise
+            await db.rollback()
+            # Another request registered some of the emails since they were checked: check
+            # the batch again, which reports those rows, and create the others
+            batch = pending
+            taken = await crud.user.aget_existing_emails(
+                db, emails=[user_in.email for _, user_in in batch]
+            )
+            if not taken:
+                raise
+
+
+def _report_failure(
+    report: schemas.UserImportReport, line: int, errors: List[str]
+) -> None:
+    report.failed += 1
+    if len(report.errors) < IMPORT_MAX_ERRORS:
+        report.errors.append(schemas.UserImportError(line=line, errors=errors))
+    else:
+        report.errors_truncated = True
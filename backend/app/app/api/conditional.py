@@ -0,0 +1,221 @@
+"""
+This module answers conditional GET requests.
+
+The GET routes of a `ConditionalRoute` send a weak ETag with their 200 responses, and answer
+requests whose If-None-Match matches it with an empty 304 Not Modified:
+
+- when the endpoint returns a versioned row or snapshot, such as a `schemas.UserIdentity`, the
+  ETag is derived from the row's id and version and from the response model, so a matching
+  request gets its 304 before anything is serialized;
+- otherwise the ETag is a hash of the response body, which saves sending the body but not
+  building it.
+
+Routes set the Cache-Control header of their responses with the `cache_control` decorator,
+and HTTP_CACHE_CONTROL overrides it per path template. HTTP_ETAGS=false turns ETags off.
+"""
+
+import functools
+import hashlib
+import inspect
+from contextvars import ContextVar
+from typing import Any, Callable, Coroutine, Optional, TypeVar
+
+from app.api.responses import FastJSONRoute
+from app.core.config import settings
+from fastapi import Request, Response
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Methods whose responses get ETags
+CONDITIONAL_METHODS = {"GET", "HEAD"}
+
+
+class _Exchange:
+    # The conditional state of a request, shared with the endpoint wrapper
+    __slots__ = ("if_none_match", "etag")
+
+    def __init__(self, if_none_match: Optional[str]):
+        self.if_none_match = if_none_match
+        self.etag: Optional[str] = None
+
+
+_exchange: ContextVar[Optional[_Exchange]] = ContextVar(
+    "conditional_exchange", default=None
+)
+
+
+def cache_control(value: str) -> Callable[[F], F]:
+    """
+    Decorate an endpoint, below its route decorator, to set the Cache-Control header of
+    its responses.
+
+    Args:
+        value (str): The header value, e.g. "private, no-cache".
+    """
+
+    def decorate(endpoint: F) -> F:
+        endpoint.cache_control = value
+        return endpoint
+
+    return decorate
+
+
+def weak_etag(*parts: Any) -> str:
+    """
+    Build a weak ETag from its parts, e.g. W/"3f2a9c1e-42-7".
+    """
+    return 'W/"' + "-".join(str(part) for part in parts) + '"'
+
+
+def content_etag(body: bytes) -> str:
+    """
+    Build a weak ETag from a hash of a response body.
+
+    Args:
+        body (bytes): The response body.
+
+    Returns:
+        str: The ETag.
+    """
+    return weak_etag(hashlib.blake2b(body, digest_size=16).hexdigest())
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Tell whether an If-None-Match header matches an ETag, with the weak comparison.
+
+    Args:
+        if_none_match (str): The request header, e.g. 'W/"a", "b"' or "*".
+        etag (str): The current ETag of the resource.
+
+    Returns:
+        bool: True if the client's copy is current.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def not_modified(etag: str, background: Optional[BackgroundTask] = None) -> Response:
+    """
+    Build an empty 304 Not Modified response.
+
+    Args:
+        etag (str): The current ETag of the resource.
+        background (Optional[BackgroundTask]): Tasks to run once the response is sent.
+
+    Returns:
+        Response: The response.
+    """
+    response = Response(status_code=304, headers={"ETag": etag}, background=background)
+    del response.headers["content-length"]
+    return response
+
+
+class ConditionalRoute(FastJSONRoute):
+    """
+    A route that adds ETags to its GET responses, answers If-None-Match with a 304 when
+    they match, and sets the Cache-Control header configured for it.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        # Called by the route's constructor, so the settings are read here
+        self.conditional = settings.http_cache.HTTP_ETAGS and bool(self.methods) and (
+            self.methods <= CONDITIONAL_METHODS
+        )
+        self.cache_control: Optional[str] = settings.http_cache.HTTP_CACHE_CONTROL.get(
+            self.path, getattr(self.endpoint, "cache_control", None)
+        )
+        self.representation = self._representation_tag()
+        handler = super().get_route_handler()
+        if not self.conditional and self.cache_control is None:
+            return handler
+
+        async def conditional_handler(request: Request) -> Response:
+            exchange = None
+            if self.conditional:
+                exchange = _Exchange(request.headers.get("if-none-match"))
+            token = _exchange.set(exchange)
+            try:
+                response = await handler(request)
+            finally:
+                _exchange.reset(token)
+            if exchange is not None and response.status_code == 200:
+                response = self._tag(response, exchange)
+            if self.cache_control is not None and "cache-control" not in response.headers:
+                response.headers["Cache-Control"] = self.cache_control
+            return response
+
+        return conditional_handler
+
+    def wrap_endpoint(self, endpoint: Callable[..., Any]) -> Callable[..., Any]:
+        if not self.conditional:
+            return super().wrap_endpoint(endpoint)
+
+        # Runs first on the endpoint's return value, before it is rendered
+        if inspect.iscoroutinefunction(endpoint):
+
+            @functools.wraps(endpoint)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                return self._check_version(await endpoint(*args, **kwargs))
+
+            return super().wrap_endpoint(async_wrapper)
+
+        @functools.wraps(endpoint)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            return self._check_version(endpoint(*args, **kwargs))
+
+        return super().wrap_endpoint(wrapper)
+
+    def _check_version(self, content: Any) -> Any:
+        exchange = _exchange.get()
+        if exchange is None or isinstance(content, Response):
+            return content
+        version = getattr(content, "version", None)
+        id = getattr(content, "id", None)
+        if version is None or id is None:
+            return content
+        exchange.etag = weak_etag(self.representation, id, version)
+        if exchange.if_none_match and etag_matches(exchange.if_none_match, exchange.etag):
+            return not_modified(exchange.etag)
+        return content
+
+    def _tag(self, response: Response, exchange: _Exchange) -> Response:
+        etag = exchange.etag or response.headers.get("etag")
+        if etag is None:
+            # Streaming responses have no body to hash
+            body = getattr(response, "body", None)
+            if body is None:
+                return response
+            etag = content_etag(body)
+        if exchange.if_none_match and etag_matches(exchange.if_none_match, etag):
+            return not_modified(etag, response.background)
+        response.headers["ETag"] = etag
+        return response
+
+    def _representation_tag(self) -> str:
+        # Identifies how the route renders rows, so that version ETags change with it
+        model = self.response_model
+        if isinstance(model, type) and issubclass(model, BaseModel):
+            schema = model.schema_json()
+        else:
+            schema = repr(model)
+        options = (
+            self.response_model_include,
+            self.response_model_exclude,
+            self.response_model_by_alias,
+            self.response_model_exclude_unset,
+            self.response_model_exclude_defaults,
+            self.response_model_exclude_none,
+        )
+        source = f"{self.path} {schema} {options}".encode("utf-8")
+        return hashlib.blake2b(source, digest_size=4).hexdigest()
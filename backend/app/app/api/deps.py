@@ -3,10 +3,18 @@ This module defines several utility functions and classes that are used as depen
 
 Dependencies:
     get_db(): Manages database sessions using a SQLAlchemy SessionLocal instance. It is used as a dependency in FastAPI routes to provide a session for database operations.
+
+    get_async_db(): Manages async database sessions using the AsyncSessionLocal instance. Used by `async def` routes so database access runs on the event loop instead of the threadpool.
+
+    get_read_db() / get_async_read_db(): Like get_db() / get_async_db(), but the session sends reads to the read replicas until it writes. Used by read-heavy routes.
+
+    The setup of each session is timed as the "get_db" span of the request (see `app.core.timing`).
+
+    Sessions from these dependencies join the request's unit of work when the route runs one (see `app.api.unit_of_work`): CRUD writes then only flush, and the route commits once at the end.
     
     get_example_client():Stub for wherever client operations are required.
     
-    get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)): Authenticates a user using a JWT token and retrieves the user's information from the database. Used as a dependency in routes that require user authentication.
+    get_current_user(db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)): Authenticates a user using a JWT token (verified claims are cached per token) and retrieves an immutable snapshot of the user, from the user cache or the primary database, timed as the "auth" span. The user is never read from a replica, whose lag could reject a new user or let a disabled one through. Used as a dependency in routes that require user authentication.
     
     get_current_active_superuser(current_user: User = Depends(get_current_user)): Checks if the authenticated user is a superuser. Used as a dependency in routes that require superuser privileges.
 
@@ -15,16 +23,24 @@ Models:
 
 """
 
-from typing import Generator, Optional
+from typing import AsyncGenerator, Generator, Optional
 
-from app import crud
-from app.core.auth import oauth2_scheme
+from app import crud, schemas
+from app.api.unit_of_work import join_unit_of_work
+from app.core.auth import decode_access_token, oauth2_scheme
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.core.timing import span
+from app.db.session import (
+    AsyncReadSessionLocal,
+    AsyncSessionLocal,
+    ReadSessionLocal,
+    SessionLocal,
+)
 from app.models.user import User
-from fastapi import Depends, HTTPException, status
-from jose import JWTError, jwt
+from fastapi import Depends, HTTPException, Request, status
+from jose import JWTError
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.session import Session
 
 
@@ -32,7 +48,7 @@ class TokenData(BaseModel):
     username: Optional[str] = None
 
 
-def get_db() -> Generator:
+def get_db(request: Request) -> Generator:
     """
     Dependency for getting a database session.
     This function creates an instance of SessionLocal that provides a session for database operations.
@@ -42,59 +58,114 @@ def get_db() -> Generator:
         A SQLAlchemy SessionLocal instance.
     """
 
-    db = SessionLocal()
-    db.current_user_id = None
+    with span("get_db"):
+        db = SessionLocal()
+        db.current_user_id = None
+        join_unit_of_work(request, db)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_db(request: Request) -> AsyncGenerator:
+    """
+    Dependency for getting an async database session.
+    This function creates an instance of AsyncSessionLocal that provides a session for database
+    operations from `async def` routes. The session is closed after it is used.
+
+    Returns:
+        A SQLAlchemy AsyncSession instance.
+    """
+
+    with span("get_db"):
+        db = AsyncSessionLocal()
+        join_unit_of_work(request, db)
+    async with db:
+        yield db
+
+
+def get_read_db(request: Request) -> Generator:
+    """
+    Dependency for getting a database session that reads from the read replicas.
+    Reads go to a replica until the session writes, after which it stays on the primary
+    for the rest of the transaction. The session is closed after it is used.
+
+    Returns:
+        A SQLAlchemy ReadSessionLocal instance.
+    """
+
+    with span("get_db"):
+        db = ReadSessionLocal()
+        join_unit_of_work(request, db)
     try:
         yield db
     finally:
         db.close()
 
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)
-) -> User:
+async def get_async_read_db(request: Request) -> AsyncGenerator:
+    """
+    Dependency for getting an async database session that reads from the read replicas.
+
+    Returns:
+        A SQLAlchemy AsyncSession instance backed by a routing session.
+    """
+
+    with span("get_db"):
+        db = AsyncReadSessionLocal()
+        join_unit_of_work(request, db)
+    async with db:
+        yield db
+
+
+async def get_current_user(
+    db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)
+) -> schemas.UserIdentity:
     """
     This function decodes the JWT token to get the username and then retrieves the user's information
-    from the database.
+    from the user cache, falling back to the primary database rather than a lagging replica. The
+    session only opens a connection on a cache miss.
 
     Args:
-        db: A SQLAlchemy Session.
+        db: A SQLAlchemy AsyncSession on the primary database.
         token: A JWT token.
 
     Raises:
         HTTPException: If the token is invalid or the user is not found in the database.
 
     Returns:
-        The authenticated User.
+        An immutable snapshot of the authenticated User.
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(
-            token,
-            settings.auth.JWT_SECRET,
-            algorithms=[settings.auth.ALGORITHM],
-            options={"verify_aud": False},
-        )
-        username: str = payload.get("sub")
-        if username is None:
+    with span("auth"):
+        try:
+            payload = decode_access_token(token)
+            username: str = payload.get("sub")
+            if username is None:
+                raise credentials_exception
+            token_data = TokenData(username=username)
+        except JWTError:
+            raise credentials_exception
+
+        try:
+            user_id = int(token_data.username)
+        except ValueError:
             raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
-        raise credentials_exception
 
-    user = db.query(User).filter(User.id == token_data.username).first()
+        user = await crud.user.aget_identity(db, id=user_id)
     if user is None:
         raise credentials_exception
     return user
 
 
 def get_current_active_superuser(
-    current_user: User = Depends(get_current_user),
-) -> User:
+    current_user: schemas.UserIdentity = Depends(get_current_user),
+) -> schemas.UserIdentity:
     """
     This function checks if the authenticated user is a superuser.
 
@@ -0,0 +1,125 @@
+"""
+This module serves pages rendered from templates without per-request data, such as the
+root index.html.
+
+A `CachedPage` renders its template once, and keeps the bytes, a content ETag and the
+compressed variants of the page until the template changes: serving it costs no rendering,
+hashing or compression, and a request whose If-None-Match matches gets an empty 304. With
+`reload` on (TEMPLATES_RELOAD=true, for development), the template file's mtime is checked on
+every request and the page is rebuilt when it changed; otherwise the file is never checked
+again once the page is built.
+"""
+
+import os
+import threading
+from typing import Any, Dict, Optional, Sequence
+
+from app.api.conditional import content_etag, etag_matches, not_modified
+from app.core.compression import ENCODINGS, Precompressed
+from fastapi import Request, Response
+from fastapi.templating import Jinja2Templates
+
+
+class _Build:
+    # A rendering of the page, for one modification time of its template
+    __slots__ = ("mtime", "page", "etag")
+
+    def __init__(self, mtime: Optional[float], page: Precompressed, etag: str):
+        self.mtime = mtime
+        self.page = page
+        self.etag = etag
+
+
+class CachedPage:
+    """
+    A page rendered from a template, cached with its ETag and compressed variants.
+
+    Args:
+        templates (Jinja2Templates): The templates to render it from.
+        name (str): The template name, e.g. "index.html".
+        context (Optional[Dict[str, Any]]): The template variables.
+        media_type (str): The media type of the page.
+        reload (bool): Rebuild the page when the template file is modified.
+        minimum_size (int): Pages smaller than this are not compressed.
+        gzip_level (int): The gzip compression level.
+        brotli_quality (int): The brotli quality.
+        encodings (Sequence[str]): The encodings to compress the page with.
+    """
+
+    def __init__(
+        self,
+        templates: Jinja2Templates,
+        name: str,
+        context: Optional[Dict[str, Any]] = None,
+        media_type: str = "text/html",
+        reload: bool = False,
+        minimum_size: int = 500,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        encodings: Sequence[str] = ENCODINGS,
+    ):
+        self.templates = templates
+        self.name = name
+        self.context = dict(context or {})
+        self.media_type = media_type
+        self.reload = reload
+        self.compression = {
+            "minimum_size": minimum_size,
+            "gzip_level": gzip_level,
+            "brotli_quality": brotli_quality,
+            "encodings": tuple(encodings),
+        }
+        self._build: Optional[_Build] = None
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """
+        Render and compress the page now, e.g. at startup, rather than on its first request.
+        """
+        self._get_build()
+
+    def response(self, request: Request) -> Response:
+        """
+        Build the response to a request for the page.
+
+        Args:
+            request (Request): The request.
+
+        Returns:
+            Response: The page in the encoding the client prefers, with its ETag, or a 304
+                if the client's copy is current.
+        """
+        build = self._get_build()
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, build.etag):
+            return not_modified(build.etag)
+        response = build.page.response(request)
+        response.headers["ETag"] = build.etag
+        return response
+
+    def _get_build(self) -> _Build:
+        build = self._build
+        if build is not None and not self.reload:
+            return build
+        mtime = self._mtime()
+        if build is not None and build.mtime == mtime:
+            return build
+        with self._lock:
+            # Another thread may have rebuilt the page while this one waited
+            build = self._build
+            if build is None or build.mtime != mtime:
+                build = self._render(mtime)
+                self._build = build
+        return build
+
+    def _render(self, mtime: Optional[float]) -> _Build:
+        body = self.templates.get_template(self.name).render(self.context).encode("utf-8")
+        page = Precompressed(body, self.media_type, **self.compression)
+        return _Build(mtime, page, content_etag(body))
+
+    def _mtime(self) -> Optional[float]:
+        filename = self.templates.get_template(self.name).filename
+        try:
+            return os.stat(filename).st_mtime if filename else None
+        except OSError:
+            return None
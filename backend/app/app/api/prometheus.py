@@ -0,0 +1,115 @@
+"""
+This module serves the metrics of all the workers of the host in the Prometheus text format
+at /metrics, and collects the figures that the application keeps outside the metrics store:
+database pool telemetry, cache counters and the password hashing queue.
+
+The endpoint is not part of the versioned API and does not use JWT authentication, so that
+a Prometheus server can scrape it. It requires the static bearer token METRICS_BEARER_TOKEN
+when one is set; otherwise only clients in METRICS_ALLOWED_NETWORKS, by default the loopback
+addresses, may scrape it, and others get a 404.
+"""
+
+import ipaddress
+import secrets
+from functools import lru_cache
+from typing import Dict, Iterator, List, Tuple, Union
+
+from app import crud
+from app.api.responses import FastJSONRoute
+from app.core.auth import token_cache
+from app.core.cache import FileCache, TTLCache
+from app.core.config import settings
+from app.core.metrics import CONTENT_TYPE, Labels, metrics_store
+from app.core.security import password_hasher
+from app.crud.crud_user import user_cache
+from app.db.session import pool_metrics
+from fastapi import APIRouter, HTTPException, Request, Response, status
+
+router = APIRouter(route_class=FastJSONRoute)
+
+
+@router.get("/metrics", include_in_schema=False)
+def read_prometheus_metrics(request: Request) -> Response:
+    """
+    Get the metrics of every worker of the host, added up, in the Prometheus text format.
+
+    Args:
+        request (Request): The scrape request.
+
+    Raises:
+        HTTPException: If metrics are off, the bearer token is missing or wrong, or, without
+            a token, the client is outside the allowed networks.
+
+    Returns:
+        Response: The text exposition.
+    """
+    token = settings.metrics.METRICS_BEARER_TOKEN
+    if metrics_store is None or (not token and not _is_allowed_client(request)):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if token and not secrets.compare_digest(
+        request.headers.get("authorization", ""), f"Bearer {token}"
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    metrics_store.publish(force=True)
+    return Response(metrics_store.render(), media_type=CONTENT_TYPE)
+
+
+@lru_cache(maxsize=1)
+def _allowed_networks() -> List[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]]:
+    return [
+        ipaddress.ip_network(network, strict=False)
+        for network in settings.metrics.METRICS_ALLOWED_NETWORKS
+    ]
+
+
+def _is_allowed_client(request: Request) -> bool:
+    if request.client is None:
+        return False
+    try:
+        address = ipaddress.ip_address(request.client.host)
+    except ValueError:
+        return False
+    return any(address in network for network in _allowed_networks())
+
+
+def collect_runtime_metrics() -> Iterator[Tuple[str, Labels, float]]:
+    """
+    Collect this worker's pool, cache and password hashing figures for the metrics store.
+
+    Returns:
+        Iterator[Tuple[str, Labels, float]]: (family, labels, value) samples.
+    """
+    for name, metrics in pool_metrics.items():
+        labels: Labels = (("engine", name),)
+        figures = metrics.snapshot()
+        if "pool_size" in figures:
+            yield "db_pool_size", labels, figures["pool_size"]
+        yield "db_pool_checked_out", labels, figures["checked_out"]
+        yield "db_pool_checkouts_total", labels, figures["checkouts"]
+        yield "db_pool_checkout_seconds_total", labels, metrics.checkout_seconds_total
+        yield "db_pool_overflow_events_total", labels, figures["overflow_events"]
+        yield "db_pool_timeouts_total", labels, figures["timeouts"]
+        yield "db_pool_connects_total", labels, figures["connects"]
+        yield "db_pool_invalidations_total", labels, figures["invalidations"]
+
+    caches: Dict[str, Union[TTLCache, FileCache]] = {
+        "token": token_cache,
+        "user": user_cache,
+    }
+    if crud.user.query_cache is not None:
+        caches["user_queries"] = crud.user.query_cache.backend
+    for name, cache in caches.items():
+        labels = (("cache", name),)
+        yield "cache_hits_total", labels, cache.hits
+        yield "cache_misses_total", labels, cache.misses
+        yield "cache_evictions_total", labels, cache.evictions
+        # A file cache's entries are shared by the workers, so adding them up would be wrong,
+        # and counting them means listing its directory
+        if isinstance(cache, TTLCache):
+            yield "cache_entries", labels, len(cache)
+
+    yield "password_hashing_pending", (), password_hasher.pending
@@ -0,0 +1,165 @@
+"""
+This module provides the application's JSON responses.
+
+FastAPI renders a route's return value in two passes: it validates it against the route's
+`response_model`, walks the validated model again with `jsonable_encoder` to turn it into
+plain Python data, then `json.dumps` that. With FAST_JSON_RESPONSES=true (and the "orjson"
+extra installed), the application and the API router use `FastJSONResponse` instead, which
+dumps with orjson, and the routes of a `FastJSONRoute` with a `response_model` turn the
+validated model into data with `.dict()` and dump it at once, skipping `jsonable_encoder`.
+The error handlers render their content directly with `json_response` too.
+"""
+
+import functools
+import inspect
+from typing import Any, Callable, Dict, Mapping, Optional, Type
+
+from app.core.config import settings
+from app.core.timing import TimedRoute
+from fastapi import Response
+from fastapi.dependencies.models import Dependant
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import _prepare_response_content
+from pydantic import BaseModel, ValidationError
+from pydantic.error_wrappers import ErrorWrapper
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    # Types that orjson does not know, e.g. Decimal or SecretStr, are encoded as FastAPI would
+    return jsonable_encoder(obj)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    A JSON response rendered with orjson.
+
+    Unlike FastAPI's `ORJSONResponse`, it accepts any content that `jsonable_encoder` does,
+    such as pydantic models or the bytes body of a validation error.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def _json_response_class() -> Type[JSONResponse]:
+    if not settings.FAST_JSON_RESPONSES:
+        return JSONResponse
+    if orjson is None:
+        raise RuntimeError(
+            "FAST_JSON_RESPONSES needs orjson; install the package's \"orjson\" extra"
+        )
+    return FastJSONResponse
+
+
+JSON_RESPONSE_CLASS = _json_response_class()
+"""
+The default response class of the application, per FAST_JSON_RESPONSES.
+"""
+
+
+def json_response(
+    content: Any, status_code: int = 200, headers: Optional[Mapping[str, str]] = None
+) -> JSONResponse:
+    """
+    Build a JSON response with the default response class.
+
+    Args:
+        content (Any): Anything that `jsonable_encoder` accepts.
+        status_code (int): The response status.
+        headers (Optional[Mapping[str, str]]): Extra response headers.
+
+    Returns:
+        JSONResponse: The response.
+    """
+    if JSON_RESPONSE_CLASS is FastJSONResponse:
+        return FastJSONResponse(content, status_code=status_code, headers=headers)
+    return JSONResponse(jsonable_encoder(content), status_code=status_code, headers=headers)
+
+
+class FastJSONRoute(TimedRoute):
+    """
+    A route that renders the return value of its endpoint itself when its response class
+    is `FastJSONResponse` and it has a `response_model`.
+
+    The route leaves the rendering to FastAPI when the endpoint returns a `Response`, when
+    it takes a `Response` parameter, whose headers and status FastAPI merges into the
+    response it builds, or when it sets `response_model_include` or
+    `response_model_exclude`.
+    """
+
+    def wrap_endpoint(self, endpoint: Callable[..., Any]) -> Callable[..., Any]:
+        call = super().wrap_endpoint(endpoint)
+        if not self._renders_models():
+            return call
+
+        if inspect.iscoroutinefunction(call):
+
+            @functools.wraps(call)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                return self._render(await call(*args, **kwargs))
+
+            return async_wrapper
+
+        # Sync endpoints run in the threadpool, and so does their rendering
+        @functools.wraps(call)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            return self._render(call(*args, **kwargs))
+
+        return wrapper
+
+    def _renders_models(self) -> bool:
+        response_class = getattr(self.response_class, "value", self.response_class)
+        return (
+            self.response_field is not None
+            and issubclass(response_class, FastJSONResponse)
+            and self.response_model_include is None
+            and self.response_model_exclude is None
+            and not _takes_response(self.dependant)
+        )
+
+    def _render(self, content: Any) -> Any:
+        if isinstance(content, Response):
+            return content
+        # The same validation as FastAPI's `serialize_response`
+        field = self.secure_cloned_response_field
+        content = _prepare_response_content(
+            content,
+            exclude_unset=self.response_model_exclude_unset,
+            exclude_defaults=self.response_model_exclude_defaults,
+            exclude_none=self.response_model_exclude_none,
+        )
+        value, errors = field.validate(content, {}, loc=("response",))
+        if errors:
+            raise ValidationError(
+                [errors] if isinstance(errors, ErrorWrapper) else errors, field.type_
+            )
+        options: Dict[str, Any] = {
+            "by_alias": self.response_model_by_alias,
+            "exclude_unset": self.response_model_exclude_unset,
+            "exclude_defaults": self.response_model_exclude_defaults,
+            "exclude_none": self.response_model_exclude_none,
+        }
+        status_code = 200 if self.status_code is None else self.status_code
+        return FastJSONResponse(_to_data(value, options), status_code=status_code)
+
+
+def _takes_response(dependant: Dependant) -> bool:
+    return dependant.response_param_name is not None or any(
+        _takes_response(sub) for sub in dependant.dependencies
+    )
+
+
+def _to_data(value: Any, options: Dict[str, Any]) -> Any:
+    if isinstance(value, BaseModel):
+        return value.dict(**options)
+    if isinstance(value, (list, tuple)):
+        return [_to_data(item, options) for item in value]
+    if isinstance(value, dict):
+        return {key: _to_data(item, options) for key, item in value.items()}
+    return value
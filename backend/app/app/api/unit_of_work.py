@@ -0,0 +1,102 @@
+"""
+This module runs API requests as units of work.
+
+Outside a unit of work, every CRUD write method commits on its own. The routes of a router
+created with `route_class=UnitOfWorkRoute` run each request as one unit of work instead: the
+sessions handed out by the `app.api.deps` session dependencies only flush their writes, and
+the route commits them once after the endpoint returns, or rolls them back if it raises. A
+request that writes several rows is therefore atomic and pays for a single commit.
+
+The commit happens in the route, before the response is sent, rather than after the `yield`
+of the session dependencies, which FastAPI only runs once the response has gone out and a
+failed commit can no longer be reported.
+
+Units of work are off unless DB_UNIT_OF_WORK=true. An endpoint decorated with
+`unit_of_work(True)` or `unit_of_work(False)` runs as one or not whatever the setting; routes
+that stream, or that write more than should be held in one transaction, such as the user
+import and export, opt out this way. Routes of a plain `APIRouter` always commit per call.
+"""
+
+from typing import Any, Callable, Coroutine, List, TypeVar, Union
+
+from app.api.conditional import ConditionalRoute
+from app.core.config import settings
+from app.core.timing import span
+from app.crud.base import UNIT_OF_WORK
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Request scope key holding the sessions of the request's unit of work
+SCOPE_KEY = "app.unit_of_work"
+
+
+def unit_of_work(enabled: bool) -> Callable[[F], F]:
+    """
+    Decorate an endpoint, below its route decorator, to run its requests as units of work or
+    not, whatever DB_UNIT_OF_WORK says.
+
+    Args:
+        enabled (bool): Whether the endpoint runs as a unit of work.
+    """
+
+    def decorate(endpoint: F) -> F:
+        endpoint.unit_of_work = enabled
+        return endpoint
+
+    return decorate
+
+
+def join_unit_of_work(request: Request, db: Union[Session, AsyncSession]) -> None:
+    """
+    Make a session part of the request's unit of work, if the route runs one.
+
+    Args:
+        request (Request): The current request.
+        db (Union[Session, AsyncSession]): The session handed to the endpoint.
+    """
+    sessions = request.scope.get(SCOPE_KEY)
+    if sessions is not None:
+        db.info[UNIT_OF_WORK] = True
+        sessions.append(db)
+
+
+class UnitOfWorkRoute(ConditionalRoute):
+    """
+    A route that commits the sessions of its request once the endpoint has returned, and
+    rolls them back if it raised, when DB_UNIT_OF_WORK or its endpoint's `unit_of_work`
+    says so.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        handler = super().get_route_handler()
+        # Called by the route's constructor, so the settings are read here
+        if not getattr(self.endpoint, "unit_of_work", settings.db.DB_UNIT_OF_WORK):
+            return handler
+
+        async def unit_of_work_handler(request: Request) -> Response:
+            sessions: List[Union[Session, AsyncSession]] = []
+            request.scope[SCOPE_KEY] = sessions
+            try:
+                response = await handler(request)
+                for db in sessions:
+                    await _end(db, commit=True)
+            except BaseException:
+                for db in sessions:
+                    await _end(db, commit=False)
+                raise
+            return response
+
+        return unit_of_work_handler
+
+
+async def _end(db: Union[Session, AsyncSession], commit: bool) -> None:
+    with span("commit" if commit else "rollback"):
+        if isinstance(db, Session):
+            # Sync sessions do blocking I/O, so keep it off the event loop
+            await run_in_threadpool(db.commit if commit else db.rollback)
+        else:
+            await (db.commit() if commit else db.rollback())
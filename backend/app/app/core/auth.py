@@ -1,16 +1,26 @@
 """
 This module provides the functionality for user authentication and token management. It includes
-functions for user authentication, and creation of access tokens.
+functions for user authentication, rehashing outdated passwords, and creation and verification
+of access tokens.
 """
 
+import hashlib
+import time
 from datetime import datetime, timedelta
-from typing import List, MutableMapping, Optional, Union
+from typing import Any, Dict, List, MutableMapping, Optional, Union
 
+from app import crud
+from app.core.cache import TTLCache
 from app.core.config import settings
-from app.core.security import verify_password
+from app.core.security import PasswordHashingBusy, password_hasher, password_needs_update
+from app.db.session import SessionLocal
 from app.models.user import User
+from fastapi import BackgroundTasks
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
+from loguru import logger
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.session import Session
 
 JWTPayloadMapping = MutableMapping[
@@ -20,32 +30,160 @@ JWTPayloadMapping = MutableMapping[
 # Define OAuth2 password bearer with a token URL
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
+# Verified claims keyed by the SHA-256 digest of the token they were decoded from
+token_cache = TTLCache(
+    maxsize=settings.auth.TOKEN_CACHE_SIZE,
+    ttl=settings.auth.TOKEN_CACHE_TTL_SECONDS,
+)
+
 
 def authenticate(
     *,
     email: str,
     password: str,
     db: Session,
+    background_tasks: Optional[BackgroundTasks] = None,
 ) -> Optional[User]:
     """
     Verifies the email and password to authenticate a user.
 
+    If the stored hash was made with an outdated scheme or cost, it is replaced after the
+    response has been sent, provided `background_tasks` is given.
+
     Args:
         email (str): The email of the user.
         password (str): The password of the user.
         db (Session): The database session.
+        background_tasks (Optional[BackgroundTasks]): Tasks to run once the response is sent.
 
     Returns:
         Optional[User]: The authenticated user if authentication is successful, otherwise None.
+
+    Raises:
+        PasswordHashingBusy: If the password hashing queue is full.
     """
-    user = db.query(User).filter(User.email == email).first()
+    # Never from the query cache, which may hold a password hash changed by another worker
+    user = crud.user.get_by_email(db, email=email, cached=False)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not password_hasher.verify(password, user.hashed_password):
         return None
+    if background_tasks is not None and password_needs_update(user.hashed_password):
+        background_tasks.add_task(
+            rehash_password,
+            user_id=user.id,
+            password=password,
+            old_hash=user.hashed_password,
+        )
     return user
 
 
+async def aauthenticate(
+    *,
+    email: str,
+    password: str,
+    db: AsyncSession,
+    background_tasks: Optional[BackgroundTasks] = None,
+) -> Optional[User]:
+    """
+    Verifies the email and password to authenticate a user, without blocking the event loop.
+
+    Behaves like `authenticate`, but queries through an async session and awaits the
+    password check from the hashing pool.
+
+    Args:
+        email (str): The email of the user.
+        password (str): The password of the user.
+        db (AsyncSession): The async database session.
+        background_tasks (Optional[BackgroundTasks]): Tasks to run once the response is sent.
+
+    Returns:
+        Optional[User]: The authenticated user if authentication is successful, otherwise None.
+
+    Raises:
+        PasswordHashingBusy: If the password hashing queue is full.
+    """
+    user = await crud.user.aget_by_email(db, email=email, cached=False)
+    if not user:
+        return None
+    if not await password_hasher.averify(password, user.hashed_password):
+        return None
+    if background_tasks is not None and password_needs_update(user.hashed_password):
+        background_tasks.add_task(
+            rehash_password,
+            user_id=user.id,
+            password=password,
+            old_hash=user.hashed_password,
+        )
+    return user
+
+
+def rehash_password(*, user_id: int, password: str, old_hash: str) -> None:
+    """
+    Replace an outdated password hash with one made using the current scheme and cost.
+
+    The update only applies if the stored hash is still `old_hash`, so a password change
+    that lands in the meantime is never overwritten.
+
+    Args:
+        user_id (int): The id of the user.
+        password (str): The verified plain text password.
+        old_hash (str): The outdated hash that was verified.
+    """
+    try:
+        new_hash = password_hasher.hash(password)
+    except PasswordHashingBusy:
+        # Not urgent; the hash is upgraded on a later login instead
+        logger.info(f"Skipping password rehash for user {user_id}: hashing queue is full")
+        return
+
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            update(User)
+            .where(User.id == user_id, User.hashed_password == old_hash)
+            .values(hashed_password=new_hash, version=User.version + 1)
+        )
+        db.commit()
+        user = db.get(User, user_id) if result.rowcount else None
+        if user is not None:
+            crud.user.invalidate_cache(db, db_obj=user)
+    finally:
+        db.close()
+
+
+def decode_access_token(token: str) -> Dict[str, Any]:
+    """
+    Verifies a JWT and returns its claims, reusing the result for tokens seen recently.
+
+    Only tokens whose signature and expiry have been verified are cached, keyed by the
+    digest of the full token, and an entry never outlives the token's "exp" claim. A
+    cache hit therefore skips signature verification safely.
+
+    Args:
+        token (str): The encoded JWT.
+
+    Raises:
+        JWTError: If the token is invalid or expired.
+
+    Returns:
+        Dict[str, Any]: The verified claims.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    payload = token_cache.get(key)
+    if payload is None:
+        payload = jwt.decode(
+            token,
+            settings.auth.JWT_SECRET,
+            algorithms=[settings.auth.ALGORITHM],
+            options={"verify_aud": False},
+        )
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            token_cache.set(key, payload, ttl=exp - time.time())
+    return dict(payload)
+
+
 def create_access_token(*, sub: str) -> str:
     """
     Creates an access token for a user.
@@ -0,0 +1,325 @@
+"""
+This module provides a small thread-safe in-process cache with a size cap and per-entry
+expiry. It backs the hot-path caches of the application, which are read from both the event
+loop and the threadpool, and keeps hit/miss counters so their effectiveness can be observed.
+
+`FileCache` offers the same interface over a directory, so that several worker processes can
+share entries.
+"""
+
+import hashlib
+import os
+import pickle
+import stat
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+# Prefix of the files that `FileCache.set` writes before moving them into place
+TEMPORARY_PREFIX = ".tmp-"
+# Seconds after which a temporary file is assumed to be left over by a crashed writer
+STALE_TEMPORARY_SECONDS = 60.0
+
+
+class TTLCache:
+    """
+    A bounded LRU cache whose entries expire after a time-to-live.
+
+    Expiry uses `time.monotonic`, so entries are unaffected by wall-clock adjustments.
+    A `maxsize` of 0 disables the cache: every lookup is a miss and nothing is stored.
+
+    Attributes:
+        maxsize: Maximum number of entries kept; the least recently used entry is evicted.
+        ttl: Default time-to-live of an entry in seconds.
+        hits: Number of lookups answered from the cache.
+        misses: Number of lookups that found no live entry.
+        evictions: Number of entries dropped to respect `maxsize`.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Look up a live entry, marking it as recently used.
+
+        Args:
+            key (Hashable): The cache key.
+            default (Any): Returned when there is no live entry.
+
+        Returns:
+            Any: The cached value, or `default`.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Store an entry, evicting the least recently used one if the cache is full.
+
+        Args:
+            key (Hashable): The cache key.
+            value (Any): The value to store.
+            ttl (Optional[float]): Time-to-live in seconds, capped at the cache default.
+        """
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable) -> None:
+        """
+        Remove an entry if present.
+
+        Args:
+            key (Hashable): The cache key.
+        """
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """
+        Remove every entry. Counters are kept.
+        """
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the cache size and counters.
+
+        Returns:
+            Dict[str, int]: Current size, capacity, hits, misses and evictions.
+        """
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class FileCache:
+    """
+    A cache stored as one file per entry in a directory, shared by every process using the
+    same directory, e.g. the gunicorn workers of a host. Put the directory on a tmpfs such as
+    /dev/shm to keep it in memory.
+
+    Entries are pickled together with their expiry time and written atomically. Expiry uses
+    the wall clock, which all processes share. Expired entries are deleted when read, and the
+    directory is swept every `prune_every` writes, so entries that are never read again do not
+    pile up. Sweeps leave the temporary files of writes in progress alone, and a write that
+    loses its temporary file to a concurrent sweep is dropped, like a miss. The directory is
+    created private to the current user, since entries are unpickled when read.
+
+    Attributes:
+        directory: Where the entries are stored.
+        ttl: Default time-to-live of an entry in seconds.
+        hits: Number of lookups answered from the cache by this process.
+        misses: Number of lookups by this process that found no live entry.
+        evictions: Number of expired entries deleted by this process's sweeps.
+    """
+
+    def __init__(self, directory: str, ttl: float, prune_every: int = 1000):
+        make_private_directory(directory)
+        self.directory = directory
+        self.ttl = ttl
+        self.prune_every = prune_every
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Look up a live entry.
+
+        Args:
+            key (Hashable): The cache key; its `repr` must be stable across processes.
+            default (Any): Returned when there is no live entry.
+
+        Returns:
+            Any: The cached value, or `default`.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                expires_at, value = pickle.load(file)
+        except FileNotFoundError:
+            expires_at = None
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            # A torn or foreign file; drop it
+            expires_at = 0.0
+        if expires_at is not None and expires_at > time.time():
+            self.hits += 1
+            return value
+        if expires_at is not None:
+            self._unlink(path)
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Store an entry, replacing any previous one atomically.
+
+        Args:
+            key (Hashable): The cache key.
+            value (Any): The value to store; it must be picklable.
+            ttl (Optional[float]): Time-to-live in seconds, capped at the cache default.
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        expires_at = time.time() + ttl
+        try:
+            fd, temporary = tempfile.mkstemp(dir=self.directory, prefix=TEMPORARY_PREFIX)
+        except OSError:
+            return
+        try:
+            with os.fdopen(fd, "wb") as file:
+                pickle.dump((expires_at, value), file, protocol=pickle.HIGHEST_PROTOCOL)
+            # The modification time carries the expiry, so sweeps need not read the file
+            os.utime(temporary, (expires_at, expires_at))
+            os.replace(temporary, self._path(key))
+        except OSError:
+            # E.g. a full disk, or the file removed by another process; the entry is not cached
+            self._unlink(temporary)
+            return
+        except BaseException:
+            self._unlink(temporary)
+            raise
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self.prune_every == 0
+        if prune:
+            self.prune()
+
+    def pop(self, key: Hashable) -> None:
+        """
+        Remove an entry if present.
+
+        Args:
+            key (Hashable): The cache key.
+        """
+        self._unlink(self._path(key))
+
+    def clear(self) -> None:
+        """
+        Remove every entry, for all processes. Counters are kept.
+        """
+        for name in os.listdir(self.directory):
+            if not name.startswith(TEMPORARY_PREFIX):
+                self._unlink(os.path.join(self.directory, name))
+
+    def prune(self) -> None:
+        """
+        Delete expired entries, and temporary files left over by crashed writers.
+        """
+        now = time.time()
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                mtime = os.stat(path).st_mtime
+            except FileNotFoundError:
+                continue
+            if name.startswith(TEMPORARY_PREFIX):
+                # Until it is moved into place, a file's mtime is when its write started
+                if mtime <= now - STALE_TEMPORARY_SECONDS:
+                    self._unlink(path)
+            elif mtime <= now:
+                self._unlink(path)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the number of stored entries and this process's counters.
+
+        Returns:
+            Dict[str, int]: Current size, hits, misses and evictions.
+        """
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def _path(self, key: Hashable) -> str:
+        digest = hashlib.sha256(repr(key).encode()).hexdigest()
+        return os.path.join(self.directory, digest)
+
+    @staticmethod
+    def _unlink(path: str) -> None:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def __len__(self) -> int:
+        return sum(
+            not name.startswith(TEMPORARY_PREFIX) for name in os.listdir(self.directory)
+        )
+
+
+def make_private_directory(path: str) -> None:
+    """
+    Create a directory only the current user can access, or check that an existing one is.
+
+    Args:
+        path (str): The directory.
+
+    Raises:
+        PermissionError: If the directory is a symlink or not a directory, is not owned by
+            the current user, is accessible to group or others, or its parent lets other
+            users rename it: the parent must belong to the current user or root, and be
+            sticky, like /dev/shm and /tmp, if others can write to it.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(
+            f"{path} is not a directory owned by the current user; refusing to use it"
+        )
+    if info.st_mode & 0o077:
+        raise PermissionError(
+            f"{path} is accessible to other users (mode {stat.S_IMODE(info.st_mode):o}); "
+            "refusing to use it"
+        )
+    parent = os.stat(os.path.dirname(os.path.abspath(path)))
+    if parent.st_uid not in (0, os.getuid()) or (
+        parent.st_mode & 0o022 and not parent.st_mode & stat.S_ISVTX
+    ):
+        raise PermissionError(
+            f"Other users could replace {path} through its parent directory; "
+            "refusing to use it"
+        )
@@ -0,0 +1,282 @@
+"""
+This module compresses HTTP responses with gzip or, if the "brotli" extra is installed,
+brotli, whichever the client prefers according to its Accept-Encoding header.
+
+`CompressionMiddleware` is a pure ASGI middleware. It compresses the responses of text-like
+content types (HTML, JSON, NDJSON, CSV, ...) that are at least `minimum_size` bytes in one go,
+and the responses whose body comes in several messages, like a `StreamingResponse`, chunk by
+chunk: each chunk is flushed to the client as soon as it is compressed, so a stream is not
+held back by the compression.
+
+Bodies that do not change between requests, such as pages rendered from templates without
+per-request data, can be compressed once with `Precompressed`; its responses carry their
+Content-Encoding already, which the middleware leaves alone.
+"""
+
+import zlib
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+
+from app.core.timing import span
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+ENCODINGS: Tuple[str, ...] = ("br", "gzip") if brotli is not None else ("gzip",)
+"""
+The available encodings, the preferred first.
+"""
+
+# Media types worth compressing, besides text/*, "+json" and "+xml" types
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+}
+
+
+@lru_cache(maxsize=256)
+def negotiate(
+    accept_encoding: str, encodings: Sequence[str] = ENCODINGS
+) -> Optional[str]:
+    """
+    Pick the encoding to use for a client.
+
+    Args:
+        accept_encoding (str): The request's Accept-Encoding header, e.g. "gzip, br;q=0.8".
+        encodings (Sequence[str]): The encodings on offer, the preferred first.
+
+    Returns:
+        Optional[str]: The encoding with the highest quality value for the client, the
+            preferred one on a tie, or None if the client accepts none of them.
+    """
+    qualities: Dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+    chosen, best = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > best:
+            chosen, best = encoding, quality
+    return chosen
+
+
+def is_compressible(content_type: str) -> bool:
+    """
+    Tell whether responses of a content type are worth compressing.
+
+    Args:
+        content_type (str): The Content-Type header, e.g. "text/html; charset=utf-8".
+
+    Returns:
+        bool: True for text-like media types.
+    """
+    media_type = content_type.partition(";")[0].strip().lower()
+    return (
+        media_type.startswith("text/")
+        or media_type in COMPRESSIBLE_TYPES
+        or media_type.endswith(("+json", "+xml"))
+    )
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    """
+    Compress a whole body.
+
+    Args:
+        body (bytes): The body.
+        encoding (str): "br" or "gzip".
+        level (int): The brotli quality (0 to 11) or gzip level (1 to 9).
+
+    Returns:
+        bytes: The compressed body.
+    """
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(body) + compressor.flush()
+
+
+def add_vary(headers: MutableHeaders, name: str = "Accept-Encoding") -> None:
+    """
+    Add a request header to the Vary response header, unless it is there already.
+
+    Args:
+        headers (MutableHeaders): The response headers.
+        name (str): The request header the response varies on.
+    """
+    vary = headers.get("vary")
+    if vary is None:
+        headers["Vary"] = name
+    elif name.lower() not in (item.strip().lower() for item in vary.split(",")):
+        headers["Vary"] = f"{vary}, {name}"
+
+
+class _StreamCompressor:
+    # Compresses a body chunk by chunk, flushing each chunk so that it can be sent at once
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=level)
+        else:
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(chunk) + self._brotli.flush()
+        return self._zlib.compress(chunk) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """
+    Compress responses in the encoding the client prefers.
+
+    Args:
+        app (ASGIApp): The application to wrap.
+        minimum_size (int): Bodies sent in one message are compressed from this many bytes.
+        gzip_level (int): The gzip compression level, from 1 (fastest) to 9 (smallest).
+        brotli_quality (int): The brotli quality, from 0 (fastest) to 11 (smallest).
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 500,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {"gzip": gzip_level, "br": brotli_quality}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        start: Optional[Message] = None
+        compressor: Optional[_StreamCompressor] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Held back until the first body message tells whether to compress
+                start = message
+                return
+            if compressor is not None:
+                body = compressor.compress(message.get("body", b""))
+                if not message.get("more_body", False):
+                    body += compressor.finish()
+                await send({**message, "body": body})
+                return
+
+            headers = MutableHeaders(raw=list(start.get("headers", ())))
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if "content-encoding" in headers or not is_compressible(
+                headers.get("content-type", "")
+            ):
+                passthrough = True
+            else:
+                add_vary(headers)
+                passthrough = encoding is None or (
+                    not more_body and len(body) < max(self.minimum_size, 1)
+                )
+            if passthrough:
+                await send({**start, "headers": headers.raw})
+                await send(message)
+                return
+
+            level = self.levels[encoding]
+            headers["Content-Encoding"] = encoding
+            if more_body:
+                del headers["Content-Length"]
+                compressor = _StreamCompressor(encoding, level)
+                body = compressor.compress(body)
+            else:
+                with span("compress"):
+                    body = compress(body, encoding, level)
+                headers["Content-Length"] = str(len(body))
+            await send({**start, "headers": headers.raw})
+            await send({**message, "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+class Precompressed:
+    """
+    A response body compressed ahead of time in every available encoding.
+
+    Args:
+        body (bytes): The uncompressed body.
+        media_type (str): Its media type, e.g. "text/html".
+        minimum_size (int): Bodies smaller than this are not compressed.
+        gzip_level (int): The gzip compression level.
+        brotli_quality (int): The brotli quality.
+        encodings (Sequence[str]): The encodings to compress the body with.
+    """
+
+    def __init__(
+        self,
+        body: bytes,
+        media_type: str,
+        minimum_size: int = 500,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        encodings: Sequence[str] = ENCODINGS,
+    ):
+        self.body = body
+        self.media_type = media_type
+        levels = {"gzip": gzip_level, "br": brotli_quality}
+        self.variants: Dict[str, bytes] = {}
+        if len(body) >= max(minimum_size, 1):
+            for encoding in encodings:
+                compressed = compress(body, encoding, levels[encoding])
+                if len(compressed) < len(body):
+                    self.variants[encoding] = compressed
+
+    def response(self, request: Request, status_code: int = 200) -> Response:
+        """
+        Build a response with the variant of the body that the client prefers.
+
+        Args:
+            request (Request): The request to respond to.
+            status_code (int): The response status.
+
+        Returns:
+            Response: The response.
+        """
+        headers = {"Vary": "Accept-Encoding"}
+        encoding = negotiate(request.headers.get("accept-encoding", ""), tuple(self.variants))
+        if encoding is None:
+            return Response(self.body, status_code, headers, self.media_type)
+        headers["Content-Encoding"] = encoding
+        return Response(self.variants[encoding], status_code, headers, self.media_type)
@@ -10,7 +10,7 @@ import sys
 from dotenv import load_dotenv, find_dotenv
 from app.core.logging import InterceptHandler
 from pydantic import AnyHttpUrl, BaseSettings, EmailStr, Field, validator
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 
 # Load environment variables from .env file
 load_dotenv(find_dotenv())
@@ -22,13 +22,99 @@ ROOT = pathlib.Path(__file__).resolve().parent.parent
 class DBSettings(BaseSettings):
     # SQLAlchemy database URI
     SQLALCHEMY_DATABASE_URI: str
+    # Read replica URIs, as a JSON list, used by read sessions (get_read_db)
+    SQLALCHEMY_REPLICA_URIS: List[str] = []
+    # Seconds a replica is left out of rotation after a connection failure
+    DB_REPLICA_EJECT_SECONDS: float = 30
+    # Connections kept per pool and extra connections allowed under load (per engine, per worker)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # Seconds to wait for a free connection before failing the request
+    DB_POOL_TIMEOUT: float = 30
+    # Seconds after which a connection is replaced (-1 keeps connections indefinitely)
+    DB_POOL_RECYCLE: int = 1800
+    # Test each connection with a lightweight ping when it is checked out
+    DB_POOL_PRE_PING: bool = True
+    # Profile applied to each connection of a file-backed SQLite database
+    SQLITE_JOURNAL_MODE: str = "WAL"
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    # Bytes of the database file to memory-map (256 MiB)
+    SQLITE_MMAP_SIZE: int = 268435456
+    # Page cache size; negative values are KiB (64 MiB)
+    SQLITE_CACHE_SIZE: int = -65536
+    # Milliseconds a connection waits for a lock before raising "database is locked"
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    # Commit the writes of an API request once at the end instead of per CRUD call, on the
+    # routes that do not choose for themselves with `unit_of_work`
+    DB_UNIT_OF_WORK: bool = False
+    # Cache for single-record lookups (get, get_by_email): None (off), "memory" or "file";
+    # "memory" is per process, so with several workers writes only reach the writer's cache
+    QUERY_CACHE_BACKEND: Optional[str] = None
+    # Seconds a found record, and a lookup that found nothing, stay cached
+    QUERY_CACHE_TTL_SECONDS: float = 30
+    QUERY_CACHE_NEGATIVE_TTL_SECONDS: float = 5
+    # Entries kept per model by the memory backend
+    QUERY_CACHE_SIZE: int = 10000
+    # Directory shared by the workers for the file backend, preferably on a tmpfs
+    QUERY_CACHE_DIR: Optional[str] = None
     # Superuser credentials
     FIRST_SUPERUSER: EmailStr
     FIRST_SUPERUSER_PW: str
 
 class LoggingSettings(BaseSettings):
     LOGGING_LEVEL: int = logging.INFO  # logging levels are ints
+    # Write log records from a background thread instead of the thread that logs them
+    LOGGING_ENQUEUE: bool = True
+    # Share of requests logged (0 to 1), and overrides per path template as a JSON object,
+    # e.g. {"/ping": 0, "/api/v1/auth/me": 0.01}; failed requests are always logged
+    REQUEST_LOG_SAMPLE_RATE: float = 1.0
+    REQUEST_LOG_ROUTE_SAMPLE_RATES: Dict[str, float] = {}
+    # Requests taking at least this many milliseconds are always logged (None disables)
+    REQUEST_LOG_SLOW_MS: Optional[float] = 500
+    # Break request handling time down into spans (get_db, auth, crud, db, render, commit)
+    # in a Server-Timing response header, and in the request log lines; the header tells
+    # any client, authenticated or not, e.g. whether its credentials hit a cache, so keep it
+    # for development and trusted networks
+    SERVER_TIMING: bool = False
+    REQUEST_LOG_TIMINGS: bool = False
     
+class MetricsSettings(BaseSettings):
+    # Expose Prometheus metrics at /metrics, aggregated over the workers of the host
+    METRICS_ENABLED: bool = True
+    # Directory shared by the workers for their metric files, preferably on a tmpfs;
+    # by default one per gunicorn master under /dev/shm, private to the current user
+    METRICS_DIR: Optional[str] = None
+    # Upper bounds of the request latency histogram buckets, in seconds
+    METRICS_LATENCY_BUCKETS: List[float] = [
+        0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+    ]
+    # Seconds between copies of each worker's pool and cache figures into its metric files
+    METRICS_PUBLISH_INTERVAL_SECONDS: float = 1
+    # If set, scrapes of /metrics must send "Authorization: Bearer <token>"
+    METRICS_BEARER_TOKEN: Optional[str] = None
+    # Without a token, only clients in these networks may scrape /metrics (the direct peer's
+    # address, so a proxy in front of the app must not be listed)
+    METRICS_ALLOWED_NETWORKS: List[str] = ["127.0.0.0/8", "::1/128"]
+
+
+class CompressionSettings(BaseSettings):
+    # Compress text-like responses with gzip, or brotli with the "brotli" extra installed
+    COMPRESSION_ENABLED: bool = True
+    # Responses sent in one piece are compressed from this many bytes; streams always are
+    COMPRESSION_MINIMUM_SIZE: int = 500
+    # gzip level (1 fastest to 9 smallest) and brotli quality (0 fastest to 11 smallest)
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
+
+
+class HTTPCacheSettings(BaseSettings):
+    # Add ETags to the GET responses of the API and answer matching If-None-Match with a 304
+    HTTP_ETAGS: bool = True
+    # Cache-Control header per path template as a JSON object, overriding the routes' own,
+    # e.g. {"/api/v1/auth/me": "private, max-age=5"}
+    HTTP_CACHE_CONTROL: Dict[str, str] = {}
+
+
 class AuthSettings(BaseSettings):
     LOGGING_LEVEL: int = logging.INFO  # logging levels are ints
     # Secret key for JWT generation and verification
@@ -37,6 +123,24 @@ class AuthSettings(BaseSettings):
     ALGORITHM: str = Field(..., env="JWT_ALGORITHM")
     # Expiry time for the access token in minutes (60 min/hr * 24 hr/day * 8 days = 8 days)
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    # Worker processes for password hashing (None = one per CPU, 0 = hash on the calling thread)
+    PASSWORD_HASH_WORKERS: Optional[int] = None
+    # Hashing jobs allowed in flight before logins and signups are shed with a 503
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    # Password hash schemes; the first hashes new passwords, the others are upgraded on login
+    PASSWORD_SCHEMES: List[str] = ["bcrypt"]
+    # bcrypt cost factor (log2 of the number of rounds)
+    BCRYPT_ROUNDS: int = 12
+    # argon2 time cost (iterations), memory cost (KiB) and parallelism (lanes)
+    ARGON2_TIME_COST: int = 2
+    ARGON2_MEMORY_COST: int = 102400
+    ARGON2_PARALLELISM: int = 8
+    # Verified JWT claims cached per token (0 disables) and the longest an entry may live
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_CACHE_TTL_SECONDS: int = 300
+    # Authenticated user snapshots cached per id (0 disables) and how long they stay fresh
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: int = 60
 
 
 class Settings(BaseSettings):
@@ -47,6 +151,14 @@ class Settings(BaseSettings):
     # API version
     API_V1_STR: str = "/api/v1"
 
+    # Render JSON responses with orjson, and skip re-encoding response models (needs the
+    # "orjson" extra)
+    FAST_JSON_RESPONSES: bool = False
+
+    # Rebuild cached pages, such as the root index.html, when their template file changes
+    # (for development; otherwise templates are only read at startup)
+    TEMPLATES_RELOAD: bool = False
+
 
 
     # List of origins for CORS (Cross-Origin Resource Sharing)
@@ -75,6 +187,9 @@ class Settings(BaseSettings):
     db: DBSettings = DBSettings()
     logging: LoggingSettings = LoggingSettings()
     auth: AuthSettings = AuthSettings()
+    metrics: MetricsSettings = MetricsSettings()
+    compression: CompressionSettings = CompressionSettings()
+    http_cache: HTTPCacheSettings = HTTPCacheSettings()
 
     class Config:
         case_sensitive = True
@@ -88,7 +203,13 @@ def setup_app_logging(config: Settings) -> None:
         logging_logger.handlers = [InterceptHandler(level=config.logging.LOGGING_LEVEL)]
 
     logger.configure(
-        handlers=[{"sink": sys.stderr, "level": config.logging.LOGGING_LEVEL}]
+        handlers=[
+            {
+                "sink": sys.stderr,
+                "level": config.logging.LOGGING_LEVEL,
+                "enqueue": config.logging.LOGGING_ENQUEUE,
+            }
+        ]
     )
 
 # Instantiate the settings
@@ -1,11 +1,15 @@
 import logging
+import sys
 from types import FrameType
-from typing import cast
+from typing import Dict, Optional, Tuple
 
 from loguru import logger
 
 
 class InterceptHandler(logging.Handler):
+    # Stack depth of the caller per logging call site; call sites are bounded by the code
+    _depths: Dict[Tuple[str, int], int] = {}
+
     def emit(self, record: logging.LogRecord) -> None:  # pragma: no cover
         # Get corresponding Loguru level if it exists
         try:
@@ -13,11 +17,18 @@ class InterceptHandler(logging.Handler):
         except ValueError:
             level = str(record.levelno)
 
-        # Find caller from where originated the logged message
-        frame, depth = logging.currentframe(), 2
-        while frame.f_code.co_filename == logging.__file__:  # noqa: WPS609
-            frame = cast(FrameType, frame.f_back)
-            depth += 1
+        # Find caller from where originated the logged message; a given call site always
+        # goes through the same logging frames, so its depth is only walked once
+        site = (record.pathname, record.lineno)
+        depth = self._depths.get(site)
+        if depth is None:
+            # Skip this frame, then the frames of the logging module
+            frame: Optional[FrameType] = sys._getframe()  # noqa: WPS437
+            depth = 0
+            while frame and (depth == 0 or frame.f_code.co_filename == logging.__file__):
+                frame = frame.f_back
+                depth += 1
+            self._depths[site] = depth
 
         logger.opt(depth=depth, exception=record.exc_info).log(
             level,
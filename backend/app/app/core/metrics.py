@@ -0,0 +1,499 @@
+"""
+This module keeps Prometheus metrics in memory-mapped files, so that the figures of all the
+worker processes of a host can be aggregated without an external service.
+
+Every process writes its own files in a shared directory: one for counters and histograms,
+one for gauges. Each file is a list of (key, float64) entries that only its process appends
+to or updates in place, so writers never lock each other. A scrape, served by any worker,
+reads every file of the directory and adds the values up. Counters of workers that have exited
+keep counting towards the totals, while their gauges are dropped, as are the gauges a process
+finds under its own pid when it starts recording.
+
+Request counts, latency histograms and in-flight requests are recorded by
+`RequestLogMiddleware`. Figures kept elsewhere, such as pool and cache counters, come from
+collectors added with `MetricsStore.add_collector`; each worker copies them into its files
+every `publish_interval` seconds from a background thread, off the request path, and before
+serving a scrape.
+
+By default the directory is created under /dev/shm, in a directory private to the current
+user, per gunicorn master process (the parent of the workers), and directories left behind by
+masters that are no longer running are removed. The files are never opened through symlinks.
+"""
+
+import bisect
+import json
+import math
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from app.core.cache import make_private_directory
+from app.core.config import settings
+from loguru import logger
+
+# Label names and values of a sample, in a fixed order
+Labels = Tuple[Tuple[str, str], ...]
+
+# (family, sample name, labels) of a stored value
+SampleKey = Tuple[str, str, Labels]
+
+# The metric families that can be recorded: type and help text, in exposition order
+FAMILIES: Dict[str, Tuple[str, str]] = {
+    "http_requests_total": (
+        "counter",
+        "HTTP requests handled, by method, route template and status code.",
+    ),
+    "http_request_duration_seconds": (
+        "histogram",
+        "Time until the response started, by method and route template.",
+    ),
+    "http_requests_in_progress": ("gauge", "HTTP requests being handled."),
+    "db_pool_size": ("gauge", "Connections the pool keeps, by engine."),
+    "db_pool_checked_out": ("gauge", "Connections currently checked out, by engine."),
+    "db_pool_checkouts_total": ("counter", "Connections handed out, by engine."),
+    "db_pool_checkout_seconds_total": (
+        "counter",
+        "Time spent waiting for a connection, by engine.",
+    ),
+    "db_pool_overflow_events_total": (
+        "counter",
+        "Checkouts that opened a connection beyond the pool size, by engine.",
+    ),
+    "db_pool_timeouts_total": (
+        "counter",
+        "Checkouts that gave up waiting for a connection, by engine.",
+    ),
+    "db_pool_connects_total": ("counter", "Database connections opened, by engine."),
+    "db_pool_invalidations_total": (
+        "counter",
+        "Connections discarded after an error, by engine.",
+    ),
+    "cache_hits_total": ("counter", "Lookups answered from the cache, by cache."),
+    "cache_misses_total": ("counter", "Lookups that found no live entry, by cache."),
+    "cache_evictions_total": ("counter", "Entries evicted or pruned, by cache."),
+    "cache_entries": ("gauge", "Entries held by in-process caches, by cache."),
+    # Computed from the hits and misses when rendering
+    "cache_hit_ratio": (
+        "gauge",
+        "Share of lookups answered from the cache since the workers started, by cache.",
+    ),
+    "password_hashing_pending": ("gauge", "Password hashing jobs in flight."),
+}
+
+# Media type of the Prometheus text exposition format; the response adds the UTF-8 charset
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+_HEADER = struct.Struct("<q")
+_LENGTH = struct.Struct("<i")
+_VALUE = struct.Struct("<d")
+_INITIAL_FILE_SIZE = 64 * 1024
+
+
+class _MetricFile:
+    """
+    A memory-mapped file of (key, float64) entries, written by a single process.
+
+    Layout: an 8-byte count of the bytes in use, then entries made of a 4-byte key length,
+    the UTF-8 JSON key padded to a multiple of 8 bytes, and an 8-byte value.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # Never follow a symlink planted in place of the file
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        self._file = os.fdopen(fd, "r+b")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < _INITIAL_FILE_SIZE:
+            self._file.truncate(_INITIAL_FILE_SIZE)
+            size = _INITIAL_FILE_SIZE
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+        self._used = _HEADER.unpack_from(self._mmap, 0)[0] or _HEADER.size
+        self._offsets: Dict[SampleKey, int] = {
+            _decode_key(key): offset for key, offset in _entries(self._mmap, self._used)
+        }
+
+    def add(self, key: SampleKey, amount: float) -> None:
+        offset = self._offset(key)
+        value = _VALUE.unpack_from(self._mmap, offset)[0]
+        _VALUE.pack_into(self._mmap, offset, value + amount)
+
+    def set(self, key: SampleKey, value: float) -> None:
+        _VALUE.pack_into(self._mmap, self._offset(key), value)
+
+    def close(self) -> None:
+        self._mmap.close()
+        self._file.close()
+
+    def _offset(self, key: SampleKey) -> int:
+        offset = self._offsets.get(key)
+        if offset is None:
+            offset = self._offsets[key] = self._append(key)
+        return offset
+
+    def _append(self, key: SampleKey) -> int:
+        encoded = json.dumps([key[0], key[1], [list(label) for label in key[2]]]).encode()
+        padded = len(encoded) + (-(_LENGTH.size + len(encoded)) % 8)
+        size = _LENGTH.size + padded + _VALUE.size
+        if self._used + size > len(self._mmap):
+            self._grow(self._used + size)
+        start = self._used
+        _LENGTH.pack_into(self._mmap, start, len(encoded))
+        self._mmap[start + _LENGTH.size : start + _LENGTH.size + len(encoded)] = encoded
+        _VALUE.pack_into(self._mmap, start + _LENGTH.size + padded, 0.0)
+        # Readers only look at entries below the header, so publish the entry last
+        self._used += size
+        _HEADER.pack_into(self._mmap, 0, self._used)
+        return start + _LENGTH.size + padded
+
+    def _grow(self, needed: int) -> None:
+        size = len(self._mmap)
+        while size < needed:
+            size *= 2
+        self._mmap.close()
+        self._file.truncate(size)
+        self._mmap = mmap.mmap(self._file.fileno(), size)
+
+
+class MetricsStore:
+    """
+    The metrics of the current process, recorded in memory-mapped files shared with the other
+    workers of the host, and the aggregation of all of them.
+
+    Attributes:
+        directory: Where the files of every worker are stored.
+        buckets: Upper bounds of the histogram buckets, in seconds.
+        publish_interval: Seconds between copies of the collectors' figures into the files.
+    """
+
+    def __init__(
+        self, directory: str, buckets: Sequence[float], publish_interval: float = 1
+    ):
+        make_private_directory(directory)
+        self.directory = directory
+        self.buckets = tuple(sorted(buckets))
+        self.publish_interval = publish_interval
+        self._collectors: List[Callable[[], Iterable[Tuple[str, Labels, float]]]] = []
+        self._files: Dict[str, _MetricFile] = {}
+        self._pid: Optional[int] = None
+        self._published_at = -math.inf
+        self._lock = threading.Lock()
+        self._publisher: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def inc(self, family: str, labels: Labels = (), amount: float = 1.0) -> None:
+        """
+        Add to a counter or gauge of this process.
+
+        Args:
+            family (str): A counter or gauge family of `FAMILIES`.
+            labels (Labels): The sample's labels.
+            amount (float): The amount to add; negative to decrease a gauge.
+        """
+        with self._lock:
+            self._file(family).add((family, family, labels), amount)
+
+    def set(self, family: str, labels: Labels, value: float) -> None:
+        """
+        Set a counter or gauge of this process, e.g. from a collector.
+
+        Args:
+            family (str): A counter or gauge family of `FAMILIES`.
+            labels (Labels): The sample's labels.
+            value (float): The new value.
+        """
+        with self._lock:
+            self._file(family).set((family, family, labels), value)
+
+    def observe(self, family: str, labels: Labels, value: float) -> None:
+        """
+        Record an observation in a histogram of this process.
+
+        Args:
+            family (str): A histogram family of `FAMILIES`.
+            labels (Labels): The sample's labels, without "le".
+            value (float): The observed value.
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        le = repr(float(self.buckets[index])) if index < len(self.buckets) else "+Inf"
+        with self._lock:
+            file = self._file(family)
+            # Buckets are stored individually and made cumulative when rendered
+            file.add((family, f"{family}_bucket", labels + (("le", le),)), 1.0)
+            file.add((family, f"{family}_sum", labels), value)
+            file.add((family, f"{family}_count", labels), 1.0)
+
+    def add_collector(
+        self, collector: Callable[[], Iterable[Tuple[str, Labels, float]]]
+    ) -> None:
+        """
+        Add a function returning (family, labels, value) samples of figures kept elsewhere.
+
+        Args:
+            collector (Callable[[], Iterable[Tuple[str, Labels, float]]]): The collector.
+        """
+        self._collectors.append(collector)
+
+    def publish(self, force: bool = False) -> None:
+        """
+        Copy the collectors' figures into this process's files, unless that was done less
+        than `publish_interval` seconds ago.
+
+        Args:
+            force (bool): Publish regardless of the interval, e.g. before a scrape.
+        """
+        now = time.monotonic()
+        if not force and now - self._published_at < self.publish_interval:
+            return
+        self._published_at = now
+        for collector in self._collectors:
+            for family, labels, value in collector():
+                self.set(family, labels, value)
+
+    def start_publishing(self) -> None:
+        """
+        Publish the collectors' figures every `publish_interval` seconds from a daemon thread
+        of this process, until the store is closed.
+        """
+        if self._publisher is not None and self._publisher.is_alive():
+            return
+        self._stopped.clear()
+        self._publisher = threading.Thread(
+            target=self._publish_periodically, name="metrics-publisher", daemon=True
+        )
+        self._publisher.start()
+
+    def collect(self) -> Dict[SampleKey, float]:
+        """
+        Add up the samples of every worker's files.
+
+        Returns:
+            Dict[SampleKey, float]: The aggregated value of each sample.
+        """
+        totals: Dict[SampleKey, float] = {}
+        for name in os.listdir(self.directory):
+            kind, _, pid = name[: -len(".db")].partition("_")
+            if not (name.endswith(".db") and pid.isdigit()):
+                continue
+            path = os.path.join(self.directory, name)
+            if kind == "gauge" and not _is_alive(int(pid)):
+                _unlink(path)
+                continue
+            for key, value in _read(path):
+                totals[key] = totals.get(key, 0.0) + value
+        return totals
+
+    def render(self) -> str:
+        """
+        Render the aggregated metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition, one family after another.
+        """
+        samples: Dict[str, List[Tuple[str, Labels, float]]] = {}
+        for (family, sample, labels), value in self.collect().items():
+            samples.setdefault(family, []).append((sample, labels, value))
+        samples["cache_hit_ratio"] = list(_hit_ratios(samples))
+
+        lines = []
+        for family, (kind, help_text) in FAMILIES.items():
+            family_samples = samples.get(family)
+            if not family_samples:
+                continue
+            lines.append(f"# HELP {family} {help_text}")
+            lines.append(f"# TYPE {family} {kind}")
+            if kind == "histogram":
+                family_samples = list(self._cumulative(family, family_samples))
+            for sample, labels, value in sorted(family_samples, key=_sort_key):
+                lines.append(f"{sample}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def close(self) -> None:
+        """
+        Close this process's files and drop its gauges, e.g. when the worker shuts down.
+        """
+        self._stopped.set()
+        if self._publisher is not None:
+            self._publisher.join(timeout=self.publish_interval + 1)
+            self._publisher = None
+        with self._lock:
+            for kind, file in self._files.items():
+                file.close()
+                if kind == "gauge":
+                    _unlink(file.path)
+            self._files = {}
+
+    def _publish_periodically(self) -> None:
+        while not self._stopped.wait(self.publish_interval):
+            try:
+                self.publish(force=True)
+            except Exception:
+                logger.exception("Publishing the collected metrics failed")
+
+    def _file(self, family: str) -> _MetricFile:
+        # Reopen after a fork, so that every process writes its own files
+        pid = os.getpid()
+        if pid != self._pid:
+            self._files = {}
+            self._pid = pid
+        kind = "gauge" if FAMILIES[family][0] == "gauge" else "counter"
+        file = self._files.get(kind)
+        if file is None:
+            path = os.path.join(self.directory, f"{kind}_{pid}.db")
+            if kind == "gauge":
+                # Left behind by a dead worker whose pid this process reuses; a new file,
+                # rather than a truncated one, keeps the mappings of concurrent readers valid
+                _unlink(path)
+            file = self._files[kind] = _MetricFile(path)
+        return file
+
+    def _cumulative(
+        self, family: str, samples: List[Tuple[str, Labels, float]]
+    ) -> Iterator[Tuple[str, Labels, float]]:
+        buckets: Dict[Labels, Dict[str, float]] = {}
+        for sample, labels, value in samples:
+            if sample == f"{family}_bucket":
+                le = dict(labels)["le"]
+                series = tuple(label for label in labels if label[0] != "le")
+                buckets.setdefault(series, {})[le] = value
+            else:
+                buckets.setdefault(labels, {})
+                yield sample, labels, value
+        bounds = [repr(float(bound)) for bound in self.buckets] + ["+Inf"]
+        for series, counts in buckets.items():
+            total = 0.0
+            for le in bounds:
+                total += counts.get(le, 0.0)
+                yield f"{family}_bucket", series + (("le", le),), total
+
+
+def build_metrics_store() -> Optional[MetricsStore]:
+    """
+    Create the metrics store of this process from the metrics settings.
+
+    Returns:
+        Optional[MetricsStore]: The store, or None if metrics are off.
+    """
+    metrics_settings = settings.metrics
+    if not metrics_settings.METRICS_ENABLED:
+        return None
+    directory = metrics_settings.METRICS_DIR
+    if not directory:
+        base = os.path.join(
+            "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+            f"app-metrics-{os.getuid()}",
+        )
+        make_private_directory(base)
+        _remove_stale_directories(base)
+        directory = os.path.join(base, str(os.getppid()))
+    return MetricsStore(
+        directory,
+        buckets=metrics_settings.METRICS_LATENCY_BUCKETS,
+        publish_interval=metrics_settings.METRICS_PUBLISH_INTERVAL_SECONDS,
+    )
+
+
+def _entries(buffer: mmap.mmap, used: int) -> Iterator[Tuple[str, int]]:
+    # (key, value offset) of each entry below `used`
+    position = _HEADER.size
+    used = min(used, len(buffer))
+    while position + _LENGTH.size <= used:
+        length = _LENGTH.unpack_from(buffer, position)[0]
+        padded = length + (-(_LENGTH.size + length) % 8)
+        offset = position + _LENGTH.size + padded
+        if offset + _VALUE.size > used:
+            break
+        key = bytes(buffer[position + _LENGTH.size : position + _LENGTH.size + length])
+        yield key.decode(), offset
+        position = offset + _VALUE.size
+
+
+def _read(path: str) -> List[Tuple[SampleKey, float]]:
+    try:
+        with os.fdopen(os.open(path, os.O_RDONLY | os.O_NOFOLLOW), "rb") as file:
+            if os.fstat(file.fileno()).st_size < _HEADER.size:
+                return []
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                used = _HEADER.unpack_from(buffer, 0)[0]
+                return [
+                    (_decode_key(key), _VALUE.unpack_from(buffer, offset)[0])
+                    for key, offset in _entries(buffer, used)
+                ]
+    except OSError:
+        # Removed since it was listed, or a symlink, which no worker writes
+        return []
+
+
+def _decode_key(key: str) -> SampleKey:
+    family, sample, labels = json.loads(key)
+    return family, sample, tuple((name, value) for name, value in labels)
+
+
+def _hit_ratios(
+    samples: Dict[str, List[Tuple[str, Labels, float]]]
+) -> Iterator[Tuple[str, Labels, float]]:
+    misses = {labels: value for _, labels, value in samples.get("cache_misses_total", ())}
+    for _, labels, hits in samples.get("cache_hits_total", ()):
+        lookups = hits + misses.get(labels, 0.0)
+        if lookups:
+            yield "cache_hit_ratio", labels, hits / lookups
+
+
+def _sort_key(sample: Tuple[str, Labels, float]) -> Tuple[Labels, bool, str, float]:
+    # Keep each histogram series together, buckets first and in bound order
+    name, labels, _ = sample
+    series = tuple(label for label in labels if label[0] != "le")
+    le = dict(labels).get("le", "+Inf")
+    return series, not name.endswith("_bucket"), name, float(le.replace("+Inf", "inf"))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        '{}="{}"'.format(
+            name, value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        )
+        for name, value in labels
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _remove_stale_directories(base: str) -> None:
+    # Directories are named after the master process that owned them
+    if not os.path.isdir(base):
+        return
+    for name in os.listdir(base):
+        if name.isdigit() and not _is_alive(int(name)):
+            shutil.rmtree(os.path.join(base, name), ignore_errors=True)
+
+
+def _unlink(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+# The metrics store of this process
+metrics_store = build_metrics_store()
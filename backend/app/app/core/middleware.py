@@ -0,0 +1,177 @@
+"""
+This module provides the application's HTTP middleware.
+
+`RequestLogMiddleware` is a pure ASGI middleware: it times each request, breaks the time down
+into the spans of `app.core.timing`, adds them as a Server-Timing header to the response start
+message and logs the request once it has been handled. Unlike `BaseHTTPMiddleware`, it does
+not run the application in a separate task or pass the response body through a memory stream;
+body messages go straight to the server.
+
+Request logs are sampled: a configurable share of requests is logged, per route if needed,
+while failed (5xx or unhandled exception) and slow requests are always logged. The log line
+is only formatted for the requests that are logged. It can include the spans, which are also
+bound to the record as its "timings" extra field for structured sinks.
+
+Given a `MetricsStore`, the middleware also counts requests by method, route template and
+status, records their latency in a histogram and tracks the requests in progress.
+"""
+
+import random
+import time
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from app.core.metrics import MetricsStore
+from app.core.timing import RequestTimings, reset_timings, use_timings
+from loguru import logger
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Methods reported as themselves in metrics labels; others are reported as "OTHER"
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+
+class RequestLogMiddleware:
+    """
+    Log sampled HTTP requests and report where their processing time went.
+
+    The processing time is measured from the request's arrival until the application starts
+    the response, i.e. it excludes streaming the body.
+
+    Args:
+        app (ASGIApp): The application to wrap.
+        sample_rate (float): Share of requests logged, from 0 (none) to 1 (all).
+        route_sample_rates (Optional[Mapping[str, float]]): Sample rates overriding
+            `sample_rate` for some routes, keyed by path template, e.g. "/users/{user_id}".
+        slow_seconds (Optional[float]): Requests that take at least this long are always
+            logged; None disables this.
+        server_timing (bool): Add the Server-Timing header to responses.
+        log_timings (bool): Add the spans to the request log lines.
+        metrics (Optional[MetricsStore]): Where request metrics are recorded, if anywhere.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        sample_rate: float = 1.0,
+        route_sample_rates: Optional[Mapping[str, float]] = None,
+        slow_seconds: Optional[float] = None,
+        server_timing: bool = False,
+        log_timings: bool = False,
+        metrics: Optional[MetricsStore] = None,
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.route_sample_rates = dict(route_sample_rates or {})
+        self.slow_seconds = slow_seconds
+        self.server_timing = server_timing
+        self.log_timings = log_timings
+        self.metrics = metrics
+        self._route_paths: Optional[Dict[Callable[..., Any], str]] = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings() if self.server_timing or self.log_timings else None
+        token = use_timings(timings)
+        start_ns = time.perf_counter_ns()
+        status = 500
+        process_ns = None
+
+        async def send_with_timings(message: Message) -> None:
+            nonlocal status, process_ns
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                process_ns = time.perf_counter_ns() - start_ns
+                if self.server_timing:
+                    message["headers"] = [
+                        *message.get("headers", ()),
+                        (
+                            b"server-timing",
+                            timings.server_timing(process_ns).encode("latin-1"),
+                        ),
+                    ]
+            await send(message)
+
+        if self.metrics is not None:
+            self.metrics.inc("http_requests_in_progress")
+        raised = False
+        try:
+            await self.app(scope, receive, send_with_timings)
+        except BaseException:
+            raised = True
+            raise
+        finally:
+            reset_timings(token)
+            if process_ns is None or raised:
+                process_ns = time.perf_counter_ns() - start_ns
+            if self.metrics is not None:
+                self._record(scope, status, process_ns)
+            self._log(scope, status, process_ns, timings, raised)
+
+    def _record(self, scope: Scope, status: int, process_ns: int) -> None:
+        method = scope["method"] if scope["method"] in METHODS else "OTHER"
+        route = self._route_path(scope) or "unmatched"
+        self.metrics.inc("http_requests_in_progress", amount=-1)
+        self.metrics.inc(
+            "http_requests_total",
+            (("method", method), ("route", route), ("status", str(status))),
+        )
+        self.metrics.observe(
+            "http_request_duration_seconds",
+            (("method", method), ("route", route)),
+            process_ns / 1e9,
+        )
+
+    def _log(
+        self,
+        scope: Scope,
+        status: int,
+        process_ns: int,
+        timings: Optional[RequestTimings],
+        raised: bool,
+    ) -> None:
+        process_time = process_ns / 1e9
+        if raised or status >= 500:
+            level, prefix = "ERROR", ""
+        elif self.slow_seconds is not None and process_time >= self.slow_seconds:
+            level, prefix = "WARNING", "Slow request: "
+        elif random.random() < self._sample_rate(scope):
+            level, prefix = "INFO", ""
+        else:
+            return
+        message = prefix + self._message(scope, status, process_time, raised)
+        if self.log_timings and timings is not None:
+            spans = timings.milliseconds()
+            message += "".join(f" {name}={ms:.1f}ms" for name, ms in spans.items())
+            logger.bind(timings=spans).log(level, message)
+        else:
+            logger.log(level, message)
+
+    def _sample_rate(self, scope: Scope) -> float:
+        if not self.route_sample_rates:
+            return self.sample_rate
+        route = self._route_path(scope) or scope["path"]
+        return self.route_sample_rates.get(route, self.sample_rate)
+
+    def _route_path(self, scope: Scope) -> Optional[str]:
+        # The router stores the matched endpoint in the scope; map it back to its template
+        if self._route_paths is None:
+            self._route_paths = {
+                route.endpoint: route.path
+                for route in getattr(scope.get("app"), "routes", ())
+                if hasattr(route, "endpoint")
+            }
+        return self._route_paths.get(scope.get("endpoint"))
+
+    @staticmethod
+    def _message(
+        scope: Scope, status: int, process_time: float, raised: bool = False
+    ) -> str:
+        query_string = scope["query_string"]
+        query = "?" + query_string.decode("latin-1") if query_string else ""
+        outcome = "raised an exception" if raised else str(status)
+        return (
+            f"{scope['method']} {scope['path']}{query} {outcome} "
+            f"{process_time * 1000:.1f}ms"
+        )
@@ -1,11 +1,56 @@
 """
-This module provides functionality to handle password encryption and verification using bcrypt.
+This module provides functionality to handle password encryption and verification. The hash
+schemes and their cost parameters come from `settings.auth`, so bcrypt rounds can be tuned or
+argon2 introduced without a forced password reset: hashes made with an outdated scheme or cost
+still verify and are flagged by `password_needs_update`.
+
+Hashing is CPU bound and holds the GIL for the whole computation, so the `password_hasher`
+service runs it in a bounded process pool. Callers that would push the pool past its queue
+limit get a `PasswordHashingBusy` error, which the application turns into a 503 response.
 """
 
+import asyncio
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional, Sequence
+
+from app.core.config import AuthSettings, settings
 from passlib.context import CryptContext
 
-# Create a password context for bcrypt
-PWD_CONTEXT = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def build_crypt_context(auth: AuthSettings) -> CryptContext:
+    """
+    Build the password context from the authentication settings.
+
+    The first configured scheme hashes new passwords; every other scheme is deprecated, so
+    its hashes still verify but need an update. A hash whose cost parameters differ from
+    the configured ones also needs an update.
+
+    Args:
+        auth (AuthSettings): The authentication settings.
+
+    Returns:
+        CryptContext: The configured password context.
+    """
+    return CryptContext(
+        schemes=auth.PASSWORD_SCHEMES,
+        deprecated="auto",
+        bcrypt__rounds=auth.BCRYPT_ROUNDS,
+        argon2__time_cost=auth.ARGON2_TIME_COST,
+        argon2__memory_cost=auth.ARGON2_MEMORY_COST,
+        argon2__parallelism=auth.ARGON2_PARALLELISM,
+    )
+
+
+# Create the password context for the configured schemes
+PWD_CONTEXT = build_crypt_context(settings.auth)
+
+
+class PasswordHashingBusy(Exception):
+    """
+    Raised when the password hashing queue is full and the request should be shed.
+    """
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -22,9 +67,22 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return PWD_CONTEXT.verify(plain_password, hashed_password)
 
 
+def password_needs_update(hashed_password: str) -> bool:
+    """
+    Check whether a hash was made with an outdated scheme or cost and should be replaced.
+
+    Args:
+        hashed_password (str): The stored hashed password.
+
+    Returns:
+        bool: True if the password should be rehashed, False otherwise.
+    """
+    return PWD_CONTEXT.needs_update(hashed_password)
+
+
 def get_password_hash(password: str) -> str:
     """
-    Hash a password using bcrypt.
+    Hash a password using the default configured scheme.
 
     Args:
         password (str): The plain text password.
@@ -33,3 +91,173 @@ def get_password_hash(password: str) -> str:
         str: The hashed password.
     """
     return PWD_CONTEXT.hash(password)
+
+
+class PasswordHasher:
+    """
+    Runs password hashing and verification in a bounded process pool.
+
+    The pool is created lazily on first use so that every gunicorn worker gets its own
+    processes after forking. At most `max_pending` jobs may be in flight at once; further
+    submissions raise `PasswordHashingBusy` instead of queueing without bound.
+
+    Attributes:
+        max_workers: Number of worker processes. None uses one per CPU, 0 hashes inline.
+        max_pending: Maximum number of jobs submitted but not yet finished.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: int = 64):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of hashing jobs currently in flight.
+        """
+        return self._pending
+
+    def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """
+        Verify a password in the pool, blocking the calling thread until it completes.
+
+        Raises:
+            PasswordHashingBusy: If the hashing queue is full.
+        """
+        return self._submit(verify_password, plain_password, hashed_password).result()
+
+    def hash(self, password: str) -> str:
+        """
+        Hash a password in the pool, blocking the calling thread until it completes.
+
+        Raises:
+            PasswordHashingBusy: If the hashing queue is full.
+        """
+        return self._submit(get_password_hash, password).result()
+
+    async def averify(self, plain_password: str, hashed_password: str) -> bool:
+        """
+        Verify a password in the pool without blocking the event loop.
+
+        Raises:
+            PasswordHashingBusy: If the hashing queue is full.
+        """
+        future = self._submit(verify_password, plain_password, hashed_password)
+        return await asyncio.wrap_future(future)
+
+    async def ahash(self, password: str) -> str:
+        """
+        Hash a password in the pool without blocking the event loop.
+
+        Raises:
+            PasswordHashingBusy: If the hashing queue is full.
+        """
+        return await asyncio.wrap_future(self._submit(get_password_hash, password))
+
+    def hash_many(self, passwords: Sequence[str]) -> List[str]:
+        """
+        Hash many passwords in parallel, blocking the calling thread until all complete.
+
+        Jobs are submitted in windows of half the queue limit, so a bulk load keeps every
+        worker busy while leaving room in the queue for interactive logins.
+
+        Args:
+            passwords (Sequence[str]): The plain text passwords.
+
+        Returns:
+            List[str]: The hashed passwords, in the order given.
+
+        Raises:
+            PasswordHashingBusy: If the hashing queue is full.
+        """
+        hashes: List[str] = []
+        for window in self._windows(passwords):
+            futures = [self._submit(get_password_hash, password) for password in window]
+            hashes.extend(future.result() for future in futures)
+        return hashes
+
+    async def ahash_many(self, passwords: Sequence[str]) -> List[str]:
+        """
+        Hash many passwords in parallel without blocking the event loop.
+
+        Args:
+            passwords (Sequence[str]): The plain text passwords.
+
+        Returns:
+            List[str]: The hashed passwords, in the order given.
+
+        Raises:
+            PasswordHashingBusy: If the hashing queue is full.
+        """
+        hashes: List[str] = []
+        for window in self._windows(passwords):
+            futures = [self._submit(get_password_hash, password) for password in window]
+            hashes.extend(
+                await asyncio.gather(*(asyncio.wrap_future(f) for f in futures))
+            )
+        return hashes
+
+    def shutdown(self) -> None:
+        """
+        Stop the worker processes. The pool is recreated if the hasher is used again.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _windows(self, items: Sequence[str]) -> List[Sequence[str]]:
+        size = max(1, self.max_pending // 2)
+        return [items[start : start + size] for start in range(0, len(items), size)]
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise PasswordHashingBusy(
+                    f"{self._pending} password hashing jobs already pending"
+                )
+            self._pending += 1
+
+        try:
+            if self.max_workers == 0:
+                future: Future = Future()
+                try:
+                    future.set_result(fn(*args))
+                except Exception as exc:
+                    future.set_exception(exc)
+            else:
+                future = self._submit_to_pool(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+
+        future.add_done_callback(self._release)
+        return future
+
+    def _submit_to_pool(self, fn: Callable[..., Any], *args: Any) -> Future:
+        try:
+            return self._get_executor().submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM killed); start a fresh pool and retry once
+            self.shutdown()
+            return self._get_executor().submit(fn, *args)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def _release(self, _future: Optional[Future] = None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+
+# Shared hashing service used by authentication and user creation
+password_hasher = PasswordHasher(
+    max_workers=settings.auth.PASSWORD_HASH_WORKERS,
+    max_pending=settings.auth.PASSWORD_HASH_MAX_PENDING,
+)
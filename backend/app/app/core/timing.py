@@ -0,0 +1,289 @@
+"""
+This module breaks the handling time of a request down into named spans, which
+`RequestLogMiddleware` reports in the standard Server-Timing response header and, optionally,
+in the request log line.
+
+The middleware makes a `RequestTimings` current for each request through a context variable,
+which the threadpool and SQLAlchemy's async greenlets inherit. Code records spans into it:
+
+- `span(name)` times a `with` block, e.g. the session setup of `get_db` ("get_db") or the
+  authentication of `get_current_user` ("auth");
+- `timed(name)` times a function, and `timed_methods(name)` the public methods of a class,
+  e.g. the CRUD classes ("crud");
+- `TimedRoute` times the "render" span, from the endpoint returning until its response is built;
+- engine events time the execution of every SQL statement ("db");
+- `CompressionMiddleware` times the compression of bodies sent in one piece ("compress").
+
+Durations of the same name add up over the request, and a span opened inside another of the
+same name is not counted twice. Spans of different names may overlap: "db" is part of "crud",
+and the rest of "crud" is connection checkout and ORM work. Outside a request, or when timing
+is off, recording a span costs a context variable lookup.
+"""
+
+import functools
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
+from typing import Any, Callable, Coroutine, Dict, Iterator, Optional, Set, TypeVar
+
+from fastapi import Request, Response
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+T = TypeVar("T")
+
+# Connection info key holding the start of the statement being executed
+QUERY_START = "timing_query_start_ns"
+
+_current: ContextVar[Optional["RequestTimings"]] = ContextVar(
+    "request_timings", default=None
+)
+
+
+class RequestTimings:
+    """
+    The spans recorded while handling one request.
+
+    Attributes:
+        start_ns: `perf_counter_ns` when the request arrived.
+        durations: Total nanoseconds per span name, in the order the names first appeared.
+    """
+
+    def __init__(self) -> None:
+        self.start_ns = time.perf_counter_ns()
+        self.durations: Dict[str, int] = {}
+        self._open: Set[str] = set()
+        self._started: Dict[str, int] = {}
+
+    def add(self, name: str, duration_ns: int) -> None:
+        """
+        Add a duration to a span.
+
+        Args:
+            name (str): The span name.
+            duration_ns (int): Nanoseconds to add.
+        """
+        self.durations[name] = self.durations.get(name, 0) + duration_ns
+
+    def start(self, name: str) -> None:
+        """
+        Open a span that `stop` closes, for spans that start and end in different functions.
+
+        Args:
+            name (str): The span name.
+        """
+        self._started[name] = time.perf_counter_ns()
+
+    def stop(self, name: str) -> None:
+        """
+        Close a span opened with `start`; does nothing if it was not opened.
+
+        Args:
+            name (str): The span name.
+        """
+        started = self._started.pop(name, None)
+        if started is not None:
+            self.add(name, time.perf_counter_ns() - started)
+
+    def milliseconds(self) -> Dict[str, float]:
+        """
+        Return the durations of the spans in milliseconds.
+        """
+        return {name: duration / 1e6 for name, duration in self.durations.items()}
+
+    def server_timing(self, total_ns: int) -> str:
+        """
+        Format the spans as a Server-Timing header value.
+
+        Args:
+            total_ns (int): Nanoseconds the whole request took, reported as "total".
+
+        Returns:
+            str: E.g. "get_db;dur=0.041, crud;dur=1.215, db;dur=0.802, total;dur=2.430".
+        """
+        metrics = [
+            f"{name};dur={duration / 1e6:.3f}" for name, duration in self.durations.items()
+        ]
+        metrics.append(f"total;dur={total_ns / 1e6:.3f}")
+        return ", ".join(metrics)
+
+
+def use_timings(timings: Optional[RequestTimings]) -> Token:
+    """
+    Make a `RequestTimings` current for the rest of the request.
+
+    Args:
+        timings (Optional[RequestTimings]): The request's timings, or None to record nothing.
+
+    Returns:
+        Token: Token to pass to `reset_timings` when the request is done.
+    """
+    return _current.set(timings)
+
+
+def reset_timings(token: Token) -> None:
+    """
+    Restore the timings that were current before `use_timings`.
+
+    Args:
+        token (Token): The token returned by `use_timings`.
+    """
+    _current.reset(token)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    """
+    Return the current request's timings, or None outside a timed request.
+    """
+    return _current.get()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """
+    Time a block of code into the current request's timings.
+
+    Args:
+        name (str): The span name.
+    """
+    timings = _current.get()
+    if timings is None or name in timings._open:
+        yield
+        return
+    timings._open.add(name)
+    start = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter_ns() - start)
+        timings._open.discard(name)
+
+
+def timed(name: str) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """
+    Decorate a function, sync or async, so that its calls are timed as a span.
+
+    Args:
+        name (str): The span name.
+    """
+
+    def decorate(func: Callable[..., Any]) -> Callable[..., Any]:
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                with span(name):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with span(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def timed_methods(name: str) -> Callable[[Any], Any]:
+    """
+    Decorate a class so that calls to the public methods it defines are timed as a span.
+    Generator methods are left alone, since calling them does no work.
+
+    Args:
+        name (str): The span name.
+    """
+
+    def decorate(cls: Any) -> Any:
+        for attr, value in list(vars(cls).items()):
+            if attr.startswith("_") or not inspect.isfunction(value):
+                continue
+            if inspect.isgeneratorfunction(value) or inspect.isasyncgenfunction(value):
+                continue
+            setattr(cls, attr, timed(name)(value))
+        return cls
+
+    return decorate
+
+
+class TimedRoute(APIRoute):
+    """
+    A route that records the "render" span: the validation and serialization of the
+    endpoint's return value into the response.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        # The handler runs the endpoint through `dependant.call`
+        self.dependant.call = self.wrap_endpoint(self.dependant.call)
+        handler = super().get_route_handler()
+
+        async def timed_handler(request: Request) -> Response:
+            try:
+                return await handler(request)
+            finally:
+                timings = _current.get()
+                if timings is not None:
+                    timings.stop("render")
+
+        return timed_handler
+
+    def wrap_endpoint(self, endpoint: Callable[..., Any]) -> Callable[..., Any]:
+        """
+        Wrap the endpoint function that the route handler calls.
+
+        Subclasses may extend the wrapper; work done around the wrapper returned here is
+        part of the "render" span.
+
+        Args:
+            endpoint (Callable[..., Any]): The endpoint function, sync or async.
+
+        Returns:
+            Callable[..., Any]: A function of the same kind that calls it.
+        """
+        return _start_render_after(endpoint)
+
+
+def _start_render_after(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                _start("render")
+
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            _start("render")
+
+    return wrapper
+
+
+def _start(name: str) -> None:
+    timings = _current.get()
+    if timings is not None:
+        timings.start(name)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query(conn: Any, cursor: Any, statement: Any, *args: Any) -> None:
+    if _current.get() is not None:
+        conn.info[QUERY_START] = time.perf_counter_ns()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _end_query(conn: Any, cursor: Any, statement: Any, *args: Any) -> None:
+    started = conn.info.pop(QUERY_START, None)
+    timings = _current.get()
+    if started is not None and timings is not None:
+        timings.add("db", time.perf_counter_ns() - started)
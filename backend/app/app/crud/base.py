@@ -5,35 +5,140 @@ can be used as a base class for concrete implementations of CRUD operations for
 TODO:
 1. Add type checking for the `id` parameter in the `get` and `remove` methods. Currently, `id` is typed as `Any`, 
    but it might be more appropriate to restrict it to integer or string types, which are commonly used as identifiers.
-2. Add error handling in the `remove` method. If there is no object with the given id, the `delete` operation may fail. 
-   We could handle this by raising a custom exception if `obj` is `None`.
-3. Extend this class to support more complex query operations, like filtering and sorting, if needed.
+2. Extend this class to support more complex query operations, like filtering and sorting, if needed.
+
+Every method has an asyncio counterpart prefixed with `a` (`aget`, `acreate`, ...) that takes an
+`AsyncSession`, for use from `async def` routes.
+
+For listing large tables prefer `get_page` over `get_multi`: it seeks past the last id seen
+instead of scanning and discarding OFFSET rows, so every page costs the same however deep it is.
+To read a whole table, `stream` yields plain row mappings chunk by chunk from a server-side
+cursor, so memory stays flat whatever the table size.
+
+`update` compares the new values with the object's mapped columns and writes only the ones
+that changed, or nothing at all. Where the database supports UPDATE ... RETURNING, the
+updated row comes back with the UPDATE instead of a follow-up SELECT. Likewise `remove` is a
+single DELETE ... RETURNING there, and returns None when there is no record to remove.
+
+For models with a version counter (`version_id_col` in their `__mapper_args__`), `update`
+and `upsert_many` bump the version of the rows they change, and, as the ORM does, `update`
+raises `StaleDataError` if the row's version changed since the object was loaded; the API
+answers it with a 409 Conflict.
+
+Write methods commit their changes, except on a session that is part of a unit of work (its
+`info` has `UNIT_OF_WORK` set, see `app.api.unit_of_work`): there they only flush, and the
+unit of work commits once at the end or rolls back.
+
+Single-record lookups can be served from a `QueryCache` (see `app.crud.query_cache`) passed
+to the constructor; the write methods keep it consistent.
+
+Calls to the public methods are timed as the "crud" span of the request (see
+`app.core.timing`).
+
+To load many records, `create_many` and `upsert_many` send each batch as a single executemany
+INSERT inside one transaction, instead of a transaction and several round trips per record.
+`upsert_many` detects conflicts on the model's unique constraint or index unless it is given
+the `index_elements` of one; records never carry their primary key, so it is not a default.
 """
-from typing import Any, Dict, Generic, List, Optional, Type, TypeVar, Union
+import base64
+import binascii
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Generic,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
+from app.core.timing import timed_methods
+from app.crud.query_cache import MISS, QueryCache
 from app.db.base_class import Base
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import Column, UniqueConstraint, delete, insert, inspect, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.sql.elements import ColumnElement
 
 ModelType = TypeVar("ModelType", bound=Base)
+IndexElement = Union[str, ColumnElement]
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
 
+# Session info flag set on sessions whose writes are committed by a unit of work
+UNIT_OF_WORK = "unit_of_work"
+
+# INSERT constructs with ON CONFLICT support, by dialect name
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def encode_cursor(last_id: int) -> str:
+    """
+    Encode the id of the last record of a page as an opaque cursor.
+
+    Args:
+        last_id (int): Id of the last record returned.
+
+    Returns:
+        str: A URL-safe cursor for the next page.
+    """
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    Args:
+        cursor (str): The opaque cursor.
+
+    Raises:
+        ValueError: If the cursor is malformed, or its id is not a positive 64-bit integer.
+
+    Returns:
+        int: Id of the last record of the previous page.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        id = int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    # Ids outside BIGINT would make the database driver fail instead
+    if not 0 < id < 2 ** 63:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return id
+
 
+@timed_methods("crud")
 class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
     """
     Generic CRUD base class with default methods to Create, Read, Update, and Delete (CRUD).
     """
 
-    def __init__(self, model: Type[ModelType]):
+    def __init__(self, model: Type[ModelType], query_cache: Optional[QueryCache] = None):
         """
         Initialize CRUDBase with the model type.
 
         Args:
             model (Type[ModelType]): A SQLAlchemy model class reference.
+            query_cache (Optional[QueryCache], optional): Cache for `get` and other
+                single-record lookups. Defaults to none.
         """
         self.model = model
+        self.query_cache = query_cache
 
     def get(self, db: Session, id: Any) -> Optional[ModelType]:
         """
@@ -46,7 +151,9 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         Returns:
             Optional[ModelType]: An instance of the model or None.
         """
-        return db.query(self.model).filter(self.model.id == id).first()
+        return self._cached_lookup(
+            db, "id", id, lambda: db.query(self.model).filter(self.model.id == id).first()
+        )
 
     def get_multi(
         self, db: Session, *, skip: int = 0, limit: int = 5000
@@ -66,6 +173,53 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
             db.query(self.model).order_by(self.model.id).offset(skip).limit(limit).all()
         )
 
+    def get_page(
+        self, db: Session, *, after_id: Optional[int] = None, limit: int = 100
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        """
+        Get a page of records ordered by id, using keyset pagination.
+
+        Args:
+            db (Session): Database session.
+            after_id (Optional[int], optional): Return records with an id above this one,
+                usually `decode_cursor` of the previous page's cursor. Defaults to the start.
+            limit (int, optional): Maximum number of records to return. Defaults to 100.
+
+        Returns:
+            Tuple[List[ModelType], Optional[str]]: The records and the cursor of the next page,
+            or None on the last page.
+        """
+        query = db.query(self.model)
+        if after_id is not None:
+            query = query.filter(self.model.id > after_id)
+        rows = query.order_by(self.model.id).limit(limit + 1).all()
+        return self._page(rows, limit)
+
+    def stream(
+        self,
+        db: Session,
+        *,
+        columns: Optional[Sequence[str]] = None,
+        chunk_size: int = 1000,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Stream all records ordered by id, as plain row mappings, one chunk at a time.
+
+        Rows come from a server-side cursor and are not turned into ORM instances, so
+        nothing accumulates in the session's identity map.
+
+        Args:
+            db (Session): Database session.
+            columns (Optional[Sequence[str]], optional): Column names to select. Defaults to all.
+            chunk_size (int, optional): Rows per chunk. Defaults to 1000.
+
+        Returns:
+            Iterator[List[Dict[str, Any]]]: Chunks of rows.
+        """
+        result = db.execute(self._stream_statement(columns, chunk_size))
+        for partition in result.mappings().partitions(chunk_size):
+            yield partition
+
     def create(self, db: Session, *, obj_in: CreateSchemaType) -> ModelType:
         """
         Create a new record.
@@ -80,10 +234,85 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
         obj_in_data = jsonable_encoder(obj_in)
         db_obj = self.model(**obj_in_data)  # type: ignore
         db.add(db_obj)
-        db.commit()
+        self._commit(db)
         db.refresh(db_obj)
+        self._invalidate(db, self._lookup_values(db_obj))
         return db_obj
 
+    def create_many(
+        self,
+        db: Session,
+        *,
+        objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        batch_size: int = 1000,
+    ) -> int:
+        """
+        Create many records with batched INSERTs in a single transaction.
+
+        Every record must provide the same fields. The created instances are not loaded
+        back; read them afterwards if they are needed.
+
+        Args:
+            db (Session): Database session.
+            objs_in (Sequence[Union[CreateSchemaType, Dict[str, Any]]]): Pydantic schemas or
+                dicts with the fields of the new records.
+            batch_size (int, optional): Records sent per INSERT. Defaults to 1000.
+
+        Returns:
+            int: The number of records created.
+        """
+        for batch in self._batches(objs_in, batch_size):
+            db.execute(insert(self.model.__table__), self._insert_values(batch))
+        self._commit(db)
+        self._invalidate_all(db)
+        return len(objs_in)
+
+    def upsert_many(
+        self,
+        db: Session,
+        *,
+        objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        index_elements: Optional[Sequence[IndexElement]] = None,
+        update_columns: Optional[Sequence[str]] = None,
+        batch_size: int = 1000,
+    ) -> int:
+        """
+        Insert many records, updating the ones that conflict with an existing row, using
+        batched INSERT ... ON CONFLICT statements in a single transaction.
+
+        Args:
+            db (Session): Database session.
+            objs_in (Sequence[Union[CreateSchemaType, Dict[str, Any]]]): Pydantic schemas or
+                dicts with the fields of the records.
+            index_elements (Optional[Sequence[IndexElement]], optional): Column names or
+                expressions of the unique index that detects a conflict. Defaults to the
+                model's unique constraint or index, other than the primary key, if it has
+                exactly one.
+            update_columns (Optional[Sequence[str]], optional): Columns overwritten on a
+                conflict. Defaults to every inserted column outside `index_elements`; an
+                empty sequence leaves conflicting rows untouched.
+            batch_size (int, optional): Records sent per INSERT. Defaults to 1000.
+
+        Raises:
+            NotImplementedError: If the database has no ON CONFLICT support.
+            ValueError: If `index_elements` is not given and the model has no single unique
+                constraint or index to default to.
+
+        Returns:
+            int: The number of records inserted or updated, including conflicting records
+            that were left untouched.
+        """
+        dialect = db.get_bind().dialect.name
+        for batch in self._batches(objs_in, batch_size):
+            values = self._insert_values(batch)
+            statement = self._upsert_statement(
+                dialect, values[0], index_elements, update_columns
+            )
+            db.execute(statement, values)
+        self._commit(db)
+        self._invalidate_all(db)
+        return len(objs_in)
+
     def update(
         self,
         db: Session,
@@ -101,32 +330,578 @@ class CRUDBase(Generic[ModelType, CreateSchemaType, UpdateSchemaType]):
 
         Returns:
             ModelType: The updated model instance.
+
+        Raises:
+            StaleDataError: If the record was removed, or its version changed, since it was
+                loaded.
         """
-        obj_data = jsonable_encoder(db_obj)
-        if isinstance(obj_in, dict):
-            update_data = obj_in
+        changes = self._changes(db_obj, obj_in)
+        if not changes:
+            return db_obj
+        before = self._lookup_values(db_obj)
+        if db.get_bind().dialect.full_returning:
+            row = db.execute(self._update_statement(db_obj, changes)).mappings().first()
+            self._check_updated(row)
+            self._commit(db)
+            self._load_row(db_obj, row)
         else:
-            update_data = obj_in.dict(exclude_unset=True)
-        for field in obj_data:
-            if field in update_data:
-                setattr(db_obj, field, update_data[field])
-        db.add(db_obj)
-        db.commit()
-        db.refresh(db_obj)
+            for key, value in changes.items():
+                setattr(db_obj, key, value)
+            db.add(db_obj)
+            self._commit(db)
+            db.refresh(db_obj)
+        self._invalidate(db, before, self._lookup_values(db_obj))
         return db_obj
 
-    def remove(self, db: Session, *, id: int) -> ModelType:
+    def remove(self, db: Session, *, id: int) -> Optional[ModelType]:
         """
         Remove a record.
 
+        Where the database supports DELETE ... RETURNING, this is a single statement;
+        elsewhere the record is loaded first.
+
         Args:
             db (Session): Database session.
             id (int): Id of the record to remove.
 
         Returns:
-            ModelType: The removed model instance.
+            Optional[ModelType]: The removed model instance, detached from the session,
+            or None if there was no record with this id.
         """
-        obj = db.query(self.model).get(id)
+        if db.get_bind().dialect.full_returning:
+            row = db.execute(self._delete_statement(id)).mappings().first()
+            self._expunge(db, [id])
+            self._commit(db)
+            if row is None:
+                return None
+            self._invalidate(db, row)
+            return self._detached(row)
+        obj = db.get(self.model, id)
+        if obj is None:
+            return None
+        values = self._lookup_values(obj)
         db.delete(obj)
-        db.commit()
+        self._commit(db)
+        self._invalidate(db, values)
+        return obj
+
+    def remove_many(
+        self, db: Session, *, ids: Sequence[int], batch_size: int = 1000
+    ) -> int:
+        """
+        Remove many records by id with batched DELETEs in a single transaction.
+
+        Args:
+            db (Session): Database session.
+            ids (Sequence[int]): Ids of the records to remove; unknown ids are ignored.
+            batch_size (int, optional): Ids sent per DELETE. Defaults to 1000.
+
+        Returns:
+            int: The number of records removed.
+        """
+        table = self.model.__table__
+        removed = 0
+        for batch in self._batches(ids, batch_size):
+            removed += db.execute(delete(table).where(table.c.id.in_(batch))).rowcount
+        self._expunge(db, ids)
+        self._commit(db)
+        self._invalidate_all(db)
+        return removed
+
+    def invalidate_cache(
+        self, db: Union[Session, AsyncSession], *, db_obj: ModelType
+    ) -> None:
+        """
+        Drop the cached lookups of a record that was changed without the CRUD methods.
+
+        Args:
+            db (Union[Session, AsyncSession]): The session that changed the record.
+            db_obj (ModelType): The record, as it was before the change.
+        """
+        self._invalidate(db, self._lookup_values(db_obj))
+
+    async def aget(self, db: AsyncSession, id: Any) -> Optional[ModelType]:
+        """
+        Get a single record by id.
+
+        Args:
+            db (AsyncSession): Async database session.
+            id (Any): Id of the record.
+
+        Returns:
+            Optional[ModelType]: An instance of the model or None.
+        """
+
+        async def load() -> Optional[ModelType]:
+            result = await db.execute(select(self.model).filter(self.model.id == id))
+            return result.scalars().first()
+
+        return await self._acached_lookup(db, "id", id, load)
+
+    async def aget_multi(
+        self, db: AsyncSession, *, skip: int = 0, limit: int = 5000
+    ) -> List[ModelType]:
+        """
+        Get multiple records with pagination.
+
+        Args:
+            db (AsyncSession): Async database session.
+            skip (int, optional): Number of records to skip. Defaults to 0.
+            limit (int, optional): Maximum number of records to return. Defaults to 5000.
+
+        Returns:
+            List[ModelType]: A list of model instances.
+        """
+        result = await db.execute(
+            select(self.model).order_by(self.model.id).offset(skip).limit(limit)
+        )
+        return result.scalars().all()
+
+    async def aget_page(
+        self, db: AsyncSession, *, after_id: Optional[int] = None, limit: int = 100
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        """
+        Get a page of records ordered by id, using keyset pagination.
+
+        Args:
+            db (AsyncSession): Async database session.
+            after_id (Optional[int], optional): Return records with an id above this one.
+                Defaults to the start.
+            limit (int, optional): Maximum number of records to return. Defaults to 100.
+
+        Returns:
+            Tuple[List[ModelType], Optional[str]]: The records and the cursor of the next page,
+            or None on the last page.
+        """
+        statement = select(self.model)
+        if after_id is not None:
+            statement = statement.filter(self.model.id > after_id)
+        result = await db.execute(statement.order_by(self.model.id).limit(limit + 1))
+        return self._page(result.scalars().all(), limit)
+
+    async def astream(
+        self,
+        db: AsyncSession,
+        *,
+        columns: Optional[Sequence[str]] = None,
+        chunk_size: int = 1000,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Stream all records ordered by id, as plain row mappings, one chunk at a time.
+
+        Args:
+            db (AsyncSession): Async database session.
+            columns (Optional[Sequence[str]], optional): Column names to select. Defaults to all.
+            chunk_size (int, optional): Rows per chunk. Defaults to 1000.
+
+        Returns:
+            AsyncIterator[List[Dict[str, Any]]]: Chunks of rows.
+        """
+        result = await db.stream(self._stream_statement(columns, chunk_size))
+        async for partition in result.mappings().partitions(chunk_size):
+            yield partition
+
+    async def acreate(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
+        """
+        Create a new record.
+
+        Args:
+            db (AsyncSession): Async database session.
+            obj_in (CreateSchemaType): Pydantic schema with fields to create a new record.
+
+        Returns:
+            ModelType: The created model instance.
+        """
+        obj_in_data = jsonable_encoder(obj_in)
+        db_obj = self.model(**obj_in_data)  # type: ignore
+        db.add(db_obj)
+        await self._acommit(db)
+        await db.refresh(db_obj)
+        self._invalidate(db, self._lookup_values(db_obj))
+        return db_obj
+
+    async def acreate_many(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        batch_size: int = 1000,
+    ) -> int:
+        """
+        Create many records with batched INSERTs in a single transaction.
+
+        Args:
+            db (AsyncSession): Async database session.
+            objs_in (Sequence[Union[CreateSchemaType, Dict[str, Any]]]): Pydantic schemas or
+                dicts with the fields of the new records.
+            batch_size (int, optional): Records sent per INSERT. Defaults to 1000.
+
+        Returns:
+            int: The number of records created.
+        """
+        for batch in self._batches(objs_in, batch_size):
+            values = await self._ainsert_values(batch)
+            await db.execute(insert(self.model.__table__), values)
+        await self._acommit(db)
+        self._invalidate_all(db)
+        return len(objs_in)
+
+    async def aupsert_many(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]],
+        index_elements: Optional[Sequence[IndexElement]] = None,
+        update_columns: Optional[Sequence[str]] = None,
+        batch_size: int = 1000,
+    ) -> int:
+        """
+        Insert many records, updating the ones that conflict with an existing row.
+
+        Args:
+            db (AsyncSession): Async database session.
+            objs_in (Sequence[Union[CreateSchemaType, Dict[str, Any]]]): Pydantic schemas or
+                dicts with the fields of the records.
+            index_elements (Optional[Sequence[IndexElement]], optional): Column names or
+                expressions of the unique index that detects a conflict. Defaults to the
+                model's unique constraint or index, other than the primary key, if it has
+                exactly one.
+            update_columns (Optional[Sequence[str]], optional): Columns overwritten on a
+                conflict. Defaults to every inserted column outside `index_elements`.
+            batch_size (int, optional): Records sent per INSERT. Defaults to 1000.
+
+        Raises:
+            NotImplementedError: If the database has no ON CONFLICT support.
+            ValueError: If `index_elements` is not given and the model has no single unique
+                constraint or index to default to.
+
+        Returns:
+            int: The number of records inserted or updated.
+        """
+        dialect = db.get_bind().dialect.name
+        for batch in self._batches(objs_in, batch_size):
+            values = await self._ainsert_values(batch)
+            statement = self._upsert_statement(
+                dialect, values[0], index_elements, update_columns
+            )
+            await db.execute(statement, values)
+        await self._acommit(db)
+        self._invalidate_all(db)
+        return len(objs_in)
+
+    async def aupdate(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: ModelType,
+        obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+    ) -> ModelType:
+        """
+        Update an existing record.
+
+        Args:
+            db (AsyncSession): Async database session.
+            db_obj (ModelType): The existing model instance to update.
+            obj_in (Union[UpdateSchemaType, Dict[str, Any]]): Pydantic schema or dict with fields to update.
+
+        Returns:
+            ModelType: The updated model instance.
+
+        Raises:
+            StaleDataError: If the record was removed, or its version changed, since it was
+                loaded.
+        """
+        changes = self._changes(db_obj, obj_in)
+        if not changes:
+            return db_obj
+        before = self._lookup_values(db_obj)
+        if db.get_bind().dialect.full_returning:
+            result = await db.execute(self._update_statement(db_obj, changes))
+            row = result.mappings().first()
+            self._check_updated(row)
+            await self._acommit(db)
+            self._load_row(db_obj, row)
+        else:
+            for key, value in changes.items():
+                setattr(db_obj, key, value)
+            db.add(db_obj)
+            await self._acommit(db)
+            await db.refresh(db_obj)
+        self._invalidate(db, before, self._lookup_values(db_obj))
+        return db_obj
+
+    async def aremove(self, db: AsyncSession, *, id: int) -> Optional[ModelType]:
+        """
+        Remove a record.
+
+        Args:
+            db (AsyncSession): Async database session.
+            id (int): Id of the record to remove.
+
+        Returns:
+            Optional[ModelType]: The removed model instance, detached from the session,
+            or None if there was no record with this id.
+        """
+        if db.get_bind().dialect.full_returning:
+            result = await db.execute(self._delete_statement(id))
+            row = result.mappings().first()
+            self._expunge(db.sync_session, [id])
+            await self._acommit(db)
+            if row is None:
+                return None
+            self._invalidate(db, row)
+            return self._detached(row)
+        obj = await db.get(self.model, id)
+        if obj is None:
+            return None
+        values = self._lookup_values(obj)
+        await db.delete(obj)
+        await self._acommit(db)
+        self._invalidate(db, values)
         return obj
+
+    async def aremove_many(
+        self, db: AsyncSession, *, ids: Sequence[int], batch_size: int = 1000
+    ) -> int:
+        """
+        Remove many records by id with batched DELETEs in a single transaction.
+
+        Args:
+            db (AsyncSession): Async database session.
+            ids (Sequence[int]): Ids of the records to remove; unknown ids are ignored.
+            batch_size (int, optional): Ids sent per DELETE. Defaults to 1000.
+
+        Returns:
+            int: The number of records removed.
+        """
+        table = self.model.__table__
+        removed = 0
+        for batch in self._batches(ids, batch_size):
+            result = await db.execute(delete(table).where(table.c.id.in_(batch)))
+            removed += result.rowcount
+        self._expunge(db.sync_session, ids)
+        await self._acommit(db)
+        self._invalidate_all(db)
+        return removed
+
+    def _cached_lookup(
+        self,
+        db: Session,
+        column: str,
+        value: Any,
+        load: Callable[[], Optional[ModelType]],
+    ) -> Optional[ModelType]:
+        if self.query_cache is None:
+            return load()
+        row = self.query_cache.get(column, value)
+        if row is MISS:
+            db_obj = load()
+            self.query_cache.set(column, value, self._row(db_obj))
+            return db_obj
+        return None if row is None else self._attach(db, row)
+
+    async def _acached_lookup(
+        self,
+        db: AsyncSession,
+        column: str,
+        value: Any,
+        load: Callable[[], Awaitable[Optional[ModelType]]],
+    ) -> Optional[ModelType]:
+        if self.query_cache is None:
+            return await load()
+        row = self.query_cache.get(column, value)
+        if row is MISS:
+            db_obj = await load()
+            self.query_cache.set(column, value, self._row(db_obj))
+            return db_obj
+        return None if row is None else self._attach(db.sync_session, row)
+
+    def _row(self, db_obj: Optional[ModelType]) -> Optional[Dict[str, Any]]:
+        # Column values of a record, keyed like the rows `_load_row` accepts
+        if db_obj is None:
+            return None
+        mapper = inspect(self.model)
+        return {
+            column.name: getattr(db_obj, mapper.get_property_by_column(column).key)
+            for column in self.model.__table__.c
+        }
+
+    def _attach(self, db: Session, row: Mapping[str, Any]) -> ModelType:
+        # Rebuild a cached record as a persistent instance of the session, without a query
+        mapper = inspect(self.model)
+        identity = mapper.identity_key_from_primary_key(
+            [row[column.name] for column in mapper.primary_key]
+        )
+        db_obj = db.identity_map.get(identity)
+        if db_obj is None:
+            db_obj = self._detached(row)
+            make_transient_to_detached(db_obj)
+            db.add(db_obj)
+        return db_obj
+
+    def _lookup_values(self, db_obj: ModelType) -> Dict[str, Any]:
+        # Values of the columns the query cache looks records up by
+        if self.query_cache is None:
+            return {}
+        return {column: getattr(db_obj, column) for column in self.query_cache.columns}
+
+    def _invalidate(
+        self, db: Union[Session, AsyncSession], *rows: Mapping[str, Any]
+    ) -> None:
+        if self.query_cache is not None:
+            self.query_cache.invalidate(getattr(db, "sync_session", db), rows)
+
+    def _invalidate_all(self, db: Union[Session, AsyncSession]) -> None:
+        if self.query_cache is not None:
+            self.query_cache.clear(getattr(db, "sync_session", db))
+
+    def _commit(self, db: Session) -> None:
+        if db.info.get(UNIT_OF_WORK):
+            db.flush()
+        else:
+            db.commit()
+
+    async def _acommit(self, db: AsyncSession) -> None:
+        if db.info.get(UNIT_OF_WORK):
+            await db.flush()
+        else:
+            await db.commit()
+
+    def _changes(
+        self, db_obj: ModelType, obj_in: Union[UpdateSchemaType, Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        # New values of the mapped columns that differ from the object's current state
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.dict(exclude_unset=True)
+        changes = {}
+        for attr in inspect(self.model).column_attrs:
+            if attr.key in update_data and getattr(db_obj, attr.key) != update_data[attr.key]:
+                changes[attr.key] = update_data[attr.key]
+        return changes
+
+    def _update_statement(self, db_obj: ModelType, changes: Dict[str, Any]) -> Any:
+        # UPDATE of the changed columns that returns the whole row, replacing a refresh
+        mapper = inspect(self.model)
+        table = self.model.__table__
+        values = {mapper.attrs[key].columns[0]: value for key, value in changes.items()}
+        statement = update(table).where(table.c.id == db_obj.id)
+        version = mapper.version_id_col
+        if version is not None:
+            # Bump the version, and only update the row as it was loaded, like the ORM does
+            key = mapper.get_property_by_column(version).key
+            values[version] = version + 1
+            statement = statement.where(version == getattr(db_obj, key))
+        return statement.values(values).returning(*table.c)
+
+    def _check_updated(self, row: Optional[Mapping[str, Any]]) -> None:
+        if row is None:
+            raise StaleDataError(
+                f"UPDATE statement on table '{self.model.__table__.name}' expected to "
+                "update 1 row(s); 0 were matched."
+            )
+
+    def _delete_statement(self, id: int) -> Any:
+        table = self.model.__table__
+        return delete(table).where(table.c.id == id).returning(*table.c)
+
+    def _detached(self, row: Any) -> ModelType:
+        db_obj = self.model()
+        self._load_row(db_obj, row)
+        return db_obj
+
+    def _expunge(self, db: Session, ids: Sequence[int]) -> None:
+        # Drop deleted records from the identity map, so they are not reloaded after commit
+        mapper = inspect(self.model)
+        for id in ids:
+            db_obj = db.identity_map.get(mapper.identity_key_from_primary_key([id]))
+            if db_obj is not None:
+                db.expunge(db_obj)
+
+    def _load_row(self, db_obj: ModelType, row: Any) -> None:
+        # Store returned values as the loaded state, so reading them costs no SELECT
+        mapper = inspect(self.model)
+        for column, value in row.items():
+            key = mapper.get_property_by_column(self.model.__table__.c[column]).key
+            set_committed_value(db_obj, key, value)
+
+    def _insert_values(
+        self, objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        # Column values of the records to insert; subclasses derive computed columns here
+        return [obj if isinstance(obj, dict) else obj.dict() for obj in objs_in]
+
+    async def _ainsert_values(
+        self, objs_in: Sequence[Union[CreateSchemaType, Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        return self._insert_values(objs_in)
+
+    def _upsert_statement(
+        self,
+        dialect: str,
+        row: Dict[str, Any],
+        index_elements: Optional[Sequence[IndexElement]],
+        update_columns: Optional[Sequence[str]],
+    ) -> Any:
+        if dialect not in UPSERT_INSERTS:
+            raise NotImplementedError(f"Upserts are not supported on {dialect}")
+        table = self.model.__table__
+        if index_elements is None:
+            index_elements = self._conflict_target()
+        if update_columns is None:
+            # Columns matched by an expression, such as lower(email), are still updated
+            indexed = {
+                element if isinstance(element, str) else element.name
+                for element in index_elements
+                if isinstance(element, (str, Column))
+            }
+            update_columns = [name for name in row if name not in indexed]
+        statement = UPSERT_INSERTS[dialect](table)
+        if not update_columns:
+            return statement.on_conflict_do_nothing(index_elements=index_elements)
+        set_ = {name: statement.excluded[name] for name in update_columns}
+        version = inspect(self.model).version_id_col
+        if version is not None:
+            set_[version.name] = version + 1
+        return statement.on_conflict_do_update(index_elements=index_elements, set_=set_)
+
+    def _conflict_target(self) -> List[IndexElement]:
+        # The elements of the model's only unique constraint or index besides the primary key
+        table = self.model.__table__
+        targets = [
+            list(constraint.columns)
+            for constraint in table.constraints
+            if isinstance(constraint, UniqueConstraint)
+        ]
+        targets += [list(index.expressions) for index in table.indexes if index.unique]
+        if len(targets) != 1:
+            raise ValueError(
+                f"{table.name} has {len(targets)} unique constraints besides its primary key: "
+                "pass the index_elements of the one that detects a conflict"
+            )
+        return targets[0]
+
+    @staticmethod
+    def _batches(items: Sequence[Any], batch_size: int) -> Iterator[Sequence[Any]]:
+        batch_size = max(1, batch_size)
+        for start in range(0, len(items), batch_size):
+            yield items[start : start + batch_size]
+
+    def _stream_statement(self, columns: Optional[Sequence[str]], chunk_size: int) -> Any:
+        table = self.model.__table__
+        selected = [table.c[name] for name in columns] if columns else list(table.c)
+        return (
+            select(*selected)
+            .order_by(table.c.id)
+            .execution_options(stream_results=True, max_row_buffer=chunk_size)
+        )
+
+    def _page(
+        self, rows: List[ModelType], limit: int
+    ) -> Tuple[List[ModelType], Optional[str]]:
+        # One extra row was fetched to learn whether another page follows
+        if len(rows) > limit:
+            rows = rows[:limit]
+            return rows, encode_cursor(rows[-1].id)
+        return rows, None
@@ -1,34 +1,119 @@
 """
 This module provides CRUD operations for User objects in the database. It includes functions for 
 creating, reading, and updating User objects. It extends the base CRUDBase class.
+
+Immutable snapshots of users are kept in `user_cache` for the authentication hot path. The
+write methods of `CRUDUser` populate or invalidate it (inside a unit of work, where the write
+may still be rolled back, they only invalidate it, and invalidate it again once the transaction
+ends), so writes made through `crud.user` are visible immediately; writes made elsewhere show
+up once the entry's TTL has passed.
+
+Emails are compared case-insensitively, through the unique index on `lower(email)`. A signup
+inserts without looking the email up first; `is_duplicate_email` tells whether the resulting
+`IntegrityError` came from that index.
+
+Bulk loads hash each batch of passwords in parallel on the password hashing pool before the
+batch is inserted.
 """
 
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, List, Optional, Sequence, Set, Union
 
-from app.core.security import get_password_hash
-from app.crud.base import CRUDBase
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.security import password_hasher
+from app.core.timing import timed_methods
+from app.crud.base import UNIT_OF_WORK, CRUDBase, IndexElement
+from app.crud.query_cache import build_query_cache, invalidate_on_end
 from app.models.user import User
-from app.schemas.user import UserCreate, UserUpdate
+from app.schemas.user import UserCreate, UserIdentity, UserUpdate
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+# User snapshots keyed by user id
+user_cache = TTLCache(
+    maxsize=settings.auth.USER_CACHE_SIZE,
+    ttl=settings.auth.USER_CACHE_TTL_SECONDS,
+)
+
+# The unique index on lower(email), see `User`
+EMAIL_INDEX = "ix_user_email_lower"
+
 
+def is_duplicate_email(exc: IntegrityError) -> bool:
+    """
+    Check whether a failed INSERT or UPDATE violated the unique index on the user's email.
+
+    Args:
+        exc (IntegrityError): The error raised by the flush or commit.
+
+    Returns:
+        bool: True if the email already belongs to another user.
+    """
+    # PostgreSQL and SQLite both name the violated index in the driver's message
+    return EMAIL_INDEX in str(exc.orig)
+
+
+@timed_methods("crud")
 class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
     """
     Class for User CRUD operations, inheriting from CRUDBase.
     """
 
-    def get_by_email(self, db: Session, *, email: str) -> Optional[User]:
+    def get_by_email(self, db: Session, *, email: str, cached: bool = True) -> Optional[User]:
         """
-        Get a User object by email.
+        Get a User object by email, ignoring case.
 
         Args:
             db (Session): The database session.
             email (str): The email of the user.
+            cached (bool): Whether the query cache may answer; authentication passes False
+                so that it always verifies against the current password hash.
 
         Returns:
             Optional[User]: The User object, if found. Else, None.
         """
-        return db.query(User).filter(User.email == email).first()
+
+        def load() -> Optional[User]:
+            return db.query(User).filter(func.lower(User.email) == email.lower()).first()
+
+        if not cached:
+            return load()
+        return self._cached_lookup(db, "email", email, load)
+
+    def get_existing_emails(self, db: Session, *, emails: Sequence[str]) -> Set[str]:
+        """
+        Find which of the given emails already belong to a User, ignoring case.
+
+        Args:
+            db (Session): The database session.
+            emails (Sequence[str]): The emails to look up.
+
+        Returns:
+            Set[str]: The lowercased emails that are already registered.
+        """
+        rows = db.execute(self._existing_emails_statement(emails))
+        return set(rows.scalars())
+
+    def get_identity(self, db: Session, *, id: int) -> Optional[UserIdentity]:
+        """
+        Get an immutable snapshot of a User, served from the user cache when possible.
+
+        Args:
+            db (Session): The database session, used only on a cache miss.
+            id (int): The id of the user.
+
+        Returns:
+            Optional[UserIdentity]: The user snapshot, if found. Else, None.
+        """
+        identity = user_cache.get(id)
+        if identity is None:
+            db_obj = self.get(db, id=id)
+            if db_obj is None:
+                return None
+            identity = self._cache(db_obj)
+        return identity
 
     def create(self, db: Session, *, obj_in: UserCreate) -> User:
         """
@@ -40,16 +125,55 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
 
         Returns:
             User: The created User object.
+
+        Raises:
+            PasswordHashingBusy: If the password hashing queue is full.
+            IntegrityError: If the email is already registered; see `is_duplicate_email`.
         """
         create_data = obj_in.dict()
         create_data.pop("password")
         db_obj = User(**create_data)
-        db_obj.hashed_password = get_password_hash(obj_in.password)
+        db_obj.hashed_password = password_hasher.hash(obj_in.password)
         db.add(db_obj)
-        db.commit()
+        self._commit(db)
+        self._cache_written(db, db_obj)
+        self._invalidate(db, self._lookup_values(db_obj))
 
         return db_obj
 
+    def upsert_many(
+        self,
+        db: Session,
+        *,
+        objs_in: Sequence[Union[UserCreate, Dict[str, Any]]],
+        index_elements: Optional[Sequence[IndexElement]] = None,
+        update_columns: Optional[Sequence[str]] = None,
+        batch_size: int = 1000,
+    ) -> int:
+        """
+        Insert many users, updating the ones that conflict, and empty the user cache since
+        the updated users are not known individually.
+
+        Conflicts are detected on the unique index on `lower(email)` unless `index_elements`
+        says otherwise, so a record updates the user whose email differs only in case.
+
+        Returns:
+            int: The number of users inserted or updated.
+
+        Raises:
+            PasswordHashingBusy: If the password hashing queue is full.
+        """
+        try:
+            return super().upsert_many(
+                db,
+                objs_in=objs_in,
+                index_elements=index_elements or [func.lower(User.email)],
+                update_columns=update_columns,
+                batch_size=batch_size,
+            )
+        finally:
+            self._invalidate_users(db, None)
+
     def update(
         self, db: Session, *, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]
     ) -> User:
@@ -69,20 +193,287 @@ class CRUDUser(CRUDBase[User, UserCreate, UserUpdate]):
         else:
             update_data = obj_in.dict(exclude_unset=True)
 
-        return super().update(db, db_obj=db_obj, obj_in=update_data)
+        db_obj = super().update(db, db_obj=db_obj, obj_in=update_data)
+        self._cache_written(db, db_obj)
+        return db_obj
+
+    def remove(self, db: Session, *, id: int) -> Optional[User]:
+        """
+        Remove a User object and drop it from the user cache.
+
+        Args:
+            db (Session): The database session.
+            id (int): The id of the user to remove.
+
+        Returns:
+            Optional[User]: The removed User object, or None if there was no such user.
+        """
+        try:
+            return super().remove(db, id=id)
+        finally:
+            self._invalidate_users(db, [id])
+
+    def remove_many(
+        self, db: Session, *, ids: Sequence[int], batch_size: int = 1000
+    ) -> int:
+        """
+        Remove many User objects by id and drop them from the user cache.
+
+        Returns:
+            int: The number of users removed.
+        """
+        try:
+            return super().remove_many(db, ids=ids, batch_size=batch_size)
+        finally:
+            self._invalidate_users(db, ids)
+
+    async def aget_by_email(
+        self, db: AsyncSession, *, email: str, cached: bool = True
+    ) -> Optional[User]:
+        """
+        Get a User object by email, ignoring case.
+
+        Args:
+            db (AsyncSession): The async database session.
+            email (str): The email of the user.
+            cached (bool): Whether the query cache may answer; authentication passes False.
+
+        Returns:
+            Optional[User]: The User object, if found. Else, None.
+        """
+
+        async def load() -> Optional[User]:
+            result = await db.execute(
+                select(User).filter(func.lower(User.email) == email.lower())
+            )
+            return result.scalars().first()
+
+        if not cached:
+            return await load()
+        return await self._acached_lookup(db, "email", email, load)
+
+    async def aget_existing_emails(
+        self, db: AsyncSession, *, emails: Sequence[str]
+    ) -> Set[str]:
+        """
+        Find which of the given emails already belong to a User, ignoring case.
+
+        Args:
+            db (AsyncSession): The async database session.
+            emails (Sequence[str]): The emails to look up.
+
+        Returns:
+            Set[str]: The lowercased emails that are already registered.
+        """
+        rows = await db.execute(self._existing_emails_statement(emails))
+        return set(rows.scalars())
+
+    async def aget_identity(
+        self, db: AsyncSession, *, id: int
+    ) -> Optional[UserIdentity]:
+        """
+        Get an immutable snapshot of a User, served from the user cache when possible.
+
+        Args:
+            db (AsyncSession): The async database session, used only on a cache miss.
+            id (int): The id of the user.
+
+        Returns:
+            Optional[UserIdentity]: The user snapshot, if found. Else, None.
+        """
+        identity = user_cache.get(id)
+        if identity is None:
+            db_obj = await self.aget(db, id=id)
+            if db_obj is None:
+                return None
+            identity = self._cache(db_obj)
+        return identity
+
+    async def acreate(self, db: AsyncSession, *, obj_in: UserCreate) -> User:
+        """
+        Create a new User object, hashing the password without blocking the event loop.
+
+        Args:
+            db (AsyncSession): The async database session.
+            obj_in (UserCreate): A UserCreate object containing user details.
+
+        Returns:
+            User: The created User object.
+
+        Raises:
+            PasswordHashingBusy: If the password hashing queue is full.
+            IntegrityError: If the email is already registered; see `is_duplicate_email`.
+        """
+        create_data = obj_in.dict()
+        create_data.pop("password")
+        db_obj = User(**create_data)
+        db_obj.hashed_password = await password_hasher.ahash(obj_in.password)
+        db.add(db_obj)
+        await self._acommit(db)
+        self._cache_written(db, db_obj)
+        self._invalidate(db, self._lookup_values(db_obj))
+
+        return db_obj
+
+    async def aupsert_many(
+        self,
+        db: AsyncSession,
+        *,
+        objs_in: Sequence[Union[UserCreate, Dict[str, Any]]],
+        index_elements: Optional[Sequence[IndexElement]] = None,
+        update_columns: Optional[Sequence[str]] = None,
+        batch_size: int = 1000,
+    ) -> int:
+        """
+        Insert many users, updating the ones that conflict on `lower(email)`, and empty the
+        user cache.
+
+        Returns:
+            int: The number of users inserted or updated.
+
+        Raises:
+            PasswordHashingBusy: If the password hashing queue is full.
+        """
+        try:
+            return await super().aupsert_many(
+                db,
+                objs_in=objs_in,
+                index_elements=index_elements or [func.lower(User.email)],
+                update_columns=update_columns,
+                batch_size=batch_size,
+            )
+        finally:
+            self._invalidate_users(db, None)
+
+    async def aupdate(
+        self,
+        db: AsyncSession,
+        *,
+        db_obj: User,
+        obj_in: Union[UserUpdate, Dict[str, Any]]
+    ) -> User:
+        """
+        Update a User object.
+
+        Args:
+            db (AsyncSession): The async database session.
+            db_obj (User): The User object to update.
+            obj_in (Union[UserUpdate, Dict[str, Any]]): New data for update.
+
+        Returns:
+            User: The updated User object.
+        """
+        if isinstance(obj_in, dict):
+            update_data = obj_in
+        else:
+            update_data = obj_in.dict(exclude_unset=True)
+
+        db_obj = await super().aupdate(db, db_obj=db_obj, obj_in=update_data)
+        self._cache_written(db, db_obj)
+        return db_obj
+
+    async def aremove(self, db: AsyncSession, *, id: int) -> Optional[User]:
+        """
+        Remove a User object and drop it from the user cache.
+
+        Args:
+            db (AsyncSession): The async database session.
+            id (int): The id of the user to remove.
+
+        Returns:
+            Optional[User]: The removed User object, or None if there was no such user.
+        """
+        try:
+            return await super().aremove(db, id=id)
+        finally:
+            self._invalidate_users(db, [id])
 
-    def is_superuser(self, user: User) -> bool:
+    async def aremove_many(
+        self, db: AsyncSession, *, ids: Sequence[int], batch_size: int = 1000
+    ) -> int:
+        """
+        Remove many User objects by id and drop them from the user cache.
+
+        Returns:
+            int: The number of users removed.
+        """
+        try:
+            return await super().aremove_many(db, ids=ids, batch_size=batch_size)
+        finally:
+            self._invalidate_users(db, ids)
+
+    def is_superuser(self, user: Union[User, UserIdentity]) -> bool:
         """
         Check if a User is a superuser.
 
         Args:
-            user (User): The User object to check.
+            user (Union[User, UserIdentity]): The User object or snapshot to check.
 
         Returns:
             bool: True if the user is a superuser, False otherwise.
         """
         return user.is_superuser
 
+    @staticmethod
+    def _existing_emails_statement(emails: Sequence[str]) -> Any:
+        lowered = func.lower(User.email)
+        return select(lowered).filter(lowered.in_({email.lower() for email in emails}))
+
+    def _insert_values(
+        self, objs_in: Sequence[Union[UserCreate, Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        values = super()._insert_values(objs_in)
+        hashes = password_hasher.hash_many([row["password"] for row in values])
+        return self._with_hashes(values, hashes)
+
+    async def _ainsert_values(
+        self, objs_in: Sequence[Union[UserCreate, Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        values = super()._insert_values(objs_in)
+        hashes = await password_hasher.ahash_many([row["password"] for row in values])
+        return self._with_hashes(values, hashes)
+
+    @staticmethod
+    def _with_hashes(
+        values: List[Dict[str, Any]], hashes: List[str]
+    ) -> List[Dict[str, Any]]:
+        rows = []
+        for row, hashed_password in zip(values, hashes):
+            row = {name: value for name, value in row.items() if name != "password"}
+            row["hashed_password"] = hashed_password
+            rows.append(row)
+        return rows
+
+    def _cache(self, db_obj: User) -> UserIdentity:
+        identity = UserIdentity.from_orm(db_obj)
+        user_cache.set(identity.id, identity)
+        return identity
+
+    def _cache_written(self, db: Union[Session, AsyncSession], db_obj: User) -> None:
+        # A write inside a unit of work may still be rolled back, so only drop the old entry
+        if db.info.get(UNIT_OF_WORK):
+            self._invalidate_users(db, [db_obj.id])
+        else:
+            self._cache(db_obj)
+
+    @staticmethod
+    def _invalidate_users(
+        db: Union[Session, AsyncSession], ids: Optional[Sequence[int]]
+    ) -> None:
+        # Drop the snapshots now, and again once the transaction ends, so that a concurrent
+        # authentication cannot cache the rows as they were before the commit
+        if ids is None:
+            user_cache.clear()
+        else:
+            for id in ids:
+                user_cache.pop(id)
+        invalidate_on_end(getattr(db, "sync_session", db), user_cache, ids)
+
 
 # Create a CRUDUser object for User model to perform CRUD operations.
-user = CRUDUser(User)
+user = CRUDUser(
+    User,
+    query_cache=build_query_cache(
+        "user", columns=("id", "email"), case_insensitive=("email",)
+    ),
+)
@@ -0,0 +1,223 @@
+"""
+This module provides an opt-in cache for the single-record lookups of the CRUD classes, such as
+`CRUDBase.get` and `CRUDUser.get_by_email`.
+
+A `QueryCache` stores the column values of a record under the column and value it was looked
+up by. Lookups that found nothing are remembered too, for a shorter time. On a hit, the CRUD
+class rebuilds the record in the caller's session without a query.
+
+The CRUD write methods invalidate the entries of the records they change, and invalidate them
+again when the transaction ends, so that a concurrent read between the write and the commit
+cannot leave stale data behind. Writes made outside the CRUD classes show up once the
+entries expire, unless the caller uses `CRUDBase.invalidate_cache`.
+
+The backend is chosen with QUERY_CACHE_BACKEND: "memory" keeps a per-process LRU (`TTLCache`),
+"file" shares entries between the workers of a host through a private directory
+(`FileCache`), by default one per user under /dev/shm. Without a backend, lookups always query
+the database.
+
+The "memory" backend only suits a single worker: a write invalidates the writer's cache, and
+the other workers keep serving the old entry until it expires. Authentication never reads
+from the cache, so a changed password takes effect at once either way.
+
+Columns that are looked up case-insensitively, such as the user's email, are keyed by their
+lowercased value, so that every spelling of a value shares one entry.
+"""
+
+import os
+import tempfile
+from typing import Any, Iterable, List, Mapping, Optional, Sequence, Union
+
+from app.core.cache import FileCache, TTLCache
+from app.core.config import settings
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Returned by `QueryCache.get` when nothing is cached; a cached "not found" is None
+MISS = object()
+
+# Session info key listing the caches and keys to invalidate when the transaction ends
+PENDING_INVALIDATIONS = "query_cache_invalidations"
+
+
+class QueryCache:
+    """
+    Cached lookups of one model's records by unique columns.
+
+    Attributes:
+        backend: Where entries are stored.
+        columns: The unique columns records are looked up by.
+        ttl: Seconds a found record stays cached.
+        negative_ttl: Seconds a lookup that found nothing stays cached.
+        case_insensitive: The lookup columns compared by their lowercased value.
+    """
+
+    def __init__(
+        self,
+        backend: Union[TTLCache, FileCache],
+        *,
+        columns: Sequence[str],
+        ttl: float,
+        negative_ttl: float,
+        case_insensitive: Sequence[str] = (),
+    ):
+        self.backend = backend
+        self.columns = tuple(columns)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.case_insensitive = frozenset(case_insensitive)
+
+    def get(self, column: str, value: Any) -> Any:
+        """
+        Look up the cached result of a lookup.
+
+        Args:
+            column (str): The column looked up by.
+            value (Any): The value looked up.
+
+        Returns:
+            Any: The record's column values, None for a cached "not found", or `MISS`.
+        """
+        return self.backend.get(self._key(column, value), MISS)
+
+    def set(self, column: str, value: Any, row: Optional[Mapping[str, Any]]) -> None:
+        """
+        Cache the result of a lookup. A found record is cached under each of its lookup
+        columns, so it can be found by any of them afterwards.
+
+        Args:
+            column (str): The column looked up by.
+            value (Any): The value looked up.
+            row (Optional[Mapping[str, Any]]): The record's column values, or None if there
+                was no record.
+        """
+        if row is None:
+            self.backend.set(self._key(column, value), None, ttl=self.negative_ttl)
+            return
+        row = dict(row)
+        for name in self.columns:
+            if row.get(name) is not None:
+                self.backend.set(self._key(name, row[name]), row, ttl=self.ttl)
+
+    def invalidate(self, db: Session, rows: Iterable[Mapping[str, Any]]) -> None:
+        """
+        Drop the entries of records being written, now and when the transaction ends.
+
+        Args:
+            db (Session): The session writing the records; for an `AsyncSession`, pass its
+                `sync_session`.
+            rows (Iterable[Mapping[str, Any]]): Values of the cached columns of each record,
+                before and after the write.
+        """
+        keys = [
+            self._key(column, row[column])
+            for row in rows
+            for column in self.columns
+            if row.get(column) is not None
+        ]
+        self._pop(keys)
+        self._defer(db, keys)
+
+    def clear(self, db: Session) -> None:
+        """
+        Drop every entry, now and when the transaction ends, after a bulk write.
+
+        Args:
+            db (Session): The session making the bulk write.
+        """
+        self.backend.clear()
+        self._defer(db, None)
+
+    def stats(self) -> Mapping[str, int]:
+        """
+        Return the backend's size and counters.
+        """
+        return self.backend.stats()
+
+    def _key(self, column: str, value: Any) -> Any:
+        if column in self.case_insensitive and isinstance(value, str):
+            value = value.lower()
+        return (column, value)
+
+    def _defer(self, db: Session, keys: Optional[List[Any]]) -> None:
+        invalidate_on_end(db, self.backend, keys)
+
+    def _pop(self, keys: Optional[List[Any]]) -> None:
+        _drop(self.backend, keys)
+
+
+def invalidate_on_end(
+    db: Session, backend: Union[TTLCache, FileCache], keys: Optional[Iterable[Any]]
+) -> None:
+    """
+    Drop cache entries when the session's transaction ends, in addition to when it writes
+    them: a read between the write and the commit may have cached the old data meanwhile.
+
+    Args:
+        db (Session): The session writing; for an `AsyncSession`, pass its `sync_session`.
+        backend (Union[TTLCache, FileCache]): The cache.
+        keys (Optional[Iterable[Any]]): The keys to drop, or None to clear the cache.
+    """
+    if db.in_transaction():
+        pending = None if keys is None else list(keys)
+        db.info.setdefault(PENDING_INVALIDATIONS, []).append((backend, pending))
+
+
+def _drop(backend: Union[TTLCache, FileCache], keys: Optional[List[Any]]) -> None:
+    if keys is None:
+        backend.clear()
+        return
+    for key in keys:
+        backend.pop(key)
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _invalidate_pending(session: Session) -> None:
+    # Reads made after the write but before the transaction ended may have cached stale data
+    for backend, keys in session.info.pop(PENDING_INVALIDATIONS, []):
+        _drop(backend, keys)
+
+
+def build_query_cache(
+    name: str, columns: Sequence[str], case_insensitive: Sequence[str] = ()
+) -> Optional[QueryCache]:
+    """
+    Create the query cache of a model from the database settings.
+
+    Args:
+        name (str): Name of the model, used to keep its entries apart.
+        columns (Sequence[str]): The unique columns its records are looked up by.
+        case_insensitive (Sequence[str]): The columns among them compared by their
+            lowercased value.
+
+    Raises:
+        ValueError: If QUERY_CACHE_BACKEND names an unknown backend.
+
+    Returns:
+        Optional[QueryCache]: The cache, or None if query caching is off.
+    """
+    db_settings = settings.db
+    backend_name = db_settings.QUERY_CACHE_BACKEND
+    if not backend_name:
+        return None
+    ttl = db_settings.QUERY_CACHE_TTL_SECONDS
+    if backend_name == "memory":
+        backend: Union[TTLCache, FileCache] = TTLCache(
+            maxsize=db_settings.QUERY_CACHE_SIZE, ttl=ttl
+        )
+    elif backend_name == "file":
+        directory = db_settings.QUERY_CACHE_DIR or os.path.join(
+            "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(),
+            f"app-query-cache-{os.getuid()}",
+        )
+        backend = FileCache(os.path.join(directory, name), ttl=ttl)
+    else:
+        raise ValueError(f"Unknown query cache backend: {backend_name!r}")
+    return QueryCache(
+        backend,
+        columns=columns,
+        ttl=ttl,
+        negative_ttl=db_settings.QUERY_CACHE_NEGATIVE_TTL_SECONDS,
+        case_insensitive=case_insensitive,
+    )
@@ -0,0 +1,159 @@
+"""
+This module instruments SQLAlchemy connection pools so that pool exhaustion is visible.
+
+`PoolMetrics` collects checkout counts and latency, the number of connections checked out,
+overflow and timeout events for one engine. Latency is measured by a pool subclass created
+with `instrumented_pool`; the other figures come from SQLAlchemy pool events.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Type
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool
+
+
+class PoolMetrics:
+    """
+    Counters and gauges for one connection pool.
+
+    Attributes:
+        name: Label of the engine the pool belongs to.
+        checkouts: Number of connections handed out.
+        checkout_seconds_total: Total time spent waiting for a connection.
+        checkout_seconds_max: Longest time spent waiting for a connection.
+        checked_out: Connections currently checked out.
+        overflow_events: Checkouts that had to open a connection beyond `pool_size`.
+        timeouts: Checkouts that gave up after `pool_timeout`.
+        connects: New DBAPI connections opened.
+        invalidations: Connections discarded after an error.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.checkouts = 0
+        self.checkout_seconds_total = 0.0
+        self.checkout_seconds_max = 0.0
+        self.checked_out = 0
+        self.overflow_events = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self._engine: Any = None
+        self._lock = threading.Lock()
+
+    def attach(self, engine: Engine) -> None:
+        """
+        Listen to the pool events of an engine. For an `AsyncEngine`, pass its `sync_engine`.
+
+        Args:
+            engine (Engine): The engine whose pool should be observed.
+        """
+        self._engine = engine
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def record_checkout_time(self, seconds: float) -> None:
+        """
+        Record how long a checkout waited for a connection.
+
+        Args:
+            seconds (float): The time spent in `Pool.connect`.
+        """
+        with self._lock:
+            self.checkout_seconds_total += seconds
+            if seconds > self.checkout_seconds_max:
+                self.checkout_seconds_max = seconds
+
+    def record_timeout(self) -> None:
+        """
+        Record a checkout that timed out waiting for a connection.
+        """
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return the current figures together with the pool's own status.
+
+        Returns:
+            Dict[str, Any]: The pool metrics.
+        """
+        pool = self._engine.pool if self._engine is not None else None
+        with self._lock:
+            figures = {
+                "pool_class": type(pool).__name__ if pool is not None else None,
+                "checkouts": self.checkouts,
+                "checkout_seconds_avg": (
+                    self.checkout_seconds_total / self.checkouts if self.checkouts else 0.0
+                ),
+                "checkout_seconds_max": self.checkout_seconds_max,
+                "checked_out": self.checked_out,
+                "overflow_events": self.overflow_events,
+                "timeouts": self.timeouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+            }
+        for attr in ("size", "overflow", "checkedin"):
+            method = getattr(pool, attr, None)
+            if callable(method):
+                figures[f"pool_{attr}"] = method()
+        return figures
+
+    def _on_connect(self, dbapi_connection: Any, connection_record: Any) -> None:
+        # A queue pool counts an overflow connection before opening it
+        overflow = getattr(self._engine.pool, "overflow", None)
+        with self._lock:
+            self.connects += 1
+            if callable(overflow) and overflow() > 0:
+                self.overflow_events += 1
+
+    def _on_checkout(
+        self, dbapi_connection: Any, connection_record: Any, connection_proxy: Any
+    ) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+
+    def _on_checkin(self, dbapi_connection: Any, connection_record: Any) -> None:
+        with self._lock:
+            self.checked_out -= 1
+
+    def _on_invalidate(
+        self, dbapi_connection: Any, connection_record: Any, exception: Any
+    ) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+
+def instrumented_pool(poolclass: Type[Pool], metrics: PoolMetrics) -> Type[Pool]:
+    """
+    Create a subclass of a pool class that times every checkout.
+
+    The metrics are bound to the class rather than the instance, so they survive the pool
+    being recreated by `Engine.dispose`.
+
+    Args:
+        poolclass (Type[Pool]): The pool class to extend.
+        metrics (PoolMetrics): Where checkout times and timeouts are recorded.
+
+    Returns:
+        Type[Pool]: The instrumented pool class.
+    """
+
+    def connect(self: Pool) -> Any:
+        start = time.perf_counter()
+        try:
+            return poolclass.connect(self)
+        except PoolTimeoutError:
+            metrics.record_timeout()
+            raise
+        finally:
+            metrics.record_checkout_time(time.perf_counter() - start)
+
+    return type(poolclass.__name__, (poolclass,), {"connect": connect})
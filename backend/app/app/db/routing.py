@@ -0,0 +1,139 @@
+"""
+This module routes read-only work to read replicas.
+
+`RoutingSession` is a SQLAlchemy `Session` that sends SELECTs to a replica chosen by a
+`ReplicaSet`, and everything else to the primary engine. Once a session has written (a flush,
+an INSERT/UPDATE/DELETE or a SELECT ... FOR UPDATE), it stays on the primary until it is
+closed, including the refresh after a commit, so a request always reads its own writes. A new
+session may still lag behind the primary by the replication delay.
+
+Replicas are used round-robin. A replica that fails to connect or drops its connection is
+ejected for a cool-down period, and reads fall back to the primary when no replica is healthy.
+
+Locally, two SQLite files can stand in for a primary and its replica, e.g.
+SQLALCHEMY_REPLICA_URIS='["sqlite:///./testdb_replica.db"]' with a copy of testdb.db.
+"""
+
+import itertools
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import Delete, Insert, Select, Update
+
+
+class ReplicaSet:
+    """
+    A round-robin group of replica engines with health-based ejection.
+
+    Attributes:
+        engines: The replica engines (sync engines; for async use `AsyncEngine.sync_engine`).
+        eject_seconds: How long a failing replica is skipped before it is tried again.
+    """
+
+    def __init__(self, engines: List[Engine], eject_seconds: float = 30):
+        self.engines = engines
+        self.eject_seconds = eject_seconds
+        self._ejected_until: Dict[int, float] = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        for replica in engines:
+            event.listen(replica, "handle_error", self._on_error)
+
+    def choose(self) -> Optional[Engine]:
+        """
+        Pick the next healthy replica.
+
+        Returns:
+            Optional[Engine]: A replica engine, or None if there is no healthy replica.
+        """
+        if not self.engines:
+            return None
+        now = time.monotonic()
+        start = next(self._counter)
+        for offset in range(len(self.engines)):
+            replica = self.engines[(start + offset) % len(self.engines)]
+            if self._ejected_until.get(id(replica), 0.0) <= now:
+                return replica
+        return None
+
+    def eject(self, replica: Engine) -> None:
+        """
+        Skip a replica for `eject_seconds`.
+
+        Args:
+            replica (Engine): The failing replica engine.
+        """
+        with self._lock:
+            self._ejected_until[id(replica)] = time.monotonic() + self.eject_seconds
+        logger.warning(
+            f"Ejecting read replica {replica.url!r} for {self.eject_seconds}s"
+        )
+
+    def status(self) -> List[Dict[str, Any]]:
+        """
+        Report whether each replica is currently in rotation.
+
+        Returns:
+            List[Dict[str, Any]]: The URL and health of every replica.
+        """
+        now = time.monotonic()
+        return [
+            {
+                "url": repr(replica.url),
+                "healthy": self._ejected_until.get(id(replica), 0.0) <= now,
+            }
+            for replica in self.engines
+        ]
+
+    def _on_error(self, context: Any) -> None:
+        # A failed connect has no connection yet; a dropped one is flagged as a disconnect
+        if context.is_disconnect or context.connection is None:
+            self.eject(context.engine)
+
+
+class RoutingSession(Session):
+    """
+    A session that reads from replicas until it writes, then stays on the primary until closed.
+
+    Args:
+        primary (Engine): The engine that receives writes and locking reads.
+        replicas (Optional[ReplicaSet]): Where reads are sent; None reads from the primary.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        primary: Engine,
+        replicas: Optional[ReplicaSet] = None,
+        **kwargs: Any,
+    ):
+        kwargs.pop("bind", None)
+        super().__init__(*args, bind=primary, **kwargs)
+        self.primary = primary
+        self.replicas = replicas
+        self.wrote = False
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kwargs: Any) -> Engine:
+        """
+        Choose the engine for a statement: a replica for plain reads outside a write
+        transaction, the primary for everything else.
+        """
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            self.wrote = True
+        elif isinstance(clause, Select) and clause._for_update_arg is not None:
+            self.wrote = True
+        if self.wrote or self.replicas is None or not isinstance(clause, Select):
+            return self.primary
+        return self.replicas.choose() or self.primary
+
+    def close(self) -> None:
+        """
+        Close the session; if it is used again, its reads start on the replicas again.
+        """
+        super().close()
+        self.wrote = False
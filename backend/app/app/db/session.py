@@ -7,11 +7,40 @@ connect to the database.
 
 The `SessionLocal` object is an instance of `sqlalchemy.orm.sessionmaker` and is
 used to create new sessions for interacting with the database.
+
+The `async_engine` and `AsyncSessionLocal` objects are their asyncio counterparts, used by
+`async def` routes so that database access does not need a threadpool slot. They connect
+through asyncpg for PostgreSQL and aiosqlite for SQLite. Other databases, such as MySQL, Oracle
+or SQL Server, have no async engine: their async sessions are `ThreadedAsyncSession`s, which
+run the sync sessions in the threadpool (see `app.db.threaded`).
+
+`ReadSessionLocal` and `AsyncReadSessionLocal` create routing sessions that send reads to the
+replicas listed in `SQLALCHEMY_REPLICA_URIS` (see `app.db.routing`).
+
+All engines use the pool settings from `settings.db` and report pool telemetry through
+`pool_metrics`. File-backed SQLite databases get the profile from `app.db.sqlite` and a
+queue pool, so that tuned connections are reused instead of reopened for every session.
 """
 
+from typing import Any, Dict, List, Optional
+
 from app.core.config import settings
+from app.db.pool_metrics import PoolMetrics, instrumented_pool
+from app.db.routing import ReplicaSet, RoutingSession
+from app.db.sqlite import apply_sqlite_profile, is_sqlite_file
+from app.db.threaded import ThreadedAsyncSession
+from loguru import logger
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Async drivers for the dialects that have one available
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
 
 # Heroku workaround: https://help.heroku.com/ZKNTJQSK/why-is-sqlalchemy-1-4-x-not-connecting-to-heroku-postgres
 connection_uri = settings.db.SQLALCHEMY_DATABASE_URI
@@ -35,9 +64,175 @@ else:
 if connection_uri.startswith("postgres://"):
     connection_uri = connection_uri.replace("postgres://", "postgresql://", 1)
 
-engine = create_engine(
-    connection_uri,
-)
+# Pool telemetry per engine, keyed by engine label
+pool_metrics: Dict[str, PoolMetrics] = {}
+
+
+def get_engine_options(uri: str, metrics: PoolMetrics) -> Dict[str, Any]:
+    """
+    Build the pool options for an engine from the database settings.
+
+    The dialect's default pool class is kept, wrapped to time checkouts, except for file-backed
+    SQLite, which gets a queue pool of connections shareable across threads. Sizing options are
+    only passed to queue pools, since SQLite's in-memory pool does not accept them.
+
+    Args:
+        uri: The connection URI of the engine.
+        metrics: Where the pool's checkout times are recorded.
+
+    Returns:
+        Keyword arguments for `create_engine` or `create_async_engine`.
+    """
+    url = make_url(uri)
+    dialect = url.get_dialect()
+    options: Dict[str, Any] = {}
+    if is_sqlite_file(url):
+        if dialect.is_async:
+            poolclass = AsyncAdaptedQueuePool
+        else:
+            poolclass = QueuePool
+            options["connect_args"] = {"check_same_thread": False}
+    else:
+        poolclass = dialect.get_pool_class(url)
+    options.update(
+        poolclass=instrumented_pool(poolclass, metrics),
+        pool_pre_ping=settings.db.DB_POOL_PRE_PING,
+        pool_recycle=settings.db.DB_POOL_RECYCLE,
+    )
+    if issubclass(poolclass, QueuePool):
+        options.update(
+            pool_size=settings.db.DB_POOL_SIZE,
+            max_overflow=settings.db.DB_MAX_OVERFLOW,
+            pool_timeout=settings.db.DB_POOL_TIMEOUT,
+        )
+    return options
+
+
+def create_instrumented_engine(uri: str, label: str) -> Engine:
+    """
+    Create an engine with the configured pool, pool telemetry and, for SQLite, the profile.
+
+    Args:
+        uri: The connection URI.
+        label: Key of the engine's entry in `pool_metrics`.
+
+    Returns:
+        The new engine.
+    """
+    metrics = pool_metrics[label] = PoolMetrics(label)
+    new_engine = create_engine(uri, **get_engine_options(uri, metrics))
+    metrics.attach(new_engine)
+    if is_sqlite_file(new_engine.url):
+        apply_sqlite_profile(new_engine)
+    return new_engine
+
+
+def create_instrumented_async_engine(uri: str, label: str) -> AsyncEngine:
+    """
+    Create an async engine for a synchronous URI, configured like `create_instrumented_engine`.
+
+    Args:
+        uri: The synchronous connection URI; it is rewritten to the dialect's async driver.
+        label: Key of the engine's entry in `pool_metrics`.
+
+    Raises:
+        ValueError: If the dialect has no supported async driver.
+
+    Returns:
+        The new async engine.
+    """
+    async_uri = get_async_connection_uri(uri)
+    metrics = PoolMetrics(label)
+    new_engine = create_async_engine(async_uri, **get_engine_options(async_uri, metrics))
+    pool_metrics[label] = metrics
+    metrics.attach(new_engine.sync_engine)
+    if is_sqlite_file(new_engine.url):
+        apply_sqlite_profile(new_engine.sync_engine)
+    return new_engine
+
+
+def get_async_connection_uri(uri: str) -> str:
+    """
+    Rewrite a synchronous connection URI to use the async driver of its dialect.
+
+    Args:
+        uri: The synchronous connection URI, e.g. "postgresql://..." or "sqlite:///./testdb.db".
+
+    Raises:
+        ValueError: If the dialect has no supported async driver.
+
+    Returns:
+        The connection URI for the async driver.
+    """
+    scheme, sep, rest = uri.partition("://")
+    dialect = scheme.split("+", 1)[0]
+    if dialect not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for the '{dialect}' dialect")
+    return f"{ASYNC_DRIVERS[dialect]}{sep}{rest}"
+
+
+engine = create_instrumented_engine(connection_uri, "sync")
 
 # Create a session factory with thread awareness
-SessionLocal = sessionmaker(bind=engine)
\ No newline at end of file
+SessionLocal = sessionmaker(bind=engine)
+
+# Without an async driver, async sessions fall back to sync sessions run in the threadpool
+async_engine: Optional[AsyncEngine]
+try:
+    async_engine = create_instrumented_async_engine(connection_uri, "async")
+except (ValueError, ImportError) as exc:
+    logger.warning(f"Async database access falls back to the threadpool: {exc}")
+    async_engine = None
+
+# Objects stay usable after commit, as an async session cannot lazily reload expired attributes
+if async_engine is not None:
+    AsyncSessionLocal = sessionmaker(
+        bind=async_engine, class_=AsyncSession, expire_on_commit=False
+    )
+else:
+    _ThreadedSessionLocal = sessionmaker(bind=engine, expire_on_commit=False)
+
+    def AsyncSessionLocal() -> ThreadedAsyncSession:
+        return ThreadedAsyncSession(_ThreadedSessionLocal())
+
+# Read replicas; without any, read sessions use the primary engines
+replica_uris = [
+    uri.replace("postgres://", "postgresql://", 1) if uri.startswith("postgres://") else uri
+    for uri in settings.db.SQLALCHEMY_REPLICA_URIS
+]
+replica_set = ReplicaSet(
+    [
+        create_instrumented_engine(uri, f"replica{index}")
+        for index, uri in enumerate(replica_uris)
+    ],
+    eject_seconds=settings.db.DB_REPLICA_EJECT_SECONDS,
+)
+
+# Create a session factory that sends reads to the replicas until the session writes
+ReadSessionLocal = sessionmaker(
+    class_=RoutingSession,
+    primary=engine,
+    replicas=replica_set,
+)
+
+# Async counterparts of the replica engines, disposed with the primary async engine
+async_replica_engines: List[AsyncEngine] = []
+if async_engine is not None:
+    async_replica_engines = [
+        create_instrumented_async_engine(uri, f"async_replica{index}")
+        for index, uri in enumerate(replica_uris)
+    ]
+    AsyncReadSessionLocal = sessionmaker(
+        class_=AsyncSession,
+        sync_session_class=RoutingSession,
+        primary=async_engine.sync_engine,
+        replicas=ReplicaSet(
+            [replica.sync_engine for replica in async_replica_engines],
+            eject_seconds=settings.db.DB_REPLICA_EJECT_SECONDS,
+        ),
+        expire_on_commit=False,
+    )
+else:
+
+    def AsyncReadSessionLocal() -> ThreadedAsyncSession:
+        return ThreadedAsyncSession(ReadSessionLocal(expire_on_commit=False))
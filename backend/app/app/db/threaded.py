@@ -0,0 +1,99 @@
+"""
+This module lets the async routes run on databases without an async driver.
+
+`ThreadedAsyncSession` wraps a synchronous `Session` behind the subset of the `AsyncSession`
+interface that the CRUD classes and the API use: every call that may do I/O runs the sync
+session's method in the threadpool and is awaited, the others are passed through. Results
+come back buffered, as with `AsyncSession.execute`; `stream` fetches each partition in the
+threadpool.
+
+The calls of a session are never concurrent, so handing it from one threadpool thread to the
+next is safe, as it is for a sync session used from `def` routes.
+"""
+
+from typing import Any, AsyncIterator, Optional, Sequence
+
+from sqlalchemy.engine import Result
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+
+class ThreadedStreamResult:
+    """
+    The result of `ThreadedAsyncSession.stream`, fetched partition by partition in the
+    threadpool.
+    """
+
+    def __init__(self, result: Result):
+        self._result = result
+
+    def mappings(self) -> "ThreadedStreamResult":
+        return ThreadedStreamResult(self._result.mappings())
+
+    async def partitions(self, size: Optional[int] = None) -> AsyncIterator[Sequence[Any]]:
+        partitions = self._result.partitions(size)
+        while True:
+            partition = await run_in_threadpool(next, partitions, None)
+            if partition is None:
+                return
+            yield partition
+
+
+class ThreadedAsyncSession:
+    """
+    An `AsyncSession` stand-in that runs a sync session's I/O in the threadpool.
+
+    Attributes:
+        sync_session: The wrapped session.
+    """
+
+    def __init__(self, sync_session: Session):
+        self.sync_session = sync_session
+
+    @property
+    def info(self) -> dict:
+        return self.sync_session.info
+
+    def add(self, instance: Any) -> None:
+        self.sync_session.add(instance)
+
+    def get_bind(self, *args: Any, **kwargs: Any) -> Any:
+        return self.sync_session.get_bind(*args, **kwargs)
+
+    def in_transaction(self) -> bool:
+        return self.sync_session.in_transaction()
+
+    async def execute(self, statement: Any, *args: Any, **kwargs: Any) -> Result:
+        return await run_in_threadpool(self.sync_session.execute, statement, *args, **kwargs)
+
+    async def stream(self, statement: Any, *args: Any, **kwargs: Any) -> ThreadedStreamResult:
+        statement = statement.execution_options(stream_results=True)
+        result = await self.execute(statement, *args, **kwargs)
+        return ThreadedStreamResult(result)
+
+    async def get(self, *args: Any, **kwargs: Any) -> Any:
+        return await run_in_threadpool(self.sync_session.get, *args, **kwargs)
+
+    async def refresh(self, *args: Any, **kwargs: Any) -> None:
+        await run_in_threadpool(self.sync_session.refresh, *args, **kwargs)
+
+    async def delete(self, instance: Any) -> None:
+        await run_in_threadpool(self.sync_session.delete, instance)
+
+    async def flush(self) -> None:
+        await run_in_threadpool(self.sync_session.flush)
+
+    async def commit(self) -> None:
+        await run_in_threadpool(self.sync_session.commit)
+
+    async def rollback(self) -> None:
+        await run_in_threadpool(self.sync_session.rollback)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.sync_session.close)
+
+    async def __aenter__(self) -> "ThreadedAsyncSession":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
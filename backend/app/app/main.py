@@ -1,21 +1,25 @@
-import json
-from loguru import logger
-import time
 from pathlib import Path
+from typing import Dict
 
 from app import crud
-from app.api import deps
 from app.api.api_v1.api import api_router
+from app.api.prometheus import collect_runtime_metrics
+from app.api.prometheus import router as prometheus_router
+from app.api.pages import CachedPage
+from app.api.responses import JSON_RESPONSE_CLASS, FastJSONRoute, json_response
+from app.core.compression import ENCODINGS, CompressionMiddleware
 from app.core.config import settings, setup_app_logging
-from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request
+from app.core.metrics import metrics_store
+from app.core.middleware import RequestLogMiddleware
+from app.core.security import PasswordHashingBusy, password_hasher
+from app.db.session import async_engine, async_replica_engines
+from fastapi import APIRouter, FastAPI, HTTPException, Request, Response
 from loguru import logger
-from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from starlette.middleware.base import BaseHTTPMiddleware
+from sqlalchemy.orm.exc import StaleDataError
+from starlette.exceptions import HTTPException as StarletteHTTPException
 
 
 # Define the base path of this script
@@ -24,49 +28,146 @@ BASE_PATH = Path(__file__).resolve().parent
 # Create a Jinja2Templates instance for rendering HTML templates
 TEMPLATES = Jinja2Templates(directory=str(BASE_PATH / "templates"))
 
-setup_app_logging(config=settings)
-
-import asyncio
-import json
+# Pages rendered from templates without per-request data, built once at startup
+PAGES: Dict[str, CachedPage] = {
+    name: CachedPage(
+        TEMPLATES,
+        name,
+        reload=settings.TEMPLATES_RELOAD,
+        minimum_size=settings.compression.COMPRESSION_MINIMUM_SIZE,
+        gzip_level=settings.compression.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.compression.COMPRESSION_BROTLI_QUALITY,
+        encodings=ENCODINGS if settings.compression.COMPRESSION_ENABLED else (),
+    )
+    for name in ("index.html",)
+}
 
-from starlette.requests import Request
-from starlette.types import ASGIApp, Message, Receive, Scope, Send
+setup_app_logging(config=settings)
 
 
-class LogMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        if hasattr(request.state, "body"):
-            body_json = request.state.body
-        else:
-            body_json = None
-        logger.info(f"Incoming request: {request.method} {request.url} {body_json}")
-        response = await call_next(request)
-        return response
+root_router = APIRouter(route_class=FastJSONRoute)
+app = FastAPI(
+    title="App API",
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=JSON_RESPONSE_CLASS,
+)
+# Routes declared on the app itself, such as /ping, report their render time too
+app.router.route_class = FastJSONRoute
 
+logger.info("FastAPI application created")
 
-root_router = APIRouter()
-app = FastAPI(title="App API", openapi_url=f"{settings.API_V1_STR}/openapi.json")
 
-logger.info("FastAPI application created")
+@app.exception_handler(StarletteHTTPException)
+async def http_exception_handler(request: Request, exc: StarletteHTTPException):
+    """
+    Render HTTP errors with the application's default JSON response class.
+    """
+    return json_response(
+        {"detail": exc.detail},
+        status_code=exc.status_code,
+        headers=getattr(exc, "headers", None),
+    )
 
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    return JSONResponse(
+    return json_response(
+        {"detail": exc.errors(), "body": exc.body},
         status_code=400,
-        content=jsonable_encoder({"detail": exc.errors(), "body": exc.body}),
     )
 
 
-@app.middleware("http")
-async def log_request(request: Request, call_next):
-    logger.info(f"Incoming request: {request.method} {request.url}")
-    response = await call_next(request)
-    return response
+@app.exception_handler(PasswordHashingBusy)
+async def password_hashing_busy_handler(request: Request, exc: PasswordHashingBusy):
+    """
+    Shed login and signup load with a 503 when the password hashing queue is full.
+    """
+    logger.warning(f"Shedding {request.method} {request.url.path}: {exc}")
+    return json_response(
+        {"detail": "Server is busy, please retry shortly"},
+        status_code=503,
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.exception_handler(StaleDataError)
+async def stale_data_handler(request: Request, exc: StaleDataError):
+    """
+    Answer a write that lost the race against a concurrent update of the same row with a
+    409, instead of a 500; the client can reload the record and retry.
+    """
+    logger.info(f"Conflicting update on {request.method} {request.url.path}: {exc}")
+    return json_response(
+        {"detail": "The record was modified by another request, please reload it"},
+        status_code=409,
+    )
+
+
+@app.on_event("startup")
+def load_pages() -> None:
+    """
+    Render and compress the cached pages when the application starts, so that serving them
+    costs no rendering or compression.
+    """
+    for page in PAGES.values():
+        page.load()
+
+
+@app.on_event("shutdown")
+def shutdown_password_hasher() -> None:
+    """
+    Stop the password hashing worker processes when the application shuts down.
+    """
+    password_hasher.shutdown()
+
+
+@app.on_event("shutdown")
+async def dispose_async_engine() -> None:
+    """
+    Close the async engines' pooled connections when the application shuts down.
+    """
+    if async_engine is not None:
+        await async_engine.dispose()
+    for replica in async_replica_engines:
+        await replica.dispose()
+
+
+@app.on_event("startup")
+def start_metrics_publisher() -> None:
+    """
+    Start copying this worker's pool, cache and hashing figures into its metric files, from a
+    background thread rather than on the request path.
+    """
+    if metrics_store is not None:
+        metrics_store.start_publishing()
+
+
+@app.on_event("shutdown")
+def close_metrics_store() -> None:
+    """
+    Close this worker's metric files and drop its gauges when the application shuts down.
+    """
+    if metrics_store is not None:
+        metrics_store.close()
 
 
-app.add_middleware(LogMiddleware)
-logger.info("LogMiddleware added to the application")
+# Registered last so that the other shutdown handlers' logs are written too
+@app.on_event("shutdown")
+def flush_logs() -> None:
+    """
+    Wait for the enqueued log records to be written when the application shuts down.
+    """
+    logger.complete()
+
+
+if settings.compression.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression.COMPRESSION_MINIMUM_SIZE,
+        gzip_level=settings.compression.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.compression.COMPRESSION_BROTLI_QUALITY,
+    )
+    logger.info("CompressionMiddleware added to the application")
 
 # Set all CORS enabled origins
 if settings.BACKEND_CORS_ORIGINS:
@@ -80,25 +181,39 @@ if settings.BACKEND_CORS_ORIGINS:
     )
     logger.info("CORS middleware added to the application")
 
+# Added last so that it is the outermost middleware and times the whole stack
+app.add_middleware(
+    RequestLogMiddleware,
+    sample_rate=settings.logging.REQUEST_LOG_SAMPLE_RATE,
+    route_sample_rates=settings.logging.REQUEST_LOG_ROUTE_SAMPLE_RATES,
+    slow_seconds=(
+        settings.logging.REQUEST_LOG_SLOW_MS / 1000
+        if settings.logging.REQUEST_LOG_SLOW_MS is not None
+        else None
+    ),
+    server_timing=settings.logging.SERVER_TIMING,
+    log_timings=settings.logging.REQUEST_LOG_TIMINGS,
+    metrics=metrics_store,
+)
+logger.info("RequestLogMiddleware added to the application")
+
 
 @root_router.get("/", status_code=200)
-def root(
-    request: Request,
-    db: Session = Depends(deps.get_db),
-) -> dict:
+async def root(request: Request) -> Response:
     """
     Root GET request handler.
 
-    This function handles GET requests to the root ("/") endpoint.
+    This function handles GET requests to the root ("/") endpoint. The page is served from
+    its cached rendering, without a database session or a thread of the threadpool.
 
     Args:
         request: The incoming HTTP request.
-        db: A SQLAlchemy Session object for database operations.
 
     Returns:
-        A dictionary that is used to render an HTML template.
+        The index.html page in the encoding the client prefers, or a 304 if the client's
+        copy is current.
     """
-    return TEMPLATES.TemplateResponse("index.html", {"request": request})
+    return PAGES["index.html"].response(request)
 
 
 @app.get("/ping")
@@ -106,28 +221,12 @@ async def pong():
     return {"ping": "pong!"}
 
 
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    """
-    Middleware to add a custom X-Process-Time header to all HTTP responses.
-
-    Args:
-        request: The incoming HTTP request.
-        call_next: A function to call the next middleware or route handler.
-
-    Returns:
-        The HTTP response with the added header.
-    """
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
-
-
 # Include the routers
 app.include_router(api_router, prefix=settings.API_V1_STR)
 app.include_router(root_router)
+app.include_router(prometheus_router)
+if metrics_store is not None:
+    metrics_store.add_collector(collect_runtime_metrics)
 
 logger.info("Routers have been included in the application")
 
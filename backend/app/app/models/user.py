@@ -4,10 +4,16 @@ application.
 
 The `User` model has several attributes, including `id`, `first_name`,
 `surname`, `email`, `is_superuser`, and `hashed_password`.
+
+Emails are unique regardless of case: the unique index is on `lower(email)`, so lookups by
+email must compare `func.lower(User.email)` with the lowercased email to use it.
+
+`version` is the row's version counter: SQLAlchemy bumps it with every update and refuses to
+update a row whose version changed since it was loaded. ETags of users are derived from it.
 """
 
 from app.db.base_class import Base
-from sqlalchemy import Boolean, Column, Integer, String
+from sqlalchemy import Boolean, Column, Index, Integer, String, func
 from sqlalchemy.orm import relationship
 
 
@@ -22,6 +28,7 @@ class User(Base):
         email: The email address of the user.
         is_superuser: Whether or not the user is a superuser.
         hashed_password: The hashed password of the user.
+        version: The version of the row, bumped by every update.
     """
 
     __tablename__ = "user"
@@ -29,8 +36,14 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String(256), nullable=True)
     surname = Column(String(256), nullable=True)
-    email = Column(String, index=True, nullable=False)
+    email = Column(String, nullable=False)
     is_superuser = Column(Boolean, default=False)
 
     # New addition
     hashed_password = Column(String, nullable=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __table_args__ = (
+        Index("ix_user_email_lower", func.lower(email), unique=True),
+    )
+    __mapper_args__ = {"version_id_col": version}
@@ -1 +1 @@
-from .user import User, UserBase, UserCreate, UserInDB, UserInDBBase, UserUpdate
+from .user import User, UserBase, UserCreate, UserIdentity, UserImportError, UserImportReport, UserInDB, UserInDBBase, UserPage, UserUpdate
@@ -10,7 +10,7 @@ TODO:
    between `User`, `UserInDB` and `UserInDBBase`.
 """
 
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, EmailStr
 
@@ -68,3 +68,49 @@ class User(UserInDBBase):
     """
 
     ...
+
+
+class UserIdentity(UserInDBBase):
+    """
+    An immutable snapshot of a stored user. Snapshots are shared between requests through
+    the user cache, so unlike ORM instances they cannot be modified or lazily reloaded.
+    The row version identifies the snapshot, e.g. for ETags.
+    """
+
+    id: int
+    version: int
+
+    class Config:
+        orm_mode = True
+        allow_mutation = False
+
+
+class UserPage(BaseModel):
+    """
+    A page of users from a keyset-paginated listing. Pass `next_cursor` back to get the
+    following page; it is None on the last page.
+    """
+
+    items: List[User]
+    next_cursor: Optional[str] = None
+
+
+class UserImportError(BaseModel):
+    """
+    A row of a user import that was not created, identified by its line in the file.
+    """
+
+    line: int
+    errors: List[str]
+
+
+class UserImportReport(BaseModel):
+    """
+    The outcome of a user import. At most a fixed number of failed rows are listed in
+    `errors`; `failed` counts all of them and `errors_truncated` tells whether some are missing.
+    """
+
+    created: int = 0
+    failed: int = 0
+    errors: List[UserImportError] = []
+    errors_truncated: bool = False
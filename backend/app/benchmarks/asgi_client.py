@@ -0,0 +1,91 @@
+"""
+Minimal in-process ASGI client for the benchmarks.
+
+Requests are driven straight through the application's ASGI interface, so the numbers
+include routing, middleware, dependencies and the threadpool but no socket or HTTP parsing
+overhead, and many requests can be kept in flight concurrently on a single event loop.
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+from starlette.types import ASGIApp
+
+
+async def request(
+    app: ASGIApp,
+    method: str,
+    path: str,
+    headers: Optional[Dict[str, str]] = None,
+    body: bytes = b"",
+) -> Tuple[int, Dict[str, str], bytes]:
+    """
+    Send one HTTP request to an ASGI application.
+
+    Returns:
+        The response status, headers and body.
+    """
+    raw_path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": raw_path,
+        "raw_path": raw_path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [
+            (k.lower().encode(), v.encode()) for k, v in (headers or {}).items()
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+    request_sent = False
+    status = 0
+    response_headers: Dict[str, str] = {}
+    chunks: List[bytes] = []
+
+    async def receive() -> dict:
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()  # never disconnects
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            response_headers.update(
+                (k.decode(), v.decode()) for k, v in message.get("headers", [])
+            )
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, response_headers, b"".join(chunks)
+
+
+async def load(
+    app: ASGIApp,
+    path: str,
+    clients: int,
+    requests_per_client: int,
+    headers: Optional[Dict[str, str]] = None,
+) -> float:
+    """
+    Run `clients` concurrent loops of GET requests and return the requests per second.
+    """
+
+    async def client() -> None:
+        for _ in range(requests_per_client):
+            status, _, _ = await request(app, "GET", path, headers=headers)
+            assert status < 500, f"{path} returned {status}"
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return clients * requests_per_client / (time.perf_counter() - start)
@@ -0,0 +1,67 @@
+"""
+Compare requests/sec of a sync and an async database route under many concurrent clients.
+
+Both routes load one user by id: `/sync` through `get_db` and `CRUDBase.get` in the
+threadpool, `/async` through `get_async_db` and `CRUDBase.aget` on the event loop.
+
+Usage (from backend/app, with the usual environment variables set):
+    python benchmarks/bench_async_db.py --clients 500 --requests 10
+"""
+
+import argparse
+import asyncio
+
+from app import crud
+from app.api import deps
+from app.db.session import SessionLocal, async_engine
+from fastapi import Depends, FastAPI
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import asgi_client
+
+bench_app = FastAPI()
+
+
+@bench_app.get("/sync/{user_id}")
+def sync_user(user_id: int, db: Session = Depends(deps.get_db)) -> dict:
+    return {"found": crud.user.get(db, id=user_id) is not None}
+
+
+@bench_app.get("/async/{user_id}")
+async def async_user(
+    user_id: int, db: AsyncSession = Depends(deps.get_async_db)
+) -> dict:
+    return {"found": await crud.user.aget(db, id=user_id) is not None}
+
+
+async def _run(path: str, clients: int, requests: int) -> float:
+    # One event loop per run; pooled async connections must not outlive their loop
+    try:
+        await asgi_client.load(bench_app, path, 10, 5)
+        return await asgi_client.load(bench_app, path, clients, requests)
+    finally:
+        if async_engine is not None:
+            await async_engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--requests", type=int, default=10)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    first = crud.user.get_multi(db, limit=1)
+    db.close()
+    user_id = first[0].id if first else 1
+
+    print(f"{args.clients} concurrent clients x {args.requests} requests")
+    for kind in ("sync", "async"):
+        path = f"/{kind}/{user_id}"
+        rps = asyncio.run(_run(path, args.clients, args.requests))
+        print(f"{kind:>6} {rps:>9.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Measure bulk insert throughput in rows/sec at several batch sizes.
+
+Each batch is one `create_many` call, i.e. one transaction, so batch size 1 costs about what
+`create` per row does. Two loads are timed against a scratch SQLite file: plain rows with a
+precomputed hash through `CRUDBase`, which shows the database cost alone, and users through
+`crud.user`, which also hashes every password on the hashing pool.
+
+Before timing, `crud.user.upsert_many` is checked to update, rather than duplicate, a user
+whose email is already registered in another case.
+
+Usage (from backend/app, with the usual environment variables set):
+    python benchmarks/bench_bulk_create.py --rows 10000 --batch-sizes 1 100 10000
+
+bcrypt rounds default to the minimum here so that hashing does not hide database costs.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable, List
+
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from app import crud, schemas  # noqa: E402
+from app.core.security import get_password_hash, password_hasher  # noqa: E402
+from app.crud.base import CRUDBase  # noqa: E402
+from app.db.base_class import Base  # noqa: E402
+from app.db.sqlite import apply_sqlite_profile  # noqa: E402
+from app.models.user import User  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+
+def _load(
+    path: str, rows: int, batch_size: int, create_many: Callable[[Session, list], int]
+) -> float:
+    engine = create_engine(f"sqlite:///{path}")
+    apply_sqlite_profile(engine)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        start = time.perf_counter()
+        for offset in range(0, rows, batch_size):
+            create_many(db, list(range(offset, min(offset + batch_size, rows))))
+        elapsed = time.perf_counter() - start
+    engine.dispose()
+    return rows / elapsed
+
+
+def _plain_rows(hashed_password: str) -> Callable[[Session, list], int]:
+    crud_rows = CRUDBase(User)
+
+    def create_many(db: Session, ids: List[int]) -> int:
+        objs_in = [
+            {"email": f"user{i}@example.com", "hashed_password": hashed_password}
+            for i in ids
+        ]
+        return crud_rows.create_many(db, objs_in=objs_in, batch_size=len(ids))
+
+    return create_many
+
+
+def _users(db: Session, ids: List[int]) -> int:
+    objs_in = [
+        schemas.UserCreate(email=f"user{i}@example.com", password=f"password-{i}")
+        for i in ids
+    ]
+    return crud.user.create_many(db, objs_in=objs_in, batch_size=len(ids))
+
+
+def _check_upsert(path: str) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    apply_sqlite_profile(engine)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        crud.user.create_many(
+            db, objs_in=[schemas.UserCreate(email="upsert@example.com", password="before")]
+        )
+        crud.user.upsert_many(
+            db,
+            objs_in=[
+                schemas.UserCreate(
+                    email="Upsert@Example.com", password="after", first_name="Updated"
+                )
+            ],
+        )
+        users = db.query(User).all()
+        assert len(users) == 1, "upsert_many inserted a duplicate email"
+        assert users[0].first_name == "Updated", "upsert_many did not update the user"
+        assert users[0].version == 2, "upsert_many did not bump the version"
+    engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 100, 10_000])
+    args = parser.parse_args()
+
+    plain = _plain_rows(get_password_hash("bench"))
+    print(f"{'batch':>7} {'rows/s':>10} {'users/s':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bulk.db")
+        _check_upsert(path)
+        for batch_size in args.batch_sizes:
+            rows_per_second = _load(path, args.rows, batch_size, plain)
+            users_per_second = _load(path, args.rows, batch_size, _users)
+            print(f"{batch_size:>7} {rows_per_second:>10.0f} {users_per_second:>10.0f}")
+    password_hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
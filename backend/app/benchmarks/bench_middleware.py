@@ -0,0 +1,110 @@
+"""
+Measure the per-request overhead of the request logging and timing middleware on `/ping`.
+
+The same `/ping` route is served without middleware, with the previous stack (a
+`BaseHTTPMiddleware` logger and two `@app.middleware("http")` functions, which log each request
+twice) and with the pure ASGI `RequestLogMiddleware`, logging every request, logging 1% of them,
+and logging 1% of them with the Server-Timing header on. The overhead is each stack's time per
+request minus the bare application's. Log lines are formatted but discarded, so the numbers
+include the cost of logging but not of writing to stderr.
+
+Usage (from backend/app, with the usual environment variables set):
+    python benchmarks/bench_middleware.py --clients 50 --requests 200
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Callable
+
+from app.core.middleware import RequestLogMiddleware
+from fastapi import FastAPI, Request
+from loguru import logger
+from starlette.middleware.base import BaseHTTPMiddleware
+
+import asgi_client
+
+
+class LogMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if hasattr(request.state, "body"):
+            body_json = request.state.body
+        else:
+            body_json = None
+        logger.info(f"Incoming request: {request.method} {request.url} {body_json}")
+        return await call_next(request)
+
+
+def _ping_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def pong():
+        return {"ping": "pong!"}
+
+    return app
+
+
+def _base_http_app() -> FastAPI:
+    app = _ping_app()
+
+    @app.middleware("http")
+    async def log_request(request: Request, call_next):
+        logger.info(f"Incoming request: {request.method} {request.url}")
+        return await call_next(request)
+
+    app.add_middleware(LogMiddleware)
+
+    @app.middleware("http")
+    async def add_process_time_header(request: Request, call_next):
+        start_time = time.time()
+        response = await call_next(request)
+        response.headers["X-Process-Time"] = str(time.time() - start_time)
+        return response
+
+    return app
+
+
+def _asgi_app(sample_rate: float, server_timing: bool = False) -> Callable[[], FastAPI]:
+    def build() -> FastAPI:
+        app = _ping_app()
+        app.add_middleware(
+            RequestLogMiddleware, sample_rate=sample_rate, server_timing=server_timing
+        )
+        return app
+
+    return build
+
+
+async def _run(app: FastAPI, clients: int, requests: int) -> float:
+    await asgi_client.load(app, "/ping", 10, 50)
+    return await asgi_client.load(app, "/ping", clients, requests)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(lambda message: None, level="INFO")
+
+    print(f"{args.clients} concurrent clients x {args.requests} requests")
+    print(f"{'middleware':>11} {'req/s':>9} {'us/req':>8} {'overhead':>9}")
+    bare_us = None
+    for label, build in (
+        ("none", _ping_app),
+        ("base-http", _base_http_app),
+        ("asgi", _asgi_app(1.0)),
+        ("asgi-1%", _asgi_app(0.01)),
+        ("asgi-1%+st", _asgi_app(0.01, server_timing=True)),
+    ):
+        rps = asyncio.run(_run(build(), args.clients, args.requests))
+        us = 1e6 / rps
+        bare_us = us if bare_us is None else bare_us
+        print(f"{label:>11} {rps:>9.0f} {us:>8.1f} {us - bare_us:>+9.1f}")
+
+
+if __name__ == "__main__":
+    main()
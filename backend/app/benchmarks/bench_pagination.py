@@ -0,0 +1,76 @@
+"""
+Compare per-page latency of OFFSET pagination (`get_multi`) and keyset pagination (`get_page`)
+as the page depth grows.
+
+The benchmark fills a scratch SQLite file with `--rows` users (1M by default) and times
+fetching one page at several depths with each method. OFFSET latency grows with the depth;
+keyset latency stays flat.
+
+Usage (from backend/app, with the usual environment variables set):
+    python benchmarks/bench_pagination.py --rows 1000000 --page-size 100
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from app import crud
+from app.db.base_class import Base
+from app.models.user import User
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+
+def _fill(engine, rows: int) -> None:
+    Base.metadata.create_all(engine)
+    batch = 50_000
+    with engine.begin() as connection:
+        for start in range(0, rows, batch):
+            connection.execute(
+                insert(User),
+                [
+                    {"email": f"user{i}@example.com", "hashed_password": "x"}
+                    for i in range(start, min(start + batch, rows))
+                ],
+            )
+
+
+def _time(fn, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        _run(os.path.join(directory, "pagination.db"), args.rows, args.page_size)
+
+
+def _run(path: str, rows: int, page_size: int) -> None:
+    engine = create_engine(f"sqlite:///{path}")
+    print(f"Filling {path} with {rows} users...")
+    _fill(engine, rows)
+
+    print(f"{'depth':>9} {'offset ms':>10} {'keyset ms':>10}")
+    with Session(engine) as db:
+        depths = {0, 1_000, 10_000, 100_000, rows // 2, rows - page_size}
+        for depth in sorted(d for d in depths if d <= rows - page_size):
+            offset = _time(lambda: crud.user.get_multi(db, skip=depth, limit=page_size))
+            # Ids start at 1, so the page after `depth` rows starts above id `depth`
+            keyset = _time(lambda: crud.user.get_page(db, after_id=depth, limit=page_size))
+            db.expunge_all()
+            print(f"{depth:>9} {offset * 1000:>10.2f} {keyset * 1000:>10.2f}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
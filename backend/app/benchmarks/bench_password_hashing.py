@@ -0,0 +1,47 @@
+"""
+Benchmark login throughput of the password hashing pool as the worker count grows.
+
+Each run fires `--logins` concurrent verifications (the CPU-bound part of `/auth/login`)
+through a `PasswordHasher` with 1, 2, 4, ... up to the CPU count worker processes, plus an
+inline baseline that verifies on the calling thread.
+
+Usage (from backend/app, with the usual environment variables set):
+    python benchmarks/bench_password_hashing.py --logins 64
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from app.core.security import PasswordHasher, get_password_hash
+
+
+async def _run(hasher: PasswordHasher, hashed: str, logins: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(hasher.averify("secret", hashed) for _ in range(logins)))
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=64)
+    args = parser.parse_args()
+
+    hashed = get_password_hash("secret")
+    cpus = os.cpu_count() or 1
+    worker_counts = [0] + [n for n in (1, 2, 4, 8, 16, 32, 64) if n < cpus] + [cpus]
+
+    print(f"{'workers':>8} {'seconds':>9} {'logins/s':>9}")
+    for workers in worker_counts:
+        hasher = PasswordHasher(max_workers=workers, max_pending=args.logins)
+        # Warm the pool so process start-up is not counted
+        asyncio.run(_run(hasher, hashed, max(workers, 1)))
+        elapsed = asyncio.run(_run(hasher, hashed, args.logins))
+        hasher.shutdown()
+        label = "inline" if workers == 0 else str(workers)
+        print(f"{label:>8} {elapsed:>9.2f} {args.logins / elapsed:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
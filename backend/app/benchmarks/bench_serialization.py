@@ -0,0 +1,135 @@
+"""
+Measure the rendering of `response_model` responses: a single `schemas.User`, and a list of
+5000 of them.
+
+The same endpoints, returning `User` rows, are served three ways: FastAPI's default path
+(validation, `jsonable_encoder`, `json.dumps`), `FastJSONResponse` as the default response
+class (validation, `jsonable_encoder`, orjson) and `FastJSONRoute` with `FastJSONResponse`
+(validation, `.dict()`, orjson), which is what FAST_JSON_RESPONSES=true turns on. The bodies
+of the three are checked to be the same.
+
+For each payload, the time to encode the validated value into the response body is reported
+on its own, next to the end-to-end time per request, which also includes the validation
+(mostly `EmailStr` checks, which dominate the list) and the ASGI round trip.
+
+Usage (from backend/app, with the usual environment variables set and orjson installed):
+    python benchmarks/bench_serialization.py --requests 2000 --list-requests 20
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, Callable, List, Type
+
+from app import schemas
+from app.api.responses import FastJSONResponse, FastJSONRoute, _to_data
+from app.core.timing import TimedRoute
+from app.models.user import User
+from fastapi import APIRouter, FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import asgi_client
+
+ROWS = 5000
+
+
+def _users(count: int) -> List[User]:
+    return [
+        User(
+            id=i,
+            email=f"user{i}@example.com",
+            first_name="First",
+            surname=None,
+            is_superuser=False,
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def _app(response_class: Type[JSONResponse], route_class: Type[TimedRoute]) -> FastAPI:
+    router = APIRouter(route_class=route_class)
+    user = _users(1)[0]
+    users = _users(ROWS)
+
+    @router.get("/user", response_model=schemas.User)
+    async def read_user():
+        return user
+
+    @router.get("/users", response_model=List[schemas.User])
+    async def read_users():
+        return users
+
+    app = FastAPI(default_response_class=response_class)
+    app.include_router(router)
+    return app
+
+
+def _encoders(value: Any) -> List[Callable[[], Any]]:
+    # Encode a validated value the way each of the three renderers does
+    options = {
+        "by_alias": True,
+        "exclude_unset": False,
+        "exclude_defaults": False,
+        "exclude_none": False,
+    }
+    return [
+        lambda: JSONResponse(jsonable_encoder(value)),
+        lambda: FastJSONResponse(jsonable_encoder(value)),
+        lambda: FastJSONResponse(_to_data(value, options)),
+    ]
+
+
+def _time_us(func: Callable[[], Any], repeat: int) -> float:
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+async def _run(app: FastAPI, path: str, requests: int) -> float:
+    await asgi_client.load(app, path, 1, max(requests // 10, 1))
+    return await asgi_client.load(app, path, 1, requests)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--list-requests", type=int, default=20)
+    args = parser.parse_args()
+
+    apps = {
+        "json": _app(JSONResponse, TimedRoute),
+        "orjson": _app(FastJSONResponse, TimedRoute),
+        "fast": _app(FastJSONResponse, FastJSONRoute),
+    }
+    for path in ("/user", "/users"):
+        bodies = {
+            asyncio.run(asgi_client.request(app, "GET", path))[2] for app in apps.values()
+        }
+        assert len(bodies) == 1, f"{path} bodies differ"
+
+    users = [schemas.User.from_orm(user) for user in _users(ROWS)]
+    print("1 client, sequential requests; encode = validated value to response body")
+    print(
+        f"{'payload':>10} {'renderer':>8} {'encode us':>10} {'speedup':>8}"
+        f" {'request us':>11} {'speedup':>8}"
+    )
+    for label, path, value, requests in (
+        ("1 user", "/user", users[0], args.requests),
+        (f"{ROWS} users", "/users", users, args.list_requests),
+    ):
+        base = None
+        for (renderer, app), encode in zip(apps.items(), _encoders(value)):
+            encode_us = _time_us(encode, requests)
+            request_us = 1e6 / asyncio.run(_run(app, path, requests))
+            base = base or (encode_us, request_us)
+            print(
+                f"{label:>10} {renderer:>8} {encode_us:>10.1f} {base[0] / encode_us:>7.2f}x"
+                f" {request_us:>11.1f} {base[1] / request_us:>7.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark concurrent signups and logins against the configured SQLite database.
+
+Each thread repeatedly creates a user and then authenticates as that user, so writes and
+reads interleave the way `/auth/signup` and `/auth/login` do. Run it once with the default
+SQLite profile and once with the rollback journal to compare, e.g.:
+
+    python benchmarks/bench_sqlite_signup_login.py
+    SQLITE_JOURNAL_MODE=DELETE SQLITE_SYNCHRONOUS=FULL python benchmarks/bench_sqlite_signup_login.py
+
+Point SQLALCHEMY_DATABASE_URI at a scratch copy of the database: the benchmark adds users.
+bcrypt rounds default to the minimum here so that hashing does not hide database costs.
+"""
+
+import argparse
+import os
+import threading
+import time
+import uuid
+
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from app import crud, schemas  # noqa: E402
+from app.core.auth import authenticate  # noqa: E402
+from app.db.session import SessionLocal, engine  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+
+def _worker(iterations: int, errors: list) -> None:
+    for _ in range(iterations):
+        email = f"bench-{uuid.uuid4().hex}@example.com"
+        db = SessionLocal()
+        try:
+            crud.user.create(db, obj_in=schemas.UserCreate(email=email, password="bench"))
+            db.close()
+            db = SessionLocal()
+            assert authenticate(email=email, password="bench", db=db) is not None
+        except OperationalError as exc:
+            errors.append(exc)
+        finally:
+            db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    with engine.connect() as connection:
+        journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar()
+        synchronous = connection.exec_driver_sql("PRAGMA synchronous").scalar()
+
+    errors: list = []
+    threads = [
+        threading.Thread(target=_worker, args=(args.iterations, errors))
+        for _ in range(args.threads)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    pairs = args.threads * args.iterations
+    print(f"journal_mode={journal_mode} synchronous={synchronous}")
+    print(f"{pairs} signup+login pairs in {elapsed:.2f}s: {pairs / elapsed:.0f} pairs/s")
+    print(f"{len(errors)} failed with OperationalError (e.g. 'database is locked')")
+
+
+if __name__ == "__main__":
+    main()
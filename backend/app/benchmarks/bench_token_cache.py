@@ -0,0 +1,69 @@
+"""
+Benchmark `/api/v1/auth/me` with a cold and a warm verified-token cache.
+
+The cold run clears the token cache before every request, so each one pays for a full
+`jwt.decode`; the warm run reuses the cached claims. Token cache counters are printed
+after each run.
+
+Usage (from backend/app, with the usual environment variables set):
+    python benchmarks/bench_token_cache.py --requests 2000
+"""
+
+import argparse
+import time
+
+from app import crud, schemas
+from app.core.auth import create_access_token, token_cache
+from app.db.session import SessionLocal
+from app.main import app
+from fastapi.testclient import TestClient
+
+BENCH_EMAIL = "bench-token-cache@example.com"
+
+
+def _bench_token() -> str:
+    db = SessionLocal()
+    try:
+        user = crud.user.get_by_email(db, email=BENCH_EMAIL)
+        if user is None:
+            user = crud.user.create(
+                db, obj_in=schemas.UserCreate(email=BENCH_EMAIL, password="bench")
+            )
+        return create_access_token(sub=user.id)
+    finally:
+        db.close()
+
+
+def _run(client: TestClient, token: str, requests: int, cold: bool) -> float:
+    headers = {"Authorization": f"Bearer {token}"}
+    start = time.perf_counter()
+    for _ in range(requests):
+        if cold:
+            token_cache.clear()
+        client.get("/api/v1/auth/me", headers=headers)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    token = _bench_token()
+    with TestClient(app) as client:
+        _run(client, token, 50, cold=False)
+
+        print(f"{'cache':>6} {'req/s':>9} {'us/req':>9}  counters")
+        for label, cold in (("cold", True), ("warm", False)):
+            before = token_cache.stats()
+            elapsed = _run(client, token, args.requests, cold=cold)
+            after = token_cache.stats()
+            counters = {k: after[k] - before[k] for k in ("hits", "misses")}
+            print(
+                f"{label:>6} {args.requests / elapsed:>9.0f} "
+                f"{elapsed / args.requests * 1e6:>9.0f}  {counters}"
+            )
+
+
+if __name__ == "__main__":
+    main()
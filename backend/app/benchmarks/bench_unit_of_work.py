@@ -0,0 +1,102 @@
+"""
+Compare commits and latency of a multi-write request with and without a unit of work.
+
+The same endpoint, which creates `--writes` users and then updates one of them through the
+CRUD layer, is mounted twice: on a plain router, where every CRUD call commits, and on a
+`UnitOfWorkRoute` router with `unit_of_work(True)`, where the request commits once. The
+commits issued per request are counted on the engine, and a failing request is sent to each
+to show that only the unit of work rolls back the rows written before the failure.
+
+Point SQLALCHEMY_DATABASE_URI at a scratch copy of the database: the benchmark adds users.
+
+Usage (from backend/app, with the usual environment variables set):
+    python benchmarks/bench_unit_of_work.py --requests 200 --writes 5
+"""
+
+import argparse
+import time
+import uuid
+from typing import List
+
+from app.api import deps
+from app.api.unit_of_work import UnitOfWorkRoute, unit_of_work
+from app.crud.base import CRUDBase
+from app.db.session import SessionLocal, engine
+from app.models.user import User
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+crud_rows = CRUDBase(User)
+
+
+def _write_many(prefix: str, writes: int, fail: bool, db: Session) -> int:
+    users = [
+        crud_rows.create(
+            db, obj_in={"email": f"{prefix}-{i}@example.com", "hashed_password": "x"}
+        )
+        for i in range(writes)
+    ]
+    crud_rows.update(db, db_obj=users[0], obj_in={"first_name": "Bench"})
+    if fail:
+        raise RuntimeError(prefix)
+    return len(users)
+
+
+def _app(writes: int) -> FastAPI:
+    app = FastAPI()
+    for path, router in (
+        ("/per-call", APIRouter()),
+        ("/unit-of-work", APIRouter(route_class=UnitOfWorkRoute)),
+    ):
+
+        @router.post("/write")
+        @unit_of_work(True)
+        def write(
+            prefix: str, fail: bool = False, db: Session = Depends(deps.get_db)
+        ) -> int:
+            return _write_many(prefix, writes, fail, db)
+
+        app.include_router(router, prefix=path)
+    return app
+
+
+def _leftovers(prefix: str) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(User).filter(User.email.startswith(prefix)).count()
+    finally:
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--writes", type=int, default=5)
+    args = parser.parse_args()
+
+    commits: List[int] = []
+    event.listen(engine, "commit", lambda conn: commits.append(1))
+
+    with TestClient(_app(args.writes), raise_server_exceptions=False) as client:
+        print(f"{'mode':>13} {'ms/req':>8} {'commits/req':>12} {'rows left on failure':>21}")
+        for mode in ("per-call", "unit-of-work"):
+            commits.clear()
+            start = time.perf_counter()
+            for _ in range(args.requests):
+                client.post(f"/{mode}/write?prefix={uuid.uuid4().hex}")
+            elapsed = time.perf_counter() - start
+            per_request = len(commits) / args.requests
+
+            prefix = uuid.uuid4().hex
+            client.post(f"/{mode}/write?prefix={prefix}&fail=true")
+            left = _leftovers(prefix)
+            print(
+                f"{mode:>13} {elapsed / args.requests * 1000:>8.2f} "
+                f"{per_request:>12.1f} {left:>21}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""
+Settings for the unit tests, given before the application modules are imported.
+
+Values already in the environment win, so the tests can also run against a configured .env.
+"""
+
+import os
+import tempfile
+
+os.environ.setdefault(
+    "SQLALCHEMY_DATABASE_URI",
+    "sqlite:///" + os.path.join(tempfile.gettempdir(), "app-tests.db"),
+)
+os.environ.setdefault("API_V1_STR", "/api/v1")
+os.environ.setdefault("JWT_ALGORITHM", "HS256")
+os.environ.setdefault("JWT_SECRET", "TEST_SECRET_DO_NOT_USE_IN_PROD")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+os.environ.setdefault("FIRST_SUPERUSER", "admin@api.com")
+os.environ.setdefault("FIRST_SUPERUSER_PW", "CHANGEME")
+# The tests create their own stores, in temporary directories
+os.environ.setdefault("METRICS_ENABLED", "false")
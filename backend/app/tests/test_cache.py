@@ -0,0 +1,62 @@
+import os
+import stat
+
+import pytest
+from app.core.cache import make_private_directory
+
+
+def _mode(path) -> int:
+    return stat.S_IMODE(os.lstat(path).st_mode)
+
+
+def test_creates_a_private_directory(tmp_path):
+    path = tmp_path / "a" / "cache"
+    make_private_directory(str(path))
+    assert path.is_dir()
+    assert _mode(path) == 0o700
+
+
+def test_accepts_an_existing_private_directory(tmp_path):
+    path = tmp_path / "cache"
+    path.mkdir(mode=0o700)
+    make_private_directory(str(path))
+
+
+def test_refuses_a_directory_accessible_to_others(tmp_path):
+    path = tmp_path / "cache"
+    path.mkdir()
+    path.chmod(0o755)
+    with pytest.raises(PermissionError, match="accessible to other users"):
+        make_private_directory(str(path))
+
+
+def test_refuses_a_symlink(tmp_path):
+    target = tmp_path / "target"
+    target.mkdir(mode=0o700)
+    link = tmp_path / "cache"
+    link.symlink_to(target)
+    with pytest.raises(PermissionError, match="not a directory"):
+        make_private_directory(str(link))
+
+
+def test_refuses_a_file(tmp_path):
+    path = tmp_path / "cache"
+    path.write_bytes(b"")
+    with pytest.raises(OSError):
+        make_private_directory(str(path))
+
+
+def test_refuses_a_parent_others_can_write_to(tmp_path):
+    parent = tmp_path / "shared"
+    parent.mkdir()
+    parent.chmod(0o777)
+    with pytest.raises(PermissionError, match="parent directory"):
+        make_private_directory(str(parent / "cache"))
+
+
+def test_accepts_a_sticky_parent_others_can_write_to(tmp_path):
+    parent = tmp_path / "shared"
+    parent.mkdir()
+    parent.chmod(0o777 | stat.S_ISVTX)
+    make_private_directory(str(parent / "cache"))
+    assert _mode(parent / "cache") == 0o700
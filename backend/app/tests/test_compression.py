@@ -0,0 +1,41 @@
+import pytest
+from app.core.compression import is_compressible, negotiate
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("gzip, br", "br"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("gzip;q=0.8, br;q=0.8", "br"),
+        ("GZIP", "gzip"),
+        ("deflate", None),
+        ("", None),
+        ("*", "br"),
+        ("*;q=0.5, br;q=0", "gzip"),
+        ("gzip;q=0", None),
+        ("gzip;q=abc, br;q=0.1", "br"),
+        ("identity, gzip ; q=0.3", "gzip"),
+    ],
+)
+def test_negotiate(accept_encoding, expected):
+    assert negotiate(accept_encoding, ("br", "gzip")) == expected
+
+
+def test_negotiate_only_offers_the_given_encodings():
+    assert negotiate("br, gzip;q=0.5", ("gzip",)) == "gzip"
+
+
+@pytest.mark.parametrize(
+    "content_type, expected",
+    [
+        ("text/html; charset=utf-8", True),
+        ("application/json", True),
+        ("application/problem+json", True),
+        ("image/svg+xml", True),
+        ("image/png", False),
+        ("application/octet-stream", False),
+    ],
+)
+def test_is_compressible(content_type, expected):
+    assert is_compressible(content_type) is expected
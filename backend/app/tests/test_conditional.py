@@ -0,0 +1,21 @@
+import pytest
+from app.api.conditional import etag_matches
+
+
+@pytest.mark.parametrize(
+    "if_none_match, etag, expected",
+    [
+        ('W/"abc"', 'W/"abc"', True),
+        ('"abc"', 'W/"abc"', True),
+        ('W/"abc"', '"abc"', True),
+        ('"x", W/"abc" , "y"', 'W/"abc"', True),
+        ("*", 'W/"abc"', True),
+        (" * ", 'W/"abc"', True),
+        ('W/"abd"', 'W/"abc"', False),
+        ('"ABC"', 'W/"abc"', False),
+        ("abc", 'W/"abc"', False),
+        ("", 'W/"abc"', False),
+    ],
+)
+def test_etag_matches(if_none_match, etag, expected):
+    assert etag_matches(if_none_match, etag) is expected
@@ -0,0 +1,32 @@
+import base64
+
+import pytest
+from app.crud.base import decode_cursor, encode_cursor
+
+
+@pytest.mark.parametrize("last_id", [1, 42, 10 ** 12, 2 ** 63 - 1])
+def test_cursor_round_trip(last_id):
+    cursor = encode_cursor(last_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == last_id
+
+
+def _encode(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "",
+        "%%%",
+        _encode("abc"),
+        _encode("0"),
+        _encode("-5"),
+        _encode(str(2 ** 63)),
+        base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    ],
+)
+def test_decode_cursor_rejects_invalid_cursors(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
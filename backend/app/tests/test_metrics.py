@@ -0,0 +1,198 @@
+import mmap
+import os
+import threading
+
+import pytest
+from app.core import metrics
+from app.core.metrics import (
+    _HEADER,
+    _INITIAL_FILE_SIZE,
+    MetricsStore,
+    _entries,
+    _MetricFile,
+    _read,
+)
+
+
+@pytest.fixture
+def directory(tmp_path):
+    path = tmp_path / "metrics"
+    path.mkdir(mode=0o700)
+    return str(path)
+
+
+@pytest.fixture
+def store(directory):
+    store = MetricsStore(directory, buckets=[0.1, 0.5, 1.0])
+    yield store
+    store.close()
+
+
+def _key(name: str, labels=()):
+    return "http_requests_total", name, tuple(labels)
+
+
+def test_entries_are_padded_to_8_bytes(directory):
+    path = os.path.join(directory, "counter_1.db")
+    file = _MetricFile(path)
+    for length in range(1, 12):
+        file.add(_key("x" * length, (("route", "/" * length),)), length)
+    used = _HEADER.unpack_from(file._mmap, 0)[0]
+    offsets = [offset for _, offset in _entries(file._mmap, used)]
+    assert len(offsets) == 11
+    assert all(offset % 8 == 0 for offset in offsets)
+    assert used % 8 == 0
+    file.close()
+
+    assert sorted(value for _, value in _read(path)) == list(range(1, 12))
+
+
+def test_values_are_updated_in_place(directory):
+    path = os.path.join(directory, "counter_1.db")
+    file = _MetricFile(path)
+    file.add(_key("a"), 1)
+    file.add(_key("a"), 2.5)
+    file.set(_key("b"), 7)
+    file.set(_key("b"), 3)
+    file.close()
+
+    assert dict(_read(path)) == {_key("a"): 3.5, _key("b"): 3.0}
+    # Reopening finds the existing entries rather than appending new ones
+    file = _MetricFile(path)
+    file.add(_key("a"), 1)
+    file.close()
+    assert dict(_read(path)) == {_key("a"): 4.5, _key("b"): 3.0}
+
+
+def test_growth_keeps_the_mappings_of_readers_valid(directory):
+    path = os.path.join(directory, "counter_1.db")
+    file = _MetricFile(path)
+    file.add(_key("first"), 1)
+    with open(path, "rb") as reader:
+        with mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ) as old:
+            for index in range(2000):
+                file.add(_key("sample", (("index", str(index)),)), index)
+            assert os.path.getsize(path) > _INITIAL_FILE_SIZE
+            # A mapping made before the growth still reads the entries it covers
+            used = _HEADER.unpack_from(old, 0)[0]
+            assert used > len(old)
+            keys = [key for key, _ in _entries(old, used)]
+            assert keys[0] == '["http_requests_total", "first", []]'
+    file.close()
+
+    values = dict(_read(path))
+    assert len(values) == 2001
+    assert values[_key("sample", (("index", "1999"),))] == 1999
+
+
+def test_entries_stop_at_a_truncated_entry():
+    buffer = mmap.mmap(-1, 64)
+    _HEADER.pack_into(buffer, 0, 64)
+    # A key length running past the bytes in use
+    buffer[8:12] = (100).to_bytes(4, "little")
+    assert list(_entries(buffer, 64)) == []
+    buffer.close()
+
+
+def test_read_refuses_symlinks(directory, tmp_path):
+    target = str(tmp_path / "target.db")
+    file = _MetricFile(target)
+    file.add(_key("a"), 1)
+    file.close()
+    link = os.path.join(directory, "counter_2.db")
+    os.symlink(target, link)
+
+    assert _read(link) == []
+    with pytest.raises(OSError):
+        _MetricFile(link)
+
+
+def test_collect_adds_up_the_files_of_every_worker(store, directory):
+    store.inc("http_requests_total", (("status", "200"),))
+    store.inc("http_requests_total", (("status", "200"),), 2)
+    other = _MetricFile(os.path.join(directory, "counter_999999999.db"))
+    other.add(_key("http_requests_total", (("status", "200"),)), 4)
+    other.add(_key("http_requests_total", (("status", "500"),)), 1)
+    other.close()
+
+    totals = store.collect()
+    assert totals[_key("http_requests_total", (("status", "200"),))] == 7
+    assert totals[_key("http_requests_total", (("status", "500"),))] == 1
+
+
+def test_collect_drops_the_gauges_of_dead_workers(store, directory, monkeypatch):
+    store.inc("http_requests_in_progress")
+    dead = os.path.join(directory, "gauge_999999999.db")
+    file = _MetricFile(dead)
+    file.set(("http_requests_in_progress", "http_requests_in_progress", ()), 5)
+    file.close()
+    monkeypatch.setattr(metrics, "_is_alive", lambda pid: pid == os.getpid())
+
+    totals = store.collect()
+    assert totals[("http_requests_in_progress", "http_requests_in_progress", ())] == 1
+    assert not os.path.exists(dead)
+
+
+def test_close_drops_the_gauges_but_keeps_the_counters(directory):
+    store = MetricsStore(directory, buckets=[1.0])
+    store.inc("http_requests_total")
+    store.inc("http_requests_in_progress")
+    store.close()
+
+    assert os.listdir(directory) == [f"counter_{os.getpid()}.db"]
+
+
+def test_render_makes_histograms_cumulative(store, directory):
+    labels = (("method", "GET"), ("route", "/users"))
+    for value in (0.0625, 0.25, 0.375, 2.0):
+        store.observe("http_request_duration_seconds", labels, value)
+    # Another worker's observations of the same series
+    other = _MetricFile(os.path.join(directory, "counter_999999999.db"))
+    family = "http_request_duration_seconds"
+    other.add((family, f"{family}_bucket", labels + (("le", "0.1"),)), 1)
+    other.add((family, f"{family}_sum", labels), 0.0625)
+    other.add((family, f"{family}_count", labels), 1)
+    other.close()
+
+    lines = store.render().splitlines()
+    series = 'method="GET",route="/users"'
+    assert "# TYPE http_request_duration_seconds histogram" in lines
+    start = lines.index(f'http_request_duration_seconds_bucket{{{series},le="0.1"}} 2')
+    assert lines[start : start + 6] == [
+        f'http_request_duration_seconds_bucket{{{series},le="0.1"}} 2',
+        f'http_request_duration_seconds_bucket{{{series},le="0.5"}} 4',
+        f'http_request_duration_seconds_bucket{{{series},le="1.0"}} 4',
+        f'http_request_duration_seconds_bucket{{{series},le="+Inf"}} 5',
+        f"http_request_duration_seconds_count{{{series}}} 5",
+        f"http_request_duration_seconds_sum{{{series}}} 2.75",
+    ]
+
+
+def test_render_computes_the_hit_ratio_and_escapes_labels(store):
+    store.set("cache_hits_total", (("cache", 'a"b\\c'),), 3)
+    store.set("cache_misses_total", (("cache", 'a"b\\c'),), 1)
+
+    text = store.render()
+    assert 'cache_hits_total{cache="a\\"b\\\\c"} 3\n' in text
+    assert 'cache_hit_ratio{cache="a\\"b\\\\c"} 0.75\n' in text
+    assert text.index("# TYPE cache_hits_total counter") < text.index(
+        "# TYPE cache_hit_ratio gauge"
+    )
+
+
+def test_collectors_are_published_from_a_background_thread(directory):
+    store = MetricsStore(directory, buckets=[1.0], publish_interval=0.01)
+    published = threading.Event()
+
+    def collector():
+        published.set()
+        return [("db_pool_connects_total", (("engine", "primary"),), 3.0)]
+
+    store.add_collector(collector)
+    store.start_publishing()
+    assert published.wait(timeout=5)
+    store.close()
+
+    assert store.collect()[
+        ("db_pool_connects_total", "db_pool_connects_total", (("engine", "primary"),))
+    ] == 3
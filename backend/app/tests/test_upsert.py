@@ -0,0 +1,96 @@
+import pytest
+from app.crud.base import CRUDBase
+from sqlalchemy import Column, Index, Integer, String, UniqueConstraint, func
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import declarative_base
+
+Base = declarative_base()
+
+
+class Tag(Base):
+    __tablename__ = "tag"
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True)
+    color = Column(String)
+
+
+class Account(Base):
+    __tablename__ = "account"
+    id = Column(Integer, primary_key=True)
+    email = Column(String)
+    full_name = Column(String)
+    __table_args__ = (Index("ix_account_email_lower", func.lower(email), unique=True),)
+
+
+class Membership(Base):
+    __tablename__ = "membership"
+    __table_args__ = (UniqueConstraint("group_id", "member_id"),)
+    id = Column(Integer, primary_key=True)
+    group_id = Column(Integer)
+    member_id = Column(Integer)
+    role = Column(String)
+
+
+class Note(Base):
+    __tablename__ = "note"
+    id = Column(Integer, primary_key=True)
+    body = Column(String)
+
+
+class Person(Base):
+    __tablename__ = "person"
+    id = Column(Integer, primary_key=True)
+    email = Column(String, unique=True)
+    username = Column(String, unique=True)
+
+
+def test_conflict_target_is_a_unique_column():
+    assert CRUDBase(Tag)._conflict_target() == [Tag.__table__.c.name]
+
+
+def test_conflict_target_is_a_unique_constraint():
+    target = CRUDBase(Membership)._conflict_target()
+    assert target == [Membership.__table__.c.group_id, Membership.__table__.c.member_id]
+
+
+def test_conflict_target_is_a_unique_expression_index():
+    (element,) = CRUDBase(Account)._conflict_target()
+    assert str(element.compile(dialect=sqlite.dialect())) == "lower(account.email)"
+
+
+@pytest.mark.parametrize("model", [Note, Person])
+def test_conflict_target_must_be_unambiguous(model):
+    with pytest.raises(ValueError, match="index_elements"):
+        CRUDBase(model)._conflict_target()
+
+
+def _compile(statement) -> str:
+    return str(statement.compile(dialect=sqlite.dialect()))
+
+
+def test_upsert_updates_the_columns_outside_the_conflict_target():
+    statement = CRUDBase(Tag)._upsert_statement(
+        "sqlite", {"name": "a", "color": "red"}, None, None
+    )
+    sql = _compile(statement)
+    assert "ON CONFLICT (name) DO UPDATE SET color = excluded.color" in sql
+
+
+def test_upsert_still_updates_columns_matched_by_an_expression():
+    statement = CRUDBase(Account)._upsert_statement(
+        "sqlite", {"email": "A@b.c", "full_name": "A"}, None, None
+    )
+    sql = _compile(statement)
+    assert "ON CONFLICT (lower(email)) DO UPDATE SET" in sql
+    assert "email = excluded.email" in sql
+    assert "full_name = excluded.full_name" in sql
+
+
+def test_upsert_does_nothing_without_columns_to_update():
+    statement = CRUDBase(Tag)._upsert_statement("sqlite", {"name": "a"}, None, None)
+    assert "ON CONFLICT (name) DO NOTHING" in _compile(statement)
+
+
+def test_upsert_is_not_supported_on_other_dialects():
+    with pytest.raises(NotImplementedError):
+        CRUDBase(Tag)._upsert_statement("mysql", {"name": "a"}, None, None)